@@ -46,10 +46,24 @@ def fedavg(adapter_dirs: list, weights: list) -> dict:
     return averaged
 
 
-def save_merged_adapter(averaged: dict, source_config_dir: str, output_dir: str) -> None:
+def staleness_weights(shard_sizes: list, staleness: list, exponent: float) -> list:
+    """
+    Discount shard-size weights by staleness: w = shard_size * (1 + s) ** -exponent.
+    staleness — per-adapter count of merged versions published before it arrived
+    exponent  — 0 disables the discount (plain shard-size weighting)
+    """
+    if exponent <= 0:
+        return [float(n) for n in shard_sizes]
+    return [float(n) * (1.0 + s) ** -exponent for n, s in zip(shard_sizes, staleness)]
+
+
+def save_merged_adapter(
+    averaged: dict, source_config_dir: str, output_dir: str, meta: dict | None = None
+) -> None:
     """
     Save averaged tensors as a new adapter. Copies adapter_config.json from
     source_config_dir (must be the first contributor's adapter directory).
+    meta — extra fields merged into trainchain_meta.json (version, contributors, …)
     """
     import torch
     from safetensors.torch import save_file
@@ -68,21 +82,72 @@ def save_merged_adapter(averaged: dict, source_config_dir: str, output_dir: str)
     if os.path.exists(cfg_src):
         shutil.copy2(cfg_src, cfg_dst)
 
-    meta = {"aggregation_method": "FedAvg", "n_adapters": len(averaged)}
+    info = {"aggregation_method": "FedAvg", "n_adapters": len(averaged)}
+    info.update(meta or {})
     with open(os.path.join(output_dir, "trainchain_meta.json"), "w") as f:
-        json.dump(meta, f, indent=2)
+        json.dump(info, f, indent=2)
 
 
-def run_fedavg(adapter_dirs: list, shard_sizes: list, output_dir: str) -> str:
+def mean_train_loss(adapter_dirs: list, weights: list) -> float | None:
+    """
+    Weighted mean of the train_loss each contributor wrote to train_metrics.json.
+    Returns None when no adapter reported a loss (older trainer versions).
+    """
+    total, acc = 0.0, 0.0
+    for adapter_dir, w in zip(adapter_dirs, weights):
+        path = os.path.join(adapter_dir, "train_metrics.json")
+        if not os.path.exists(path):
+            continue
+        with open(path) as f:
+            loss = json.load(f).get("train_loss")
+        if loss is None:
+            continue
+        total += w
+        acc   += w * float(loss)
+    return acc / total if total else None
+
+
+def effective_samples(adapter_dir: str, shard_size: int) -> float:
+    """
+    FedAvg sample count for one adapter. A contributor that hit its time
+    budget reports steps < planned_steps in train_metrics.json and only saw
+    that fraction of its shard, so its weight shrinks accordingly.
+    """
+    path = os.path.join(adapter_dir, "train_metrics.json")
+    if not os.path.exists(path):
+        return float(shard_size)
+    with open(path) as f:
+        metrics = json.load(f)
+    steps, planned = metrics.get("steps"), metrics.get("planned_steps")
+    if not steps or not planned or steps >= planned:
+        return float(shard_size)
+    return shard_size * steps / planned
+
+
+def run_fedavg(
+    adapter_dirs: list,
+    shard_sizes: list,
+    output_dir: str,
+    staleness: list | None = None,
+    staleness_exponent: float = 0.0,
+    meta: dict | None = None,
+) -> str:
     """
     Full pipeline: FedAvg → save merged adapter.
+    staleness / staleness_exponent — optional discount for late adapters
+    (see staleness_weights); omitted means every adapter is fresh.
     Returns output_dir path.
     """
     if len(adapter_dirs) < 2:
         raise ValueError("Need at least 2 adapters for FedAvg")
     if len(shard_sizes) != len(adapter_dirs):
         raise ValueError("shard_sizes length must match adapter_dirs length")
-
-    averaged = fedavg(adapter_dirs, shard_sizes)
-    save_merged_adapter(averaged, adapter_dirs[0], output_dir)
+    if staleness is None:
+        staleness = [0] * len(adapter_dirs)
+    if len(staleness) != len(adapter_dirs):
+        raise ValueError("staleness length must match adapter_dirs length")
+
+    weights  = staleness_weights(shard_sizes, staleness, staleness_exponent)
+    averaged = fedavg(adapter_dirs, weights)
+    save_merged_adapter(averaged, adapter_dirs[0], output_dir, meta)
     return output_dir
\ No newline at end of file
@@ -4,6 +4,7 @@ ipfs_utils.py — Download and upload adapter ZIPs via Pinata.
 
 import io
 import os
+import tempfile
 import zipfile
 import requests
 
@@ -40,9 +41,13 @@ def download_adapter_zip(cid: str, dest_dir: str) -> str:
     return dest_dir
 
 
-def upload_adapter_dir(adapter_dir: str, job_id: int) -> str:
+def upload_adapter_dir(
+    adapter_dir: str, job_id: int, version: int | None = None, round_no: int = 1
+) -> str:
     """
     Zip the merged adapter directory and upload to Pinata.
+    version  — optional merged-version number appended to the file name.
+    round_no — federated round; rounds after the first are tagged in the name.
     Returns the IPFS CID (IpfsHash) of the uploaded ZIP.
     """
     if not PINATA_API_KEY or not PINATA_API_SECRET:
@@ -58,7 +63,9 @@ def upload_adapter_dir(adapter_dir: str, job_id: int) -> str:
                 zf.write(full, arc)
     buf.seek(0)
 
-    file_name = f"merged_adapter_job_{job_id}.zip"
+    suffix    = f"_r{round_no}" if round_no > 1 else ""
+    suffix   += f"_v{version}" if version is not None else ""
+    file_name = f"merged_adapter_job_{job_id}{suffix}.zip"
     print(f"[ipfs] Uploading merged adapter as {file_name}")
 
     resp = requests.post(
@@ -73,4 +80,43 @@ def upload_adapter_dir(adapter_dir: str, job_id: int) -> str:
     resp.raise_for_status()
     cid = resp.json()["IpfsHash"]
     print(f"[ipfs] Merged adapter uploaded: {cid}")
-    return cid
\ No newline at end of file
+    return cid
+
+def upload_model_dir(model_dir: str, job_id: int) -> str:
+    """
+    Zip a (multi-GB) merged model directory to a temp file and stream it to Pinata.
+    Unlike upload_adapter_dir nothing is buffered in memory; safetensors are
+    stored uncompressed since they barely deflate.
+    Returns the IPFS CID (IpfsHash) of the uploaded ZIP.
+    """
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+
+    if not PINATA_API_KEY or not PINATA_API_SECRET:
+        raise RuntimeError("PINATA_API_KEY / PINATA_API_SECRET not set")
+
+    file_name = f"merged_model_job_{job_id}.zip"
+    with tempfile.TemporaryDirectory(prefix="tc_export_") as tmp:
+        zip_path = os.path.join(tmp, file_name)
+        with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+            for root, _, files in os.walk(model_dir):
+                for fname in files:
+                    full = os.path.join(root, fname)
+                    zf.write(full, os.path.relpath(full, model_dir))
+
+        print(f"[ipfs] Uploading merged model as {file_name} ({os.path.getsize(zip_path) / 1e9:.2f} GB)")
+        with open(zip_path, "rb") as fh:
+            encoder = MultipartEncoder(fields={"file": (file_name, fh, "application/zip")})
+            resp = requests.post(
+                "https://api.pinata.cloud/pinning/pinFileToIPFS",
+                data=encoder,
+                headers={
+                    "Content-Type":          encoder.content_type,
+                    "pinata_api_key":        PINATA_API_KEY,
+                    "pinata_secret_api_key": PINATA_API_SECRET,
+                },
+                timeout=3600,
+            )
+    resp.raise_for_status()
+    cid = resp.json()["IpfsHash"]
+    print(f"[ipfs] Merged model uploaded: {cid}")
+    return cid
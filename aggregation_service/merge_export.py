@@ -0,0 +1,136 @@
+"""
+merge_export.py — Fold a merged LoRA adapter into the base model weights.
+
+Streams the base model one safetensors shard at a time:
+    download shard → W += (B @ A) * scale for every LoRA target → write shard → delete
+so peak RAM is roughly one shard and peak disk roughly one input + one output
+shard on top of the merged output. The result is a plain, serving-ready
+Transformers checkpoint (sharded safetensors + index + config + tokenizer).
+"""
+
+import json
+import math
+import os
+import shutil
+
+# Non-weight files copied verbatim from the base repo (whichever exist)
+_AUX_FILES = [
+    "config.json",
+    "generation_config.json",
+    "tokenizer.json",
+    "tokenizer.model",
+    "tokenizer_config.json",
+    "special_tokens_map.json",
+    "added_tokens.json",
+    "vocab.json",
+    "merges.txt",
+]
+
+
+def load_lora_deltas(adapter_dir: str) -> tuple[dict, dict]:
+    """
+    Read the merged adapter and group its tensors per base weight.
+    Returns ({base_weight_key: (A, B)}, adapter_config).
+    """
+    from safetensors.torch import load_file
+
+    with open(os.path.join(adapter_dir, "adapter_config.json")) as f:
+        cfg = json.load(f)
+    tensors = load_file(os.path.join(adapter_dir, "adapter_model.safetensors"), device="cpu")
+
+    pairs: dict[str, dict] = {}
+    for key, t in tensors.items():
+        for part in ("lora_A", "lora_B"):
+            marker = f".{part}."
+            if marker in key:
+                # base_model.model.model.layers.0.self_attn.q_proj.lora_A.weight
+                #   → model.layers.0.self_attn.q_proj.weight
+                module = key.split(marker)[0].removeprefix("base_model.model.")
+                pairs.setdefault(f"{module}.weight", {})[part] = t.float()
+
+    deltas = {k: (v["lora_A"], v["lora_B"]) for k, v in pairs.items() if len(v) == 2}
+    print(f"[export] {len(deltas)} LoRA-adapted weights found in {adapter_dir}")
+    return deltas, cfg
+
+
+def _lora_scale(cfg: dict, rank: int) -> float:
+    alpha = cfg.get("lora_alpha", rank)
+    return alpha / math.sqrt(rank) if cfg.get("use_rslora") else alpha / rank
+
+
+def merge_shard(shard_path: str, deltas: dict, cfg: dict) -> tuple[dict, int]:
+    """
+    Load one base shard lazily and fold in any matching LoRA deltas.
+    Returns ({key: tensor}, n_merged).
+    """
+    import torch
+    from safetensors import safe_open
+
+    fan_in_fan_out = bool(cfg.get("fan_in_fan_out"))
+    out, n_merged = {}, 0
+    with safe_open(shard_path, framework="pt", device="cpu") as sf:
+        for key in sf.keys():
+            w = sf.get_tensor(key)
+            if key in deltas:
+                a, b = deltas[key]
+                delta = (b @ a) * _lora_scale(cfg, a.shape[0])
+                if fan_in_fan_out:
+                    delta = delta.T
+                w = (w.to(torch.float32) + delta).to(w.dtype)
+                n_merged += 1
+            out[key] = w.contiguous()
+    return out, n_merged
+
+
+def export_merged_model(model_name: str, adapter_dir: str, output_dir: str, work_dir: str) -> str:
+    """
+    Full pipeline: fetch base shards one by one → merge → write merged shards.
+    model_name — HuggingFace model ID of the base model
+    Returns output_dir path.
+    """
+    from huggingface_hub import hf_hub_download, list_repo_files
+    from safetensors.torch import save_file
+
+    deltas, cfg = load_lora_deltas(adapter_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    dl_dir = os.path.join(work_dir, "base_shards")
+
+    repo_files = set(list_repo_files(model_name))
+    if "model.safetensors.index.json" in repo_files:
+        index_path = hf_hub_download(model_name, "model.safetensors.index.json", local_dir=dl_dir)
+        with open(index_path) as f:
+            weight_map = json.load(f)["weight_map"]
+        shard_names = sorted(set(weight_map.values()))
+    elif "model.safetensors" in repo_files:
+        shard_names = ["model.safetensors"]
+    else:
+        raise FileNotFoundError(f"{model_name} has no safetensors weights — cannot stream-merge")
+
+    new_map, total_size, total_merged = {}, 0, 0
+    for i, shard_name in enumerate(shard_names):
+        print(f"[export] Shard {i + 1}/{len(shard_names)}: {shard_name}")
+        shard_path = hf_hub_download(model_name, shard_name, local_dir=dl_dir)
+        merged, n_merged = merge_shard(shard_path, deltas, cfg)
+        save_file(merged, os.path.join(output_dir, shard_name), metadata={"format": "pt"})
+
+        for key, t in merged.items():
+            new_map[key] = shard_name
+            total_size += t.numel() * t.element_size()
+        total_merged += n_merged
+        del merged
+        os.remove(shard_path)   # keep peak disk near one input shard
+
+    if total_merged != len(deltas):
+        print(f"[warn] Merged {total_merged}/{len(deltas)} LoRA weights — some targets not found in base")
+
+    if len(shard_names) > 1:
+        with open(os.path.join(output_dir, "model.safetensors.index.json"), "w") as f:
+            json.dump({"metadata": {"total_size": total_size}, "weight_map": new_map}, f, indent=2)
+
+    for name in _AUX_FILES:
+        if name in repo_files:
+            shutil.copy2(hf_hub_download(model_name, name, local_dir=dl_dir), os.path.join(output_dir, name))
+
+    shutil.rmtree(dl_dir, ignore_errors=True)
+    print(f"[export] Merged model written to {output_dir} ({total_size / 1e9:.2f} GB, {total_merged} weights merged)")
+    return output_dir
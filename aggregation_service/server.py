@@ -1,15 +1,44 @@
 """
 server.py — Flask aggregation microservice.
-Triggered by the Node.js backend after all adapters are submitted.
+Triggered by the Node.js backend after all adapters are submitted — or, for
+jobs with min_adapters (K-of-N), once the K-th adapter of a round is in.
 
 Endpoints:
-    POST /aggregate      { "job_id": 123 }   — start aggregation for a job
+    POST /aggregate      { "job_id": 123, "min_adapters": 2 }
+                                              — start aggregation for a job
+    GET  /versions/<job_id>                   — merged versions published so far
     GET  /health                              — liveness check
+
+Aggregation modes
+-----------------
+  sync  — (default) wait until every slot has an adapter_cid, merge once.
+  async — merge as soon as K = min_adapters adapters are in, publish that
+          version, then keep polling and fold later arrivals into follow-up
+          versions. The final version (all N slots) completes the job on-chain.
+          Triggering early is safe: the service polls the backend for adapters.
+          Published versions are persisted under WORK_DIR/versions, so a
+          restarted service resumes version numbering and staleness, and a
+          deadline with versions published finalizes the round with the
+          latest one.
+
+Multi-round jobs
+----------------
+  Each round's merged adapter is published round-numbered. While the job has
+  rounds left (max_rounds) and the shard-weighted train loss is above
+  target_loss, the backend is asked to open the next round with that adapter
+  as the warm start; otherwise the job is completed on-chain.
+
+Merged-model export (optional, EXPORT_MERGED_MODEL=1)
+-----------------------------------------------------
+  After the final merge the adapter is folded into the base weights shard by
+  shard (merge_export.py) and the serving-ready model is pinned to IPFS too.
 """
 
+import json
 import os
 import shutil
 import threading
+import time
 import traceback
 import subprocess
 
@@ -19,8 +48,9 @@ from flask import Flask, jsonify, request
 
 load_dotenv()
 
-from aggregator  import run_fedavg
-from ipfs_utils  import download_adapter_zip, upload_adapter_dir
+from aggregator  import effective_samples, mean_train_loss, run_fedavg
+from ipfs_utils  import download_adapter_zip, upload_adapter_dir, upload_model_dir
+from merge_export import export_merged_model
 from blockchain  import complete_federated_job_on_chain
 
 app = Flask(__name__)
@@ -28,6 +58,20 @@ app = Flask(__name__)
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:3000")
 WORK_DIR    = os.getenv("WORK_DIR", "./tmp_aggregation")
 
+# Async (K-of-N) aggregation — 0 keeps the original wait-for-all behaviour
+MIN_ADAPTERS       = int(os.getenv("AGG_MIN_ADAPTERS", "0"))
+STALENESS_EXPONENT = float(os.getenv("AGG_STALENESS_EXPONENT", "0.5"))
+POLL_SECONDS       = int(os.getenv("AGG_POLL_SECONDS", "30"))
+ASYNC_TIMEOUT_S    = int(os.getenv("AGG_ASYNC_TIMEOUT", str(48 * 3600)))
+
+# Fold the final adapter into the base model and publish the full model as well
+EXPORT_MERGED_MODEL = os.getenv("EXPORT_MERGED_MODEL", "0") == "1"
+
+# Jobs with a running aggregation thread; the version files are written under
+# the same lock
+_active_jobs: set[int] = set()
+_state_lock = threading.Lock()
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Routes
 # ─────────────────────────────────────────────────────────────────────────────
@@ -40,19 +84,29 @@ def health():
 @app.route("/aggregate", methods=["POST"])
 def aggregate():
     """
-    Accepts { "job_id": <int> } and kicks off aggregation in a background thread.
+    Accepts { "job_id": <int>, "min_adapters": <int, optional> } and kicks off
+    aggregation in a background thread.
     Returns immediately so the Node backend is not blocked.
     """
     data = request.get_json(silent=True)
     if not data or "job_id" not in data:
         return jsonify({"error": "job_id required"}), 400
 
-    job_id = int(data["job_id"])
-    print(f"\n[server] Aggregation requested for job {job_id}")
+    job_id       = int(data["job_id"])
+    min_adapters = int(data.get("min_adapters") or MIN_ADAPTERS)
+    print(f"\n[server] Aggregation requested for job {job_id} (min_adapters={min_adapters or 'all'})")
+
+    with _state_lock:
+        if job_id in _active_jobs:
+            # An async watcher already folds in every remaining adapter
+            return jsonify({"message": f"Aggregation already running for job {job_id}"}), 202
+        if _load_versions(job_id)["completed"]:
+            return jsonify({"message": f"Aggregation already completed for job {job_id}"}), 200
+        _active_jobs.add(job_id)
 
     thread = threading.Thread(
         target=_run_aggregation_safe,
-        args=(job_id,),
+        args=(job_id, min_adapters),
         daemon=True,
     )
     thread.start()
@@ -60,95 +114,291 @@ def aggregate():
     return jsonify({"message": f"Aggregation started for job {job_id}"}), 202
 
 
+@app.route("/versions/<int:job_id>")
+def versions(job_id: int):
+    """Merged adapter versions published for a job, each with its contributor set."""
+    with _state_lock:
+        published = _load_versions(job_id)["versions"]
+    return jsonify({"job_id": job_id, "versions": published}), 200
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Version store — one JSON file per job, outside the per-job work dir
+# ─────────────────────────────────────────────────────────────────────────────
+
+def _versions_path(job_id: int) -> str:
+    return os.path.join(WORK_DIR, "versions", f"job_{job_id}.json")
+
+
+def _load_versions(job_id: int) -> dict:
+    """{ "completed": bool, "versions": [...] } for a job; empty if none published."""
+    try:
+        with open(_versions_path(job_id), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"completed": False, "versions": []}
+
+
+def _save_versions(job_id: int, state: dict) -> None:
+    """Write the version file atomically (tmp file + rename). Caller holds _state_lock."""
+    path = _versions_path(job_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Core aggregation pipeline (runs in background thread)
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _run_aggregation_safe(job_id: int):
+def _run_aggregation_safe(job_id: int, min_adapters: int = 0):
     """Wrapper that catches all exceptions and reports failure to backend."""
     try:
-        _run_aggregation(job_id)
+        _run_aggregation(job_id, min_adapters)
     except Exception as e:
         tb = traceback.format_exc()
         print(f"[error] Aggregation failed for job {job_id}:\n{tb}")
         _notify_backend_failure(job_id, str(e))
+    finally:
+        with _state_lock:
+            _active_jobs.discard(job_id)
 
 
-def _run_aggregation(job_id: int):
-    log_lines = []
-
-    def log(msg: str):
-        print(msg)
-        log_lines.append(msg)
-
-    log(f"[agg] ══ Start aggregation for job {job_id} ══")
-
-    # ── 1. Fetch slot info from Node backend ──────────────────────────────────
-    log(f"[agg] Fetching slot info from backend...")
+def _fetch_slots(job_id: int) -> list:
     resp = requests.get(
         f"{BACKEND_URL}/jobs/llm/slots/{job_id}",
         timeout=15,
     )
     resp.raise_for_status()
-    slots = resp.json()   # list of { slot_index, contributor_address, adapter_cid, shard_size }
-
+    slots = resp.json()   # list of { slot_index, contributor_address, adapter_cid, shard_size,
+                          #           model_name, current_round, max_rounds, target_loss }
     if not slots:
         raise ValueError(f"No slots found for job {job_id}")
+    return sorted(slots, key=lambda s: s["slot_index"])
 
-    missing = [s for s in slots if not s.get("adapter_cid")]
-    if missing:
-        raise ValueError(
-            f"Slots {[s['slot_index'] for s in missing]} have no adapter_cid — "
-            "cannot aggregate yet."
-        )
 
-    log(f"[agg] {len(slots)} slots with adapters.")
+def _run_aggregation(job_id: int, min_adapters: int = 0):
+    log_lines = []
 
-    # ── 2. Download all adapter ZIPs from IPFS ────────────────────────────────
-    job_work_dir = os.path.join(WORK_DIR, f"job_{job_id}")
-    shutil.rmtree(job_work_dir, ignore_errors=True)   # clean any previous attempt
+    def log(msg: str):
+        print(msg)
+        log_lines.append(msg)
 
-    adapter_dirs  = []
-    shard_sizes   = []
+    log(f"[agg] ══ Start aggregation for job {job_id} ══")
 
-    for slot in sorted(slots, key=lambda s: s["slot_index"]):
-        dest = os.path.join(job_work_dir, f"adapter_{slot['slot_index']}")
-        log(f"[agg] Downloading adapter for slot {slot['slot_index']}: {slot['adapter_cid']}")
+    # ── 1. Fetch slot info from Node backend ──────────────────────────────────
+    log(f"[agg] Fetching slot info from backend...")
+    slots = _fetch_slots(job_id)
+    n_slots = len(slots)
+    async_mode = 0 < min_adapters < n_slots
+
+    round_no    = int(slots[0].get("current_round") or 1)
+    max_rounds  = int(slots[0].get("max_rounds") or 1)
+    target_loss = slots[0].get("target_loss")
+    target_loss = float(target_loss) if target_loss is not None else None
+    log(f"[agg] Round {round_no}/{max_rounds}" + (f", target loss {target_loss}" if target_loss is not None else ""))
+
+    if not async_mode:
+        missing = [s for s in slots if not s.get("adapter_cid")]
+        if missing:
+            raise ValueError(
+                f"Slots {[s['slot_index'] for s in missing]} have no adapter_cid — "
+                "cannot aggregate yet."
+            )
+        log(f"[agg] {n_slots} slots with adapters.")
+    else:
+        log(f"[agg] Async mode: merging after {min_adapters} of {n_slots} adapters.")
+
+    job_work_dir = os.path.join(WORK_DIR, f"job_{job_id}", f"round_{round_no}")
+    shutil.rmtree(job_work_dir, ignore_errors=True)   # clean any previous attempt
+    with _state_lock:
+        state = _load_versions(job_id)
+    published = [v for v in state["versions"] if v.get("round", 1) == round_no]
+
+    # FedAvg needs two adapters; sync mode lets run_fedavg raise on fewer
+    threshold = max(min_adapters, 2) if async_mode else 0
+
+    merged_slots: dict[int, dict] = {}   # slot_index → {dir, samples, staleness, contributor}
+    version  = len(published)
+    deadline = time.monotonic() + ASYNC_TIMEOUT_S
+
+    # ── Resume: re-download adapters already folded into published versions ──
+    # A slot's staleness is the version it was first merged into.
+    first_merged: dict[int, int] = {}
+    for v in published:
+        for i in v["slots"]:
+            first_merged.setdefault(i, v["version"])
+    if first_merged:
+        log(f"[agg] Resuming after v{version - 1} ({len(first_merged)}/{n_slots} adapters merged).")
+    for slot in slots:
+        i = slot["slot_index"]
+        if i not in first_merged or not slot.get("adapter_cid"):
+            continue
+        dest = os.path.join(job_work_dir, f"adapter_{i}")
         download_adapter_zip(slot["adapter_cid"], dest)
-        adapter_dirs.append(dest)
-        shard_sizes.append(int(slot.get("shard_size") or 1))
-
-    # ── 3. Run FedAvg ─────────────────────────────────────────────────────────
-    merged_dir = os.path.join(job_work_dir, "merged_adapter")
-    log(f"[agg] Running FedAvg over {len(adapter_dirs)} adapters...")
-    run_fedavg(adapter_dirs, shard_sizes, merged_dir)
-    log(f"[agg] FedAvg complete. Merged adapter at: {merged_dir}")
-
-    # ── 4. Upload merged adapter to Pinata ────────────────────────────────────
-    log(f"[agg] Uploading merged adapter to IPFS...")
-    merged_cid = upload_adapter_dir(merged_dir, job_id)
-    log(f"[agg] Merged adapter CID: {merged_cid}")
-
-    # ── 5. Call completeFederatedJob() on-chain ───────────────────────────────
+        merged_slots[i] = {
+            "dir":         dest,
+            "samples":     effective_samples(dest, int(slot.get("shard_size") or 1)),
+            "staleness":   first_merged[i],
+            "contributor": slot.get("contributor_address"),
+        }
+
+    while not (published and published[-1]["final"]):
+        ready = [s for s in slots if s.get("adapter_cid")]
+        new   = [s for s in ready if s["slot_index"] not in merged_slots]
+
+        if new and len(ready) >= threshold:
+            # ── 2. Download newly arrived adapter ZIPs from IPFS ──────────────
+            for slot in new:
+                dest = os.path.join(job_work_dir, f"adapter_{slot['slot_index']}")
+                log(f"[agg] Downloading adapter for slot {slot['slot_index']}: {slot['adapter_cid']}")
+                download_adapter_zip(slot["adapter_cid"], dest)
+                shard_size = int(slot.get("shard_size") or 1)
+                samples    = effective_samples(dest, shard_size)
+                if samples < shard_size:
+                    log(f"[agg] Slot {slot['slot_index']} hit its time budget: weight {samples:.0f}/{shard_size} samples")
+                merged_slots[slot["slot_index"]] = {
+                    "dir":         dest,
+                    # Samples actually trained on (shard size unless time-capped)
+                    "samples":     samples,
+                    # Staleness = merged versions already published before it arrived
+                    "staleness":   version,
+                    "contributor": slot.get("contributor_address"),
+                }
+
+            # ── 3. Run FedAvg over everything received so far ─────────────────
+            entries    = [merged_slots[i] for i in sorted(merged_slots)]
+            is_final   = len(merged_slots) == n_slots
+            merged_dir = os.path.join(job_work_dir, f"merged_adapter_r{round_no}_v{version}")
+            contributors = [e["contributor"] for e in entries]
+            log(f"[agg] Running FedAvg r{round_no} v{version} over {len(entries)}/{n_slots} adapters...")
+            run_fedavg(
+                [e["dir"] for e in entries],
+                [e["samples"] for e in entries],
+                merged_dir,
+                staleness=[e["staleness"] for e in entries],
+                staleness_exponent=STALENESS_EXPONENT,
+                meta={
+                    "round":        round_no,
+                    "version":      version,
+                    "final":        is_final,
+                    "slots":        sorted(merged_slots),
+                    "contributors": contributors,
+                },
+            )
+            log(f"[agg] FedAvg v{version} complete. Merged adapter at: {merged_dir}")
+
+            # ── 4. Upload merged adapter to Pinata ────────────────────────────
+            log(f"[agg] Uploading merged adapter v{version} to IPFS...")
+            merged_cid = upload_adapter_dir(
+                merged_dir, job_id, version if async_mode else None, round_no
+            )
+            log(f"[agg] Merged adapter v{version} CID: {merged_cid} (contributors: {contributors})")
+            entry = {
+                "round":        round_no,
+                "version":      version,
+                "cid":          merged_cid,
+                "final":        is_final,
+                "slots":        sorted(merged_slots),
+                "contributors": contributors,
+            }
+            published.append(entry)
+            state["versions"].append(entry)
+            with _state_lock:
+                _save_versions(job_id, state)
+            version += 1
+
+            if is_final:
+                break
+
+        if not async_mode:
+            break
+        if time.monotonic() > deadline:
+            if not published:
+                raise TimeoutError(
+                    f"Only {len(merged_slots)} of {n_slots} adapters arrived within "
+                    f"{ASYNC_TIMEOUT_S}s — no merged version to finalize."
+                )
+            log(f"[agg] Deadline reached with {len(merged_slots)}/{n_slots} adapters — "
+                f"finalizing with v{published[-1]['version']}.")
+            break
+        time.sleep(POLL_SECONDS)
+        slots = _fetch_slots(job_id)
+
+    latest     = published[-1]
+    merged_cid = latest["cid"]
+    merged_dir = os.path.join(job_work_dir, f"merged_adapter_r{round_no}_v{latest['version']}")
+
+    # ── 5. Decide whether another federated round is needed ───────────────────
+    entries   = [merged_slots[i] for i in sorted(merged_slots)]
+    mean_loss = mean_train_loss([e["dir"] for e in entries], [e["samples"] for e in entries])
+    if mean_loss is not None:
+        log(f"[agg] Round {round_no} mean train loss: {mean_loss:.4f}")
+    loss_reached = target_loss is not None and mean_loss is not None and mean_loss <= target_loss
+    if round_no < max_rounds and not loss_reached:
+        log(f"[agg] Opening round {round_no + 1} with warm start {merged_cid}...")
+        _notify_backend_next_round(job_id, merged_cid, round_no + 1, "\n".join(log_lines))
+        shutil.rmtree(job_work_dir, ignore_errors=True)
+        log(f"[agg] ══ Round {round_no} complete for job {job_id} ══\n")
+        return
+
+    # ── 6. Optional: export full merged model (base + adapter) ────────────────
+    model_cid = None
+    if EXPORT_MERGED_MODEL and not os.path.isdir(merged_dir):
+        log(f"[warn] v{latest['version']} was merged before a restart — skipping model export.")
+    elif EXPORT_MERGED_MODEL:
+        model_name = slots[0].get("model_name")
+        log(f"[agg] Exporting merged model for {model_name}...")
+        try:
+            model_dir = export_merged_model(
+                model_name, merged_dir, os.path.join(job_work_dir, "merged_model"), job_work_dir
+            )
+            model_cid = upload_model_dir(model_dir, job_id)
+            log(f"[agg] Merged model CID: {model_cid}")
+        except Exception as e:
+            # The adapter is the contract deliverable — never fail the job on export
+            log(f"[warn] Merged model export failed: {e}")
+
+    # ── 7. Call completeFederatedJob() on-chain ───────────────────────────────
+    # The contract only completes once every adapter is submitted; a version
+    # finalized at the deadline is still recorded off-chain.
     log(f"[agg] Calling completeFederatedJob on-chain...")
-    tx_hash = complete_federated_job_on_chain(job_id, merged_cid)
-    log(f"[agg] On-chain tx confirmed: {tx_hash}")
+    try:
+        tx_hash = complete_federated_job_on_chain(job_id, merged_cid)
+        log(f"[agg] On-chain tx confirmed: {tx_hash}")
+    except Exception as e:
+        if latest["final"]:
+            raise
+        tx_hash = None
+        log(f"[agg] On-chain completion failed for partial v{latest['version']}: {e}")
 
-    # ── 6. Notify backend to update DB ────────────────────────────────────────
+    # ── 8. Notify backend to update DB ────────────────────────────────────────
     log(f"[agg] Notifying backend to finalize job {job_id}...")
     aggregation_log = "\n".join(log_lines)
-    _notify_backend_success(job_id, merged_cid, tx_hash, aggregation_log)
+    _notify_backend_success(job_id, merged_cid, tx_hash, aggregation_log, model_cid)
+    state["completed"] = True
+    with _state_lock:
+        _save_versions(job_id, state)
 
-    # ── 7. Cleanup temp files ─────────────────────────────────────────────────
-    shutil.rmtree(job_work_dir, ignore_errors=True)
+    # ── 9. Cleanup temp files ─────────────────────────────────────────────────
+    shutil.rmtree(os.path.join(WORK_DIR, f"job_{job_id}"), ignore_errors=True)
     log(f"[agg] ══ Aggregation complete for job {job_id} ══\n")
 
 
-def _notify_backend_success(job_id: int, merged_cid: str, tx_hash: str, log: str):
+def _notify_backend_success(
+    job_id: int, merged_cid: str, tx_hash: str, log: str, model_cid: str | None = None
+):
     try:
         resp = requests.post(
             f"{BACKEND_URL}/jobs/llm/finalize/{job_id}",
-            json={"mergedAdapterCid": merged_cid, "txHash": tx_hash, "aggregationLog": log},
+            json={
+                "mergedAdapterCid": merged_cid,
+                "mergedModelCid":   model_cid,
+                "txHash":           tx_hash,
+                "aggregationLog":   log,
+            },
             timeout=15,
         )
         resp.raise_for_status()
@@ -157,6 +407,17 @@ def _notify_backend_success(job_id: int, merged_cid: str, tx_hash: str, log: str
         print(f"[warn] Backend finalization call failed for job {job_id}: {e}")
 
 
+def _notify_backend_next_round(job_id: int, merged_cid: str, next_round: int, log: str):
+    # Not best-effort: if the backend never opens the round the job would stall
+    resp = requests.post(
+        f"{BACKEND_URL}/jobs/llm/next-round/{job_id}",
+        json={"mergedAdapterCid": merged_cid, "round": next_round, "aggregationLog": log},
+        timeout=15,
+    )
+    resp.raise_for_status()
+    print(f"[agg] Backend opened round {next_round} for job {job_id}")
+
+
 def _notify_backend_failure(job_id: int, error_msg: str):
     try:
         requests.post(
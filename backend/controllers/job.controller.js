@@ -1,8 +1,8 @@
 import { validationResult } from "express-validator";
-import { uploadFolderHandler, downloadFolderAsZip, uploadRawFile } from "../services/ipfs.services.js";
-import { createJob, insert_image_processing_table, getJobById, getJobs, get_image_processing_job, updateTrainedJobModel, JobsByRequester, updateJobStatus, ContributorHasInProgressJob, updateContributor, getJobByContributor, getAllJobsByContributor, confirmJobCreation, deleteUnconfirmedJob, initiateJobAcceptance, confirmJobAcceptance, revertJobAcceptance, getRetryInfo, getLlmFinetuneJob, acceptLlmJobSlot, getLlmJobSlots, getPendingLlmJobs, createLlmFinetuneJob, submitLlmAdapter, finalizeLlmJob, deleteUnconfirmedLlmJob, getLlmJobsByRequester, markLlmJobFailed, getMyLlmSlot, getContributorPool, getContributorProfileByAddress, getContributorHistoryByAddress, getContributorRatingsByAddress, getContributorRatingSummary, createContributorRating } from "../services/db.services.js";
+import { uploadFolderHandler, downloadFolderAsZip, getDatasetZip, uploadRawFile } from "../services/ipfs.services.js";
+import { createJob, insert_image_processing_table, getJobById, getJobs, get_image_processing_job, updateTrainedJobModel, JobsByRequester, updateJobStatus, ContributorHasInProgressJob, updateContributor, getJobByContributor, getAllJobsByContributor, confirmJobCreation, deleteUnconfirmedJob, initiateJobAcceptance, confirmJobAcceptance, revertJobAcceptance, getRetryInfo, getLlmFinetuneJob, acceptLlmJobSlot, getLlmJobSlots, getPendingLlmJobs, createLlmFinetuneJob, submitLlmAdapter, finalizeLlmJob, deleteUnconfirmedLlmJob, getLlmJobsByRequester, markLlmJobFailed, getMyLlmSlot, setLlmSlotThroughput, startNextLlmRound, getContributorPool, getContributorProfileByAddress, getContributorHistoryByAddress, getContributorRatingsByAddress, getContributorRatingSummary, createContributorRating } from "../services/db.services.js";
 import { completeJob, acceptFederatedJob, submitAdapter, completeFederatedJob } from "../utils/blockchain.js";
-import { shardDatasetForJob } from "../services/sharding.services.js";
+import { maybeShardLlmJob } from "../services/sharding.services.js";
 import axios from 'axios';
 import { calculateStake, validateReward, classifyModelTier } from "../utils/feeCalculator.js";
 
@@ -100,9 +100,38 @@ export const getDataset = async (req, res) => {
         }
 
         const folderCid = job.folder_cid;
-        const zipBuffer = await downloadFolderAsZip(folderCid);
+        // The CID is a content hash, so it is the archive's ETag: a trainer
+        // revalidating its dataset cache gets a 304 without an IPFS fetch
+        res.setHeader("ETag", `"${folderCid}"`);
+        if (req.fresh) {
+            return res.status(304).end();
+        }
+
+        const zipBuffer = await getDatasetZip(folderCid);
 
         res.setHeader("Content-Type", "application/zip");
+        res.setHeader("Accept-Ranges", "bytes");
+
+        // Single byte ranges let train_yolo.py read the central directory first,
+        // then stream only the member data it extracts. A suffix range longer
+        // than the archive selects all of it (RFC 7233 §2.1) — range-parser
+        // would reject it as unsatisfiable, so clamp it here.
+        const size   = zipBuffer.length;
+        const suffix = /^bytes=-(\d+)$/.exec(req.headers.range || "");
+        const ranges = suffix && Number(suffix[1]) > 0 && size > 0
+            ? Object.assign([{ start: Math.max(0, size - Number(suffix[1])), end: size - 1 }], { type: "bytes" })
+            : req.range(size);
+        if (ranges === -1) {
+            res.setHeader("Content-Range", `bytes */${size}`);
+            return res.status(416).end();
+        }
+        if (Array.isArray(ranges) && ranges.type === "bytes" && ranges.length === 1) {
+            const { start, end } = ranges[0];
+            res.setHeader("Content-Range", `bytes ${start}-${end}/${size}`);
+            res.status(206);
+            return res.end(zipBuffer.subarray(start, end + 1));
+        }
+
         res.setHeader("Content-Disposition", `attachment; filename="dataset_${jobId}.zip"`);
         // Remove Content-Length to avoid partial download
         res.status(200);
@@ -426,7 +455,8 @@ export const getContributorAllJobs = async (req, res) => {
  * Flow:
  *   1. Frontend calls this endpoint — backend reserves the DB slot
  *   2. Backend calls acceptFederatedJob() on-chain (owner signs on behalf of contributor)
- *   3. If last slot filled → kicks off dataset sharding in the background
+ *   3. If last slot filled → sharding starts once every contributor has
+ *      reported throughput (or the report wait expires) — see maybeShardLlmJob
  */
 export const acceptLlmSlotController = async (req, res) => {
     const errors = validationResult(req);
@@ -468,15 +498,11 @@ export const acceptLlmSlotController = async (req, res) => {
             console.error(`[Job ${jobId}] acceptFederatedJob on-chain FAILED for ${contributorAddress}:`, err.message);
         });
 
-        // If this was the last slot → shard the dataset
+        // If this was the last slot → shard the dataset (after throughput reports)
         if (llmJob.status === 'in_progress' || slot.slot_index + 1 >= llmJob.max_contributors) {
-            const slots = await getLlmJobSlots(jobId);
-            if (slots.length >= llmJob.max_contributors) {
-                console.log(`[Job ${jobId}] All slots filled — starting sharding`);
-                shardDatasetForJob(jobId, llmJob.dataset_cid, slots).catch(err => {
-                    console.error(`[Job ${jobId}] Sharding failed:`, err.message);
-                });
-            }
+            maybeShardLlmJob(jobId).catch(err => {
+                console.error(`[Job ${jobId}] Sharding failed:`, err.message);
+            });
         }
 
     } catch (error) {
@@ -515,13 +541,19 @@ export const getLlmShardController = async (req, res) => {
             return res.status(202).json({ message: 'Sharding is still in progress — try again in a few seconds' });
         }
 
-        // Proxy the shard ZIP from IPFS
-        const zipUrl = `https://gateway.pinata.cloud/ipfs/${slot.shard_cid}`;
-        const response = await axios.get(zipUrl, { responseType: 'arraybuffer', timeout: 60_000 });
+        // Proxy the shard from IPFS (ZIP, zstd JSONL or Parquet — told apart by magic bytes)
+        const shardUrl = `https://gateway.pinata.cloud/ipfs/${slot.shard_cid}`;
+        const response = await axios.get(shardUrl, { responseType: 'arraybuffer', timeout: 60_000 });
+        const data = Buffer.from(response.data);
+        const magic = data.subarray(0, 4).toString('hex');
+        const [ext, contentType] =
+            magic === '28b52ffd' ? ['jsonl.zst', 'application/zstd']
+            : magic === '50415231' ? ['parquet', 'application/vnd.apache.parquet']
+            : ['zip', 'application/zip'];
 
-        res.setHeader('Content-Type', 'application/zip');
-        res.setHeader('Content-Disposition', `attachment; filename="shard_${slot.slot_index}_job_${jobId}.zip"`);
-        res.status(200).end(Buffer.from(response.data), 'binary');
+        res.setHeader('Content-Type', contentType);
+        res.setHeader('Content-Disposition', `attachment; filename="shard_${slot.slot_index}_job_${jobId}.${ext}"`);
+        res.status(200).end(data, 'binary');
 
     } catch (error) {
         console.error('Error in getLlmShardController:', error);
@@ -561,6 +593,10 @@ export const getLlmJobsController = async (req, res) => {
  *   loraRank          integer  — default 8
  *   loraAlpha         integer  — default 16
  *   maxSeqLength      integer  — default 512
+ *   maxRounds         integer  — federated rounds, default 1
+ *   targetLoss        float    — optional; stop rounds early once reached
+ *   maxTrainMinutes   integer  — optional; per-round wall-clock budget per contributor
+ *   minAdapters       integer  — optional; K-of-N async aggregation (2 ≤ K < maxContributors)
  *   rewardPerContributor float — POL per contributor
  *   requesterAddress  string   — wallet address
  *
@@ -582,6 +618,10 @@ export const uploadLlmFinetuneJob = async (req, res) => {
         loraRank,
         loraAlpha,
         maxSeqLength,
+        maxRounds,
+        targetLoss,
+        maxTrainMinutes,
+        minAdapters,
         rewardPerContributor,
         requesterAddress,
     } = req.body;
@@ -603,6 +643,12 @@ export const uploadLlmFinetuneJob = async (req, res) => {
             return res.status(400).json({ message: validation.message });
         }
 
+        // K-of-N aggregation only makes sense strictly between 2 and N
+        const k = parseInt(minAdapters) || null;
+        if (k !== null && (k < 2 || k >= parseInt(maxContributors))) {
+            return res.status(400).json({ message: 'minAdapters must be at least 2 and below maxContributors' });
+        }
+
         // Calculate total stake the blockchain tx must send
         const breakdown = calculateStake(
             parseFloat(rewardPerContributor),
@@ -626,6 +672,10 @@ export const uploadLlmFinetuneJob = async (req, res) => {
             loraRank:        parseInt(loraRank)         || 8,
             loraAlpha:       parseInt(loraAlpha)        || 16,
             maxSeqLength:    parseInt(maxSeqLength)     || 512,
+            maxRounds:       parseInt(maxRounds)        || 1,
+            targetLoss:      parseFloat(targetLoss)     || null,
+            maxTrainMinutes: parseInt(maxTrainMinutes)  || null,
+            minAdapters:     k,
         });
 
         res.status(200).json({
@@ -714,39 +764,50 @@ export const submitAdapterController = async (req, res) => {
     try {
         // 1. Call submitAdapter() on-chain — owner signs on behalf of contributor.
         //    This must succeed before we store the CID so submittedCount tracks correctly.
+        //    Later federated rounds are off-chain; only the final merged CID is recorded.
         let txHash = null;
-        try {
-            const receipt = await submitAdapter(jobId, contributorAddress, adapterCid);
-            txHash = receipt.transactionHash;
-            console.log(`[Job ${jobId}] submitAdapter on-chain OK, tx: ${txHash}`);
-        } catch (chainErr) {
-            console.error(`[Job ${jobId}] submitAdapter on-chain FAILED:`, chainErr.message);
-            return res.status(502).json({
-                message: 'On-chain submitAdapter failed',
-                error: chainErr.message,
-            });
+        const llmJob = await getLlmFinetuneJob(jobId);
+        if (Number(llmJob?.current_round ?? 1) > 1) {
+            console.log(`[Job ${jobId}] Round ${llmJob.current_round} adapter — skipping on-chain submitAdapter`);
+        } else {
+            try {
+                const receipt = await submitAdapter(jobId, contributorAddress, adapterCid);
+                txHash = receipt.transactionHash;
+                console.log(`[Job ${jobId}] submitAdapter on-chain OK, tx: ${txHash}`);
+            } catch (chainErr) {
+                console.error(`[Job ${jobId}] submitAdapter on-chain FAILED:`, chainErr.message);
+                return res.status(502).json({
+                    message: 'On-chain submitAdapter failed',
+                    error: chainErr.message,
+                });
+            }
         }
 
         // 2. Record in DB
-        const { slot, allSubmitted } = await submitLlmAdapter(
+        const { slot, allSubmitted, quorumReached, minAdapters } = await submitLlmAdapter(
             jobId,
             contributorAddress,
             adapterCid,
             txHash
         );
 
+        // K-of-N jobs start aggregating from the K-th adapter on; every later
+        // arrival re-triggers too, which is a no-op while the service is
+        // already running the job and restarts it if it went away.
+        const startAggregation = allSubmitted || quorumReached;
+
         res.status(200).json({
-            message:      allSubmitted
-                ? 'Adapter submitted — all adapters received, aggregation starting'
+            message:      startAggregation
+                ? `Adapter submitted — ${allSubmitted ? 'all' : minAdapters} adapters received, aggregation starting`
                 : 'Adapter submitted successfully',
             slotIndex:    slot.slot_index,
             allSubmitted,
             txHash,
         });
 
-        // 3. Trigger aggregation if last adapter
-        if (allSubmitted) {
-            triggerAggregation(jobId).catch(err => {
+        // 3. Trigger aggregation at the last adapter (or from the K-th on, for K-of-N jobs)
+        if (startAggregation) {
+            triggerAggregation(jobId, minAdapters).catch(err => {
                 console.error(`[Job ${jobId}] Aggregation trigger failed:`, err.message);
             });
         }
@@ -906,11 +967,12 @@ export const createContributorRatingController = async (req, res) => {
 /**
  * Calls the aggregation microservice (Step 6) via HTTP.
  * The aggregation service runs as a separate Python process.
+ * minAdapters (K) switches it to K-of-N async mode; null waits for all N.
  *
  * If the microservice is not yet running (Step 6 not done), this logs a warning
  * and does nothing — the job stays in 'aggregating' status.
  */
-const triggerAggregation = async (jobId) => {
+const triggerAggregation = async (jobId, minAdapters = null) => {
     const AGGREGATION_URL = process.env.AGGREGATION_SERVICE_URL || 'http://localhost:5001';
 
     console.log(`[Job ${jobId}] Triggering aggregation at ${AGGREGATION_URL}/aggregate`);
@@ -918,7 +980,7 @@ const triggerAggregation = async (jobId) => {
     try {
         const response = await axios.post(
             `${AGGREGATION_URL}/aggregate`,
-            { job_id: jobId },
+            { job_id: Number(jobId), min_adapters: minAdapters ?? 0 },
             { timeout: 10_000 }     // just the trigger — aggregation itself is async
         );
         console.log(`[Job ${jobId}] Aggregation triggered:`, response.data);
@@ -949,22 +1011,46 @@ export const getLlmSlotsController = async (req, res) => {
     }
 };
 
+/**
+ * POST /jobs/llm/next-round/:jobId
+ * Body: { mergedAdapterCid, round, aggregationLog }
+ * Called by aggregation microservice when a multi-round job needs another round.
+ * Stores the merged adapter as the warm start and reopens every slot.
+ */
+export const nextRoundLlmJobController = async (req, res) => {
+    const { jobId } = req.params;
+    const { mergedAdapterCid, round, aggregationLog } = req.body;
+
+    if (!mergedAdapterCid || !round) {
+        return res.status(400).json({ message: 'mergedAdapterCid and round are required' });
+    }
+
+    try {
+        await startNextLlmRound(jobId, mergedAdapterCid, parseInt(round), aggregationLog ?? null);
+        res.status(200).json({ message: `Round ${round} opened`, jobId });
+    } catch (error) {
+        console.error('Error in nextRoundLlmJobController:', error);
+        res.status(500).json({ message: 'Server error', error: error.message });
+    }
+};
+
 /**
  * POST /jobs/llm/finalize/:jobId
- * Body: { mergedAdapterCid, txHash, aggregationLog }
+ * Body: { mergedAdapterCid, mergedModelCid?, txHash, aggregationLog }
  * Called by aggregation microservice on success.
- * Updates llm_finetune_jobs.merged_adapter_cid and jobs.status = 'completed'.
+ * Updates llm_finetune_jobs.merged_adapter_cid (+ merged_model_cid when the
+ * service exported the full model) and jobs.status = 'completed'.
  */
 export const finalizeLlmJobController = async (req, res) => {
     const { jobId } = req.params;
-    const { mergedAdapterCid, aggregationLog } = req.body;
+    const { mergedAdapterCid, mergedModelCid, aggregationLog } = req.body;
 
     if (!mergedAdapterCid) {
         return res.status(400).json({ message: 'mergedAdapterCid is required' });
     }
 
     try {
-        await finalizeLlmJob(jobId, mergedAdapterCid, aggregationLog ?? null);
+        await finalizeLlmJob(jobId, mergedAdapterCid, aggregationLog ?? null, mergedModelCid ?? null);
         res.status(200).json({ message: 'Job finalized successfully', jobId });
     } catch (error) {
         console.error('Error in finalizeLlmJobController:', error);
@@ -988,6 +1074,41 @@ export const aggregationFailedController = async (req, res) => {
         res.status(500).json({ message: 'Server error', error: err.message });
     }
 };
+/**
+ * POST /jobs/llm/report-throughput
+ * Body: { jobId, contributorAddress, tokensPerSec, device }
+ * Called by the desktop app (training/throughput_probe.py) while the job waits
+ * for sharding. Shards are sized in proportion to the reported tokens/sec;
+ * the last report of a full job starts sharding.
+ */
+export const reportThroughputController = async (req, res) => {
+    const errors = validationResult(req);
+    if (!errors.isEmpty()) {
+        return res.status(400).json({ errors: errors.array() });
+    }
+
+    const { jobId, contributorAddress, tokensPerSec, device } = req.body;
+    try {
+        const slot = await setLlmSlotThroughput(
+            jobId, contributorAddress, parseFloat(tokensPerSec), device === 'cuda' ? 'cuda' : 'cpu'
+        );
+        if (!slot) {
+            return res.status(409).json({ message: 'No unsharded slot for this contributor and job' });
+        }
+        console.log(`[Job ${jobId}] Throughput from ${contributorAddress}: ${slot.tokens_per_sec} tokens/sec (${slot.throughput_device})`);
+        res.status(200).json({ message: 'Throughput recorded', tokensPerSec: slot.tokens_per_sec });
+
+        maybeShardLlmJob(jobId).catch(err => {
+            console.error(`[Job ${jobId}] Sharding failed:`, err.message);
+        });
+    } catch (error) {
+        console.error('Error in reportThroughputController:', error);
+        if (!res.headersSent) {
+            res.status(500).json({ message: 'Server error', error: error.message });
+        }
+    }
+};
+
 /**
  * GET /jobs/llm/my-slot
  * Query: ?contributorAddress=0x...
@@ -1004,6 +1125,12 @@ export const getMyLlmSlotController = async (req, res) => {
         if (!slot) {
             return res.status(204).json({ message: 'No active LLM slot found' });
         }
+        if (!slot.shard_cid) {
+            // Re-arms sharding if the report-wait timer was lost (e.g. server restart)
+            maybeShardLlmJob(slot.job_id).catch(err => {
+                console.error(`[Job ${slot.job_id}] Sharding failed:`, err.message);
+            });
+        }
         res.status(200).json(slot);
     } catch (error) {
         console.error('Error in getMyLlmSlotController:', error);
@@ -0,0 +1,6 @@
+-- Buffered K-of-N (asynchronous) aggregation
+-- Once min_adapters of a round's adapters are in, the backend triggers the
+-- aggregation service, which publishes a merged version right away and folds
+-- later arrivals into follow-up versions (staleness-discounted).
+ALTER TABLE llm_finetune_jobs
+    ADD COLUMN IF NOT EXISTS min_adapters SMALLINT CHECK (min_adapters >= 2);   -- NULL = wait for every contributor
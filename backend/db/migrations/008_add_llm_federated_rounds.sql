@@ -0,0 +1,7 @@
+-- Multi-round federated training
+-- Each round, contributors warm-start from the previous round's merged adapter
+-- (llm_finetune_jobs.merged_adapter_cid) and submit a fresh adapter.
+ALTER TABLE llm_finetune_jobs
+    ADD COLUMN IF NOT EXISTS current_round SMALLINT NOT NULL DEFAULT 1,
+    ADD COLUMN IF NOT EXISTS max_rounds    SMALLINT NOT NULL DEFAULT 1 CHECK (max_rounds BETWEEN 1 AND 20),
+    ADD COLUMN IF NOT EXISTS target_loss   NUMERIC(10, 6);          -- stop early once the merged train loss reaches this
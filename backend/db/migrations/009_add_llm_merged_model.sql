@@ -0,0 +1,4 @@
+-- Full merged model (base weights + final adapter) exported by the aggregation
+-- service when EXPORT_MERGED_MODEL=1; the adapter stays the deliverable.
+ALTER TABLE llm_finetune_jobs
+    ADD COLUMN IF NOT EXISTS merged_model_cid TEXT;   -- NULL = not exported
@@ -0,0 +1,6 @@
+-- Per-round wall-clock budget for contributor training
+-- train_llm.py measures its own throughput and caps optimizer steps so each
+-- contributor finishes within this many minutes; the steps actually completed
+-- are reported in the adapter's train_metrics.json and used as FedAvg weights.
+ALTER TABLE llm_finetune_jobs
+    ADD COLUMN IF NOT EXISTS max_train_minutes INTEGER CHECK (max_train_minutes > 0);   -- NULL = no deadline
@@ -0,0 +1,8 @@
+-- Contributor throughput reported before sharding
+-- The desktop app runs a short calibrated micro-benchmark (throughput_probe.py)
+-- while the job waits for its last contributor; the dataset is then split in
+-- proportion to tokens_per_sec so every contributor finishes at about the same time.
+ALTER TABLE llm_contributor_slots
+    ADD COLUMN IF NOT EXISTS tokens_per_sec         REAL CHECK (tokens_per_sec > 0),   -- NULL = not reported
+    ADD COLUMN IF NOT EXISTS throughput_device      VARCHAR(10),                       -- cpu | cuda
+    ADD COLUMN IF NOT EXISTS throughput_reported_at TIMESTAMPTZ;
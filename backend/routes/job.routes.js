@@ -1,7 +1,7 @@
 import express from "express";
 import { query, body, param } from "express-validator";
 import multer from "multer";
-import { uploadImageProcessingJob, getDataset, getJobsController, getImageProcessingJobDetails, uploadModelController, getRequesterRequests, getModel, jobApply, getContributorJob, getContributorAllJobs, confirmJobController, deleteUnconfirmedJobController, retryInfoController, jobApplyInitiate, jobApplyConfirm, jobApplyRevert, acceptLlmSlotController, getLlmShardController, getLlmJobsController, uploadLlmFinetuneJob, confirmLlmJobController, deleteLlmJobController, submitAdapterController, getLlmRequesterJobsController, getLlmSlotsController, finalizeLlmJobController, aggregationFailedController, getMyLlmSlotController, uploadAdapterController, getContributorPoolController, getContributorProfileController, getContributorHistoryController, getContributorRatingsController, createContributorRatingController } from "../controllers/job.controller.js";
+import { uploadImageProcessingJob, getDataset, getJobsController, getImageProcessingJobDetails, uploadModelController, getRequesterRequests, getModel, jobApply, getContributorJob, getContributorAllJobs, confirmJobController, deleteUnconfirmedJobController, retryInfoController, jobApplyInitiate, jobApplyConfirm, jobApplyRevert, acceptLlmSlotController, getLlmShardController, getLlmJobsController, uploadLlmFinetuneJob, confirmLlmJobController, deleteLlmJobController, submitAdapterController, getLlmRequesterJobsController, getLlmSlotsController, finalizeLlmJobController, nextRoundLlmJobController, aggregationFailedController, getMyLlmSlotController, reportThroughputController, uploadAdapterController, getContributorPoolController, getContributorProfileController, getContributorHistoryController, getContributorRatingsController, createContributorRatingController } from "../controllers/job.controller.js";
 
 const router = express.Router();
 const upload = multer({ storage: multer.memoryStorage() });
@@ -184,6 +184,7 @@ router.post(
 // Used by aggregation microservice
 router.get('/llm/slots/:jobId', getLlmSlotsController);
 router.post('/llm/finalize/:jobId', finalizeLlmJobController);
+router.post('/llm/next-round/:jobId', nextRoundLlmJobController);
 router.post('/llm/aggregation-failed/:jobId', aggregationFailedController);
 
 // Used by contributor desktop app
@@ -192,6 +193,15 @@ router.get(
     query('contributorAddress').notEmpty().withMessage('contributorAddress is required'),
     getMyLlmSlotController
 );
+router.post(
+    '/llm/report-throughput',
+    [
+        body('jobId').isInt().withMessage('jobId must be an integer'),
+        body('contributorAddress').notEmpty().withMessage('contributorAddress is required'),
+        body('tokensPerSec').isFloat({ gt: 0 }).withMessage('tokensPerSec must be > 0'),
+    ],
+    reportThroughputController
+);
 router.post(
     '/llm/upload-adapter',
     upload.array('file'),
@@ -401,8 +401,9 @@ export const createLlmFinetuneJob = async (job) => {
 
         await client.query(
             `INSERT INTO llm_finetune_jobs
-             (job_id, model_name, max_contributors, epochs, learning_rate, lora_rank, lora_alpha, max_seq_length, dataset_cid)
-             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)`,
+             (job_id, model_name, max_contributors, epochs, learning_rate, lora_rank, lora_alpha, max_seq_length, dataset_cid,
+              max_rounds, target_loss, max_train_minutes, min_adapters)
+             VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)`,
             [
                 createdJob.id,
                 job.modelName,
@@ -413,6 +414,10 @@ export const createLlmFinetuneJob = async (job) => {
                 job.loraAlpha     ?? 16,
                 job.maxSeqLength  ?? 512,
                 job.datasetCid,
+                job.maxRounds     ?? 1,
+                job.targetLoss    ?? null,
+                job.maxTrainMinutes ?? null,
+                job.minAdapters   ?? null,
             ]
         );
 
@@ -435,7 +440,9 @@ export const getLlmFinetuneJob = async (jobId) => {
         const result = await db.query(
             `SELECT j.*, lf.model_name, lf.max_contributors, lf.epochs, lf.learning_rate,
                     lf.lora_rank, lf.lora_alpha, lf.max_seq_length, lf.dataset_cid,
-                    lf.total_samples, lf.merged_adapter_cid, lf.aggregation_log
+                    lf.total_samples, lf.merged_adapter_cid, lf.merged_model_cid, lf.aggregation_log,
+                    lf.current_round, lf.max_rounds, lf.target_loss, lf.max_train_minutes,
+                    lf.min_adapters
              FROM jobs j
              JOIN llm_finetune_jobs lf ON lf.job_id = j.id
              WHERE j.id = $1`,
@@ -564,10 +571,32 @@ export const setLlmSlotShardCid = async (jobId, contributorAddress, shardCid, sh
     }
 };
 
+/**
+ * Store the training throughput a contributor's app measured before sharding.
+ * Only accepted before the shard is assigned — later reports cannot resize it.
+ */
+export const setLlmSlotThroughput = async (jobId, contributorAddress, tokensPerSec, device) => {
+    try {
+        const result = await db.query(
+            `UPDATE llm_contributor_slots
+             SET tokens_per_sec = $1, throughput_device = $2, throughput_reported_at = NOW()
+             WHERE job_id = $3 AND LOWER(contributor_address) = LOWER($4) AND shard_cid IS NULL
+             RETURNING *`,
+            [tokensPerSec, device, jobId, contributorAddress]
+        );
+        return result.rows[0] ?? null;
+    } catch (error) {
+        console.error('Error setting slot throughput:', error);
+        throw error;
+    }
+};
+
 /**
  * Record a submitted adapter CID from a contributor.
  * Updates both llm_contributor_slots and checks if all adapters are in.
- * Returns { slot, allSubmitted: boolean }
+ * Returns { slot, allSubmitted: boolean, quorumReached: boolean, minAdapters }
+ * quorumReached is true once at least min_adapters adapters are in (K-of-N
+ * jobs); the aggregation service ignores triggers for a job it is already running.
  */
 export const submitLlmAdapter = async (jobId, contributorAddress, adapterCid, txHash) => {
     const client = await db.connect();
@@ -577,7 +606,8 @@ export const submitLlmAdapter = async (jobId, contributorAddress, adapterCid, tx
 
         const slotRes = await client.query(
             `UPDATE llm_contributor_slots
-             SET adapter_cid = $1, status = 'submitted', submitted_at = NOW(), tx_hash = $2
+             SET adapter_cid = $1, status = 'submitted', submitted_at = NOW(),
+                 tx_hash = COALESCE($2, tx_hash)
              WHERE job_id = $3 AND contributor_address = $4
              RETURNING *`,
             [adapterCid, txHash ?? null, jobId, contributorAddress.toLowerCase()]
@@ -587,17 +617,21 @@ export const submitLlmAdapter = async (jobId, contributorAddress, adapterCid, tx
 
         // Check if all adapters are now submitted
         const checkRes = await client.query(
-            `SELECT lf.max_contributors,
+            `SELECT lf.max_contributors, lf.min_adapters,
                     COUNT(ls.adapter_cid) AS submitted
              FROM llm_finetune_jobs lf
              JOIN llm_contributor_slots ls ON ls.job_id = lf.job_id
              WHERE lf.job_id = $1
-             GROUP BY lf.max_contributors`,
+             GROUP BY lf.max_contributors, lf.min_adapters`,
             [jobId]
         );
 
-        const { max_contributors, submitted } = checkRes.rows[0];
-        const allSubmitted = Number(submitted) >= Number(max_contributors);
+        const { max_contributors, min_adapters, submitted } = checkRes.rows[0];
+        const allSubmitted  = Number(submitted) >= Number(max_contributors);
+        const minAdapters   = min_adapters != null && Number(min_adapters) < Number(max_contributors)
+            ? Number(min_adapters)
+            : null;
+        const quorumReached = minAdapters != null && Number(submitted) >= minAdapters;
 
         const jobResult = await client.query(
             `SELECT requester_address, job_type, reward
@@ -634,7 +668,7 @@ export const submitLlmAdapter = async (jobId, contributorAddress, adapterCid, tx
                 console.error('Error recording submitted adapter history:', historyError);
             }
         }
-        return { slot: slotRes.rows[0], allSubmitted };
+        return { slot: slotRes.rows[0], allSubmitted, quorumReached, minAdapters };
     } catch (error) {
         await client.query('ROLLBACK');
         console.error('Error submitting adapter:', error);
@@ -656,7 +690,9 @@ export const getMyLlmSlot = async (contributorAddress) => {
                     ls.status AS slot_status, ls.adapter_cid, ls.accepted_at,
                     j.reward, j.status AS job_status, j.folder_cid, j.metadata_cid,
                     lf.model_name, lf.max_contributors, lf.epochs, lf.learning_rate,
-                    lf.lora_rank, lf.lora_alpha, lf.max_seq_length
+                    lf.lora_rank, lf.lora_alpha, lf.max_seq_length,
+                    lf.current_round, lf.max_rounds, lf.merged_adapter_cid,
+                    lf.max_train_minutes, ls.tokens_per_sec
              FROM llm_contributor_slots ls
              JOIN jobs j ON j.id = ls.job_id
              JOIN llm_finetune_jobs lf ON lf.job_id = ls.job_id
@@ -676,8 +712,9 @@ export const getMyLlmSlot = async (contributorAddress) => {
 
 /**
  * Store aggregation result after FedAvg completes.
+ * mergedModelCid is the optional full-model export (base + adapter), or null.
  */
-export const finalizeLlmJob = async (jobId, mergedAdapterCid, aggregationLog) => {
+export const finalizeLlmJob = async (jobId, mergedAdapterCid, aggregationLog, mergedModelCid = null) => {
     const client = await db.connect();
     try {
         await client.query('BEGIN');
@@ -693,9 +730,9 @@ export const finalizeLlmJob = async (jobId, mergedAdapterCid, aggregationLog) =>
 
         await client.query(
             `UPDATE llm_finetune_jobs
-             SET merged_adapter_cid = $1, aggregation_log = $2
-             WHERE job_id = $3`,
-            [mergedAdapterCid, aggregationLog ?? null, jobId]
+             SET merged_adapter_cid = $1, aggregation_log = $2, merged_model_cid = $3
+             WHERE job_id = $4`,
+            [mergedAdapterCid, aggregationLog ?? null, mergedModelCid ?? null, jobId]
         );
 
         await client.query(
@@ -735,13 +772,58 @@ export const finalizeLlmJob = async (jobId, mergedAdapterCid, aggregationLog) =>
     }
 };
 
+/**
+ * Open the next federated round after an intermediate FedAvg.
+ * The merged adapter becomes the warm start for every contributor, and each
+ * slot is reset so its contributor trains and submits again.
+ */
+export const startNextLlmRound = async (jobId, mergedAdapterCid, round, aggregationLog) => {
+    const client = await db.connect();
+    try {
+        await client.query('BEGIN');
+
+        const jobRes = await client.query(
+            `UPDATE llm_finetune_jobs
+             SET current_round = $1, merged_adapter_cid = $2, aggregation_log = $3
+             WHERE job_id = $4
+             RETURNING current_round`,
+            [round, mergedAdapterCid, aggregationLog ?? null, jobId]
+        );
+        if (!jobRes.rows[0]) throw new Error('LLM job not found');
+
+        await client.query(
+            `UPDATE llm_contributor_slots
+             SET adapter_cid = NULL, submitted_at = NULL, status = 'accepted'
+             WHERE job_id = $1`,
+            [jobId]
+        );
+
+        await client.query(
+            `UPDATE jobs SET status = 'in_progress' WHERE id = $1`,
+            [jobId]
+        );
+
+        await client.query('COMMIT');
+    } catch (error) {
+        await client.query('ROLLBACK');
+        console.error('Error opening next LLM round:', error);
+        throw error;
+    } finally {
+        client.release();
+    }
+};
+
 /**
  * Get all slots for a job — used by aggregation service to collect adapter CIDs.
  */
 export const getLlmJobSlots = async (jobId) => {
     try {
         const result = await db.query(
-            `SELECT * FROM llm_contributor_slots WHERE job_id = $1 ORDER BY slot_index ASC`,
+            `SELECT ls.*, lf.model_name, lf.current_round, lf.max_rounds, lf.target_loss
+             FROM llm_contributor_slots ls
+             JOIN llm_finetune_jobs lf ON lf.job_id = ls.job_id
+             WHERE ls.job_id = $1
+             ORDER BY ls.slot_index ASC`,
             [jobId]
         );
         return result.rows;
@@ -1143,7 +1225,7 @@ export const getLlmJobsByRequester = async (requesterAddress) => {
     try {
         const result = await db.query(
             `SELECT j.*, lf.model_name, lf.max_contributors, lf.epochs,
-                    lf.merged_adapter_cid,
+                    lf.merged_adapter_cid, lf.merged_model_cid,
                     (SELECT COUNT(*) FROM llm_contributor_slots WHERE job_id = j.id) AS filled_slots
              FROM jobs j
              JOIN llm_finetune_jobs lf ON lf.job_id = j.id
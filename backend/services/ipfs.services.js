@@ -104,6 +104,53 @@ export const downloadFolderAsZip = async (folderCid) => {
   }
 };
 
+// Dataset ZIPs fetched recently, keyed by CID. CIDs are content-addressed, so
+// an entry can never be stale; the cache only lets a trainer's ranged reads
+// of one archive (central directory, then body) hit the gateway once.
+const DATASET_CACHE_TTL_MS    = Number(process.env.DATASET_CACHE_TTL_SECONDS || 600) * 1000;
+const DATASET_CACHE_MAX_BYTES = Number(process.env.DATASET_CACHE_MB || 1024) * 1024 * 1024;
+const datasetZipCache = new Map();   // cid -> { promise, size, expires }
+
+const pruneDatasetZipCache = () => {
+  const now = Date.now();
+  let total = 0;
+  for (const [cid, entry] of datasetZipCache) {
+    if (entry.expires < now) datasetZipCache.delete(cid);
+    else total += entry.size;
+  }
+  // Map iteration is insertion order: drop the oldest until under the cap
+  for (const [cid, entry] of datasetZipCache) {
+    if (total <= DATASET_CACHE_MAX_BYTES) break;
+    datasetZipCache.delete(cid);
+    total -= entry.size;
+  }
+};
+
+/**
+ * downloadFolderAsZip() through a short-lived in-memory cache. Concurrent
+ * requests for the same CID share one gateway fetch.
+ */
+export const getDatasetZip = async (folderCid) => {
+  pruneDatasetZipCache();
+  const cached = datasetZipCache.get(folderCid);
+  if (cached) {
+    cached.expires = Date.now() + DATASET_CACHE_TTL_MS;
+    return cached.promise;
+  }
+
+  const entry = { promise: downloadFolderAsZip(folderCid), size: 0, expires: Date.now() + DATASET_CACHE_TTL_MS };
+  datasetZipCache.set(folderCid, entry);
+  try {
+    const buffer = await entry.promise;
+    entry.size = buffer.length;
+    pruneDatasetZipCache();
+    return buffer;
+  } catch (error) {
+    datasetZipCache.delete(folderCid);
+    throw error;
+  }
+};
+
 /**
  * Upload a single file buffer directly to Pinata without any re-zipping.
  * Used by uploadAdapterController so the aggregation service can extract
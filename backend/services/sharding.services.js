@@ -1,7 +1,26 @@
 import JSZip from 'jszip';
+import zlib from 'zlib';
 import axios from 'axios';
 import FormData from 'form-data';
-import { setLlmSlotShardCid, getLlmJobSlots } from './db.services.js';
+import { setLlmSlotShardCid, getLlmJobSlots, getLlmFinetuneJob } from './db.services.js';
+
+// How long to wait for throughput reports once every slot is filled before
+// sharding anyway (missing reports count as the median reported speed)
+const BENCHMARK_WAIT_MS = Number(process.env.SHARD_BENCHMARK_WAIT_SECONDS ?? 600) * 1000;
+
+// A contributor's shard is at most this many times the median share, so one
+// outlier (or an inflated report) cannot take most of the dataset
+const MAX_CAPACITY_SKEW = 4;
+
+// Shard container: 'zip' (JSONL in a DEFLATE ZIP, the default) or 'zstd'
+// (zstd-compressed JSONL, smaller and read in place by train_llm.py). zstd
+// needs a Node build with zlib.zstdCompressSync (≥ 22.15); otherwise ZIP is used.
+const SHARD_FORMAT = (process.env.SHARD_FORMAT || 'zip').toLowerCase();
+const ZSTD_LEVEL = 9;
+
+// Jobs currently being sharded / waiting on a report timer (per process)
+const shardingInFlight = new Set();
+const shardingTimers = new Map();
 
 // ─────────────────────────────────────────────────────────────────────────────
 // Internal helpers
@@ -97,17 +116,26 @@ const parseDataFile = (content, ext) => {
 };
 
 /**
- * Split an array into N roughly equal chunks.
- * The last chunk gets any remainder rows.
+ * Split an array into N chunks sized in proportion to `weights`
+ * (equal weights when omitted). Sizes are rounded by largest remainder and
+ * every chunk gets at least one row.
  */
-const splitIntoShards = (rows, n) => {
-    const baseSize = Math.floor(rows.length / n);
-    const remainder = rows.length % n;
+const splitIntoShards = (rows, n, weights = null) => {
+    const w = weights ?? Array(n).fill(1);
+    const total = w.reduce((a, b) => a + b, 0);
+    const spare = rows.length - n;                     // rows beyond the 1-row minimum
+
+    const exact = w.map(x => (spare * x) / total);
+    const sizes = exact.map(x => 1 + Math.floor(x));
+    let left = rows.length - sizes.reduce((a, b) => a + b, 0);
+    const byRemainder = exact
+        .map((x, i) => [x - Math.floor(x), i])
+        .sort((a, b) => b[0] - a[0]);
+    for (let k = 0; left > 0; k++, left--) sizes[byRemainder[k % n][1]] += 1;
 
     const shards = [];
     let offset = 0;
-    for (let i = 0; i < n; i++) {
-        const size = baseSize + (i < remainder ? 1 : 0);
+    for (const size of sizes) {
         shards.push(rows.slice(offset, offset + size));
         offset += size;
     }
@@ -115,22 +143,56 @@ const splitIntoShards = (rows, n) => {
 };
 
 /**
- * Pack a shard array into a ZIP buffer (single shard.jsonl file inside).
+ * Per-slot sharding weights from reported tokens/sec. Unreported slots get
+ * the median of the reported ones; weights are clamped to MAX_CAPACITY_SKEW
+ * around the median. Returns null (equal split) when nobody reported.
  */
-const packShardAsZip = async (shardRows, shardIndex) => {
-    const zip = new JSZip();
+const capacityWeights = (slots) => {
+    const reported = slots
+        .map(s => Number(s.tokens_per_sec))
+        .filter(x => Number.isFinite(x) && x > 0)
+        .sort((a, b) => a - b);
+    if (reported.length === 0) return null;
+
+    const mid = Math.floor(reported.length / 2);
+    const median = reported.length % 2 ? reported[mid] : (reported[mid - 1] + reported[mid]) / 2;
+    return slots.map(s => {
+        const x = Number(s.tokens_per_sec);
+        const v = Number.isFinite(x) && x > 0 ? x : median;
+        return Math.min(Math.max(v, median / MAX_CAPACITY_SKEW), median * MAX_CAPACITY_SKEW);
+    });
+};
+
+/**
+ * Pack a shard array as SHARD_FORMAT.
+ * Returns { buffer, ext, contentType } — ext is the upload file extension.
+ */
+const packShard = async (shardRows, shardIndex) => {
     const jsonl = shardRows.map(row => JSON.stringify(row)).join('\n');
+
+    if (SHARD_FORMAT === 'zstd' && typeof zlib.zstdCompressSync === 'function') {
+        const buffer = zlib.zstdCompressSync(Buffer.from(jsonl, 'utf-8'), {
+            params: { [zlib.constants.ZSTD_c_compressionLevel]: ZSTD_LEVEL },
+        });
+        return { buffer, ext: 'jsonl.zst', contentType: 'application/zstd' };
+    }
+    if (SHARD_FORMAT === 'zstd' && shardIndex === 0) {
+        console.warn('[Shard] SHARD_FORMAT=zstd needs Node ≥ 22.15 — falling back to ZIP');
+    }
+
+    const zip = new JSZip();
     zip.file(`shard_${shardIndex}.jsonl`, jsonl);
-    return await zip.generateAsync({ type: 'nodebuffer', compression: 'DEFLATE' });
+    const buffer = await zip.generateAsync({ type: 'nodebuffer', compression: 'DEFLATE' });
+    return { buffer, ext: 'zip', contentType: 'application/zip' };
 };
 
 /**
  * Upload a single buffer to Pinata as a named file.
  * Returns the IPFS CID (IpfsHash).
  */
-const uploadBufferToPinata = async (buffer, fileName) => {
+const uploadBufferToPinata = async (buffer, fileName, contentType = 'application/zip') => {
     const formData = new FormData();
-    formData.append('file', buffer, { filename: fileName, contentType: 'application/zip' });
+    formData.append('file', buffer, { filename: fileName, contentType });
 
     const headers = {
         pinata_api_key: process.env.PINATA_API_Key,
@@ -185,8 +247,12 @@ export const shardDatasetForJob = async (jobId, datasetCid, slots) => {
         );
     }
 
-    // 4. Split into N shards
-    const shards = splitIntoShards(allRows, slots.length);
+    // 4. Split into N shards, sized by each contributor's reported throughput
+    const weights = capacityWeights(slots);
+    if (weights) {
+        console.log(`[Shard] Capacity weights (tokens/sec): ${weights.map(w => w.toFixed(0)).join(', ')}`);
+    }
+    const shards = splitIntoShards(allRows, slots.length, weights);
 
     // 5. Upload each shard and update DB
     const results = [];
@@ -196,8 +262,8 @@ export const shardDatasetForJob = async (jobId, datasetCid, slots) => {
 
         console.log(`[Shard] Uploading shard ${i} (${shardRows.length} rows) for ${slot.contributor_address}`);
 
-        const zipBuffer = await packShardAsZip(shardRows, i);
-        const shardCid = await uploadBufferToPinata(zipBuffer, `job_${jobId}_shard_${i}.zip`);
+        const { buffer, ext, contentType } = await packShard(shardRows, i);
+        const shardCid = await uploadBufferToPinata(buffer, `job_${jobId}_shard_${i}.${ext}`, contentType);
 
         await setLlmSlotShardCid(jobId, slot.contributor_address, shardCid, shardRows.length);
 
@@ -207,4 +273,54 @@ export const shardDatasetForJob = async (jobId, datasetCid, slots) => {
 
     console.log(`[Shard] All ${slots.length} shards uploaded for job ${jobId}`);
     return results;
-};
\ No newline at end of file
+};
+
+/**
+ * Start sharding a job once it is ready: every slot filled, no shard assigned
+ * yet, and either every contributor has reported throughput or
+ * BENCHMARK_WAIT_MS has passed since the last slot was accepted (a timer is
+ * armed for that case). Safe to call repeatedly — from accept-slot,
+ * report-throughput and my-slot polls (which recover after a restart).
+ *
+ * Returns true when sharding was started by this call.
+ */
+export const maybeShardLlmJob = async (jobId) => {
+    const key = Number(jobId);
+    if (shardingInFlight.has(key)) return false;
+
+    const llmJob = await getLlmFinetuneJob(key);
+    if (!llmJob) return false;
+    const slots = await getLlmJobSlots(key);
+    if (slots.length < llmJob.max_contributors || slots.some(s => s.shard_cid)) return false;
+
+    const allReported = slots.every(s => s.tokens_per_sec);
+    const lastAccepted = Math.max(...slots.map(s => new Date(s.accepted_at).getTime()));
+    const waitLeft = lastAccepted + BENCHMARK_WAIT_MS - Date.now();
+    if (!allReported && waitLeft > 0) {
+        if (!shardingTimers.has(key)) {
+            const reported = slots.filter(s => s.tokens_per_sec).length;
+            console.log(
+                `[Job ${key}] All slots filled — waiting up to ${Math.ceil(waitLeft / 1000)}s ` +
+                `for throughput reports (${reported}/${slots.length})`
+            );
+            shardingTimers.set(key, setTimeout(() => {
+                shardingTimers.delete(key);
+                maybeShardLlmJob(key).catch(err => {
+                    console.error(`[Job ${key}] Sharding failed:`, err.message);
+                });
+            }, waitLeft));
+        }
+        return false;
+    }
+
+    clearTimeout(shardingTimers.get(key));
+    shardingTimers.delete(key);
+    shardingInFlight.add(key);
+    console.log(`[Job ${key}] Starting sharding`);
+    shardDatasetForJob(key, llmJob.dataset_cid, slots)
+        .catch(err => {
+            console.error(`[Job ${key}] Sharding failed:`, err.message);
+        })
+        .finally(() => shardingInFlight.delete(key));
+    return true;
+};
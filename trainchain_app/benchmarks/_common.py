@@ -0,0 +1,170 @@
+"""
+_common.py — Shared helpers for the offline training benchmarks.
+
+Everything here works without network access: models are randomly
+initialised from configs, data is synthetic, and the tokenizer is a small
+BPE trained on the synthetic corpus itself.
+"""
+
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import psutil
+
+BENCH_DIR    = Path(__file__).resolve().parent
+APP_DIR      = BENCH_DIR.parent
+TRAINING_DIR = APP_DIR / "training"
+RESULTS_DIR  = BENCH_DIR / "results"
+
+# train_llm.py / train_yolo.py and their helpers are imported, not copied,
+# so the benchmarks always measure the code that ships
+for _p in (str(TRAINING_DIR), str(APP_DIR)):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+_WORDS = (
+    "the model data train loss token batch layer weight gradient sample shard "
+    "adapter round merge learning rate epoch image label box class network "
+    "contributor federated chain block reward compute memory speed cache"
+).split()
+
+
+def peak_rss_mb() -> float:
+    """Process peak resident set size in MB."""
+    info = psutil.Process().memory_info()
+    if hasattr(info, "peak_wset"):   # Windows
+        return info.peak_wset / 1024 ** 2
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _sentence(rng: random.Random, lo: int, hi: int) -> str:
+    return " ".join(rng.choice(_WORDS) for _ in range(rng.randint(lo, hi)))
+
+
+def write_alpaca_jsonl(path: Path, n: int, seed: int = 0) -> Path:
+    """Synthetic Alpaca shard with a long-tailed length mix like real instruction data."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as fh:
+        for _ in range(n):
+            long_answer = rng.random() < 0.15
+            fh.write(json.dumps({
+                "instruction": _sentence(rng, 5, 25),
+                "input":       _sentence(rng, 0, 30) if rng.random() < 0.4 else "",
+                "output":      _sentence(rng, 80, 300) if long_answer else _sentence(rng, 5, 60),
+            }) + "\n")
+    return path
+
+
+def convert_shard(jsonl_path: Path, fmt: str) -> Path:
+    """Re-encode a JSONL shard as zstd JSONL or Parquet (shard_formats.py formats)."""
+    if fmt == "jsonl":
+        return jsonl_path
+    import pyarrow as pa
+    import pyarrow.json as pj
+    import pyarrow.parquet as pq
+
+    if fmt == "zstd":
+        out = jsonl_path.with_suffix(".jsonl.zst")
+        with pa.CompressedOutputStream(str(out), "zstd") as sink:
+            sink.write(jsonl_path.read_bytes())
+        return out
+    out = jsonl_path.with_suffix(".parquet")
+    pq.write_table(pj.read_json(str(jsonl_path)), str(out), compression="zstd")
+    return out
+
+
+def build_tokenizer(corpus_file: Path, vocab_size: int = 2000):
+    """Tiny BPE tokenizer trained offline on the synthetic corpus."""
+    from tokenizers import Tokenizer, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast
+
+    tok = Tokenizer(models.BPE(unk_token="<unk>"))
+    tok.pre_tokenizer = pre_tokenizers.Whitespace()
+    trainer = trainers.BpeTrainer(vocab_size=vocab_size, special_tokens=["<unk>", "<pad>", "</s>"])
+
+    def _lines():
+        with open(corpus_file, encoding="utf-8") as fh:
+            for ln in fh:
+                obj = json.loads(ln)
+                yield " ".join(obj.values())
+
+    tok.train_from_iterator(_lines(), trainer=trainer)
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tok, unk_token="<unk>", pad_token="<pad>", eos_token="</s>"
+    )
+
+
+def environment() -> dict:
+    """What the numbers depend on — stored with every result file."""
+    env = {
+        "python":   platform.python_version(),
+        "platform": platform.platform(),
+        "cpu":      platform.processor() or platform.machine(),
+        "cores":    psutil.cpu_count(logical=False),
+        "threads":  os.cpu_count(),
+        "ram_gb":   round(psutil.virtual_memory().total / 1024 ** 3, 1),
+    }
+    try:
+        env["commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=APP_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        env["commit"] = None
+    try:
+        import torch
+
+        env["torch"] = torch.__version__
+        env["cuda"]  = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    except ImportError:
+        pass
+    return env
+
+
+def run_config_subprocess(script: Path, config: dict) -> dict:
+    """
+    Run one benchmark configuration in a fresh interpreter so thread-pool
+    sizes, peak RSS and start-up time are measured per configuration.
+    """
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES="")
+    if config.get("threads"):
+        env["OMP_NUM_THREADS"] = str(config["threads"])
+    out = subprocess.run(
+        [sys.executable, str(script), "--run-config", json.dumps(config)],
+        capture_output=True, text=True, env=env,
+    )
+    if out.returncode != 0:
+        lines = out.stderr.strip().splitlines()
+        return {**config, "error": lines[-1] if lines else f"exit code {out.returncode}"}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def write_results(name: str, results: list[dict], out: Path | None = None) -> Path:
+    env  = environment()
+    path = out or RESULTS_DIR / f"{name}_{env.get('commit') or 'nogit'}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"benchmark": name, "environment": env, "results": results}, indent=2))
+    return path
+
+
+def print_table(results: list[dict], keys: list[str]) -> None:
+    cols = ["config"] + keys
+    print("  ".join(f"{c:>16}" for c in cols))
+    for r in results:
+        if "error" in r:
+            print(f"{r.get('name', '?'):>16}  ERROR: {r['error']}")
+            continue
+        cells = [f"{r['name']:>16}"]
+        for k in keys:
+            v = r.get(k)
+            cells.append(f"{v:>16.2f}" if isinstance(v, (int, float)) else f"{'—':>16}")
+        print("  ".join(cells))
@@ -0,0 +1,176 @@
+"""
+bench_ddp.py — Scaling benchmark for CPU data-parallel training (cpu_ddp.py).
+
+Trains LoRA on the same tiny randomly-initialised Llama as bench_llm.py with
+1, 2, 4 and 8 gloo DDP ranks, launched through cpu_ddp.launch() exactly as
+train_llm.py --cpu-workers does (cores split per rank, one shard slice per
+rank). The per-rank batch is fixed, so each optimizer step sees
+ranks × batch samples. Reported per rank count:
+
+    samples_per_sec      — global, steady state after _WARMUP_STEPS (rank 0 clock)
+    speedup, efficiency  — vs the 1-rank run (efficiency = speedup / ranks)
+    time_to_first_step_s, peak_rss_mb (rank 0)
+
+Run inside the training venv (no network needed):
+    python benchmarks/bench_ddp.py
+    python benchmarks/bench_ddp.py --workers 1 2 4 --batch-size 8 --mode packing
+Results go to benchmarks/results/ddp_<commit>_<time>.json; compare with compare.py.
+"""
+
+import time
+
+_T_START = time.perf_counter()
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+import _common
+
+import cpu_ddp
+from cpu_mode import configure_cpu_threads
+
+_WARMUP_STEPS = 2
+
+
+def run_config(cfg: dict) -> None:
+    """One DDP rank; rank 0 writes the result to cfg["result_file"]."""
+    configure_cpu_threads(cpu_ddp.worker_cpus())   # before torch sizes its pools
+
+    import torch
+    from peft import LoraConfig, TaskType, get_peft_model
+    from transformers import (
+        DataCollatorForLanguageModeling,
+        PreTrainedTokenizerFast,
+        Trainer,
+        TrainerCallback,
+        TrainingArguments,
+    )
+
+    import train_llm
+    from bench_llm import _tiny_llama
+    from cpu_mode import cpu_supports_bf16, cpu_training_kwargs
+
+    cpu_ddp.init_worker()
+    torch.manual_seed(0)
+    packing   = cfg["mode"] == "packing"
+    tokenizer = PreTrainedTokenizerFast.from_pretrained(cfg["tokenizer_dir"])
+
+    with tempfile.TemporaryDirectory(prefix=f"tc_bench_ddp_r{cpu_ddp.rank()}_") as tmp:
+        tmp_p = Path(tmp)
+        train_ds, _, real_tokens = train_llm._tokenize_shard(
+            Path(cfg["data_file"]), tokenizer, cfg["seq_len"], packing, tmp_p / "arrow"
+        )
+        model = get_peft_model(_tiny_llama(len(tokenizer), cfg["seq_len"]), LoraConfig(
+            task_type=TaskType.CAUSAL_LM, r=8, lora_alpha=16, lora_dropout=0.05,
+            target_modules=train_llm._LORA_TARGETS, bias="none",
+        ))
+        if packing:
+            collator = train_llm._PackedCollator(tokenizer.pad_token_id, torch.float32)
+        else:
+            collator = DataCollatorForLanguageModeling(tokenizer, mlm=False)
+
+        marks: dict[int, float] = {}
+
+        class _StepClock(TrainerCallback):
+            def on_step_end(self, args, state, control, **kwargs):
+                marks[state.global_step] = time.perf_counter()
+
+        device_kw = cpu_training_kwargs(cpu_supports_bf16())
+        if cfg["workers"] > 1:
+            device_kw["ddp_backend"] = "gloo"
+        args = TrainingArguments(
+            output_dir=str(tmp_p / "out"),
+            max_steps=cfg["steps"],
+            per_device_train_batch_size=cfg["batch_size"],
+            remove_unused_columns=not packing,
+            learning_rate=2e-4,
+            logging_steps=cfg["steps"],
+            save_strategy="no",
+            report_to="none",
+            ddp_find_unused_parameters=False,
+            **train_llm._length_grouping_kwargs(not packing),
+            **device_kw,
+        )
+        Trainer(
+            model=model, args=args, train_dataset=train_ds,
+            data_collator=collator, callbacks=[_StepClock()],
+        ).train()
+
+    if not cpu_ddp.is_main_process():
+        return
+    steady_steps = cfg["steps"] - _WARMUP_STEPS
+    steady_s     = marks[cfg["steps"]] - marks[_WARMUP_STEPS]
+    rows_s       = steady_steps * cfg["batch_size"] * cfg["workers"] / steady_s
+    Path(cfg["result_file"]).write_text(json.dumps({
+        **{k: v for k, v in cfg.items() if k not in ("data_file", "tokenizer_dir", "result_file")},
+        "samples_per_sec":      round(rows_s, 2),
+        "tokens_per_sec":       round(rows_s * real_tokens / len(train_ds), 1),
+        "time_to_first_step_s": round(marks[1] - _T_START, 2),
+        "peak_rss_mb":          round(_common.peak_rss_mb(), 1),
+    }))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="TrainChain CPU DDP scaling benchmark")
+    p.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8], help="DDP rank counts")
+    p.add_argument("--mode", default="dynamic", choices=["dynamic", "packing"])
+    p.add_argument("--batch-size", type=int, default=4, help="Per-rank batch size")
+    p.add_argument("--steps", type=int, default=20)
+    p.add_argument("--samples", type=int, default=4000)
+    p.add_argument("--seq-len", type=int, default=512)
+    p.add_argument("--out", type=Path, help="Result file (default: benchmarks/results/…)")
+    p.add_argument("--run-config", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.run_config:
+        run_config(json.loads(args.run_config))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="tc_bench_ddp_") as tmp:
+        tmp_p     = Path(tmp)
+        data_file = _common.write_alpaca_jsonl(tmp_p / "shard.jsonl", args.samples)
+        _common.build_tokenizer(data_file).save_pretrained(str(tmp_p / "tokenizer"))
+
+        for n in args.workers:
+            cfg = {
+                "name":          f"ddp{n}-{args.mode}-bs{args.batch_size}",
+                "workers":       n,
+                "mode":          args.mode,
+                "batch_size":    args.batch_size,
+                "steps":         max(args.steps, _WARMUP_STEPS + 1),
+                "seq_len":       args.seq_len,
+                "data_file":     str(data_file),
+                "tokenizer_dir": str(tmp_p / "tokenizer"),
+                "result_file":   str(tmp_p / f"result_{n}.json"),
+            }
+            if cpu_ddp.plan_workers(n) < n:
+                results.append({"name": cfg["name"], "workers": n, "error": "not enough physical cores"})
+                continue
+            print(f"running {cfg['name']} …", flush=True)
+            cmd  = [sys.executable, str(Path(__file__).resolve()), "--run-config", json.dumps(cfg)]
+            code = cpu_ddp.launch(cmd, n, tmp_p)
+            result_file = Path(cfg["result_file"])
+            if code != 0 or not result_file.exists():
+                results.append({"name": cfg["name"], "workers": n, "error": f"exit code {code}"})
+                continue
+            results.append(json.loads(result_file.read_text()))
+
+    base = next((r for r in results if r.get("workers") == 1 and "samples_per_sec" in r), None)
+    for r in results:
+        if base and "samples_per_sec" in r:
+            r["speedup"]    = round(r["samples_per_sec"] / base["samples_per_sec"], 2)
+            r["efficiency"] = round(r["speedup"] / r["workers"], 2)
+
+    _common.print_table(
+        results,
+        ["samples_per_sec", "speedup", "efficiency", "time_to_first_step_s", "peak_rss_mb"],
+    )
+    print(f"results: {_common.write_results('ddp', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+bench_llm.py — Offline throughput benchmark for the train_llm.py pipeline.
+
+Builds a synthetic Alpaca shard, tokenises it with train_llm's own
+_tokenize_shard(), and trains LoRA on a tiny randomly-initialised Llama
+through the same Trainer setup the contributor app uses. Every
+configuration (padding mode × batch size × CPU threads, optionally per shard
+format) runs in a fresh process and reports:
+
+    modes: dynamic    — pad per batch, length-grouped sampler (the default)
+           packing    — --packing's packed rows
+           max_length — every row padded to seq_len, random order (the
+                        pre-dynamic-padding baseline)
+
+    samples_per_sec, tokens_per_sec   — steady state, after _WARMUP_STEPS
+    time_to_first_step_s              — process start → first optimizer step
+    tokenize_s, peak_rss_mb
+
+Run inside the training venv (no network needed):
+    python benchmarks/bench_llm.py
+    python benchmarks/bench_llm.py --modes packing --batch-sizes 4 8 16 --threads 1 4
+    python benchmarks/bench_llm.py --shard-formats jsonl zstd parquet --batch-sizes 8
+Results go to benchmarks/results/llm_<commit>_<time>.json; compare with compare.py.
+"""
+
+import time
+
+_T_START = time.perf_counter()
+
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+import _common
+
+_WARMUP_STEPS = 2
+
+
+def _tiny_llama(vocab_size: int, max_seq_len: int):
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    return LlamaForCausalLM(LlamaConfig(
+        vocab_size=vocab_size,
+        hidden_size=256,
+        intermediate_size=688,
+        num_hidden_layers=4,
+        num_attention_heads=4,
+        num_key_value_heads=4,
+        max_position_embeddings=max_seq_len,
+    ))
+
+
+def run_config(cfg: dict) -> dict:
+    """Benchmark one configuration in this process."""
+    import torch
+    from peft import LoraConfig, TaskType, get_peft_model
+    from transformers import (
+        DataCollatorForLanguageModeling,
+        Trainer,
+        TrainerCallback,
+        TrainingArguments,
+    )
+
+    import train_llm
+    from cpu_mode import configure_cpu_threads, cpu_supports_bf16, cpu_training_kwargs
+
+    if cfg["threads"]:
+        torch.set_num_threads(cfg["threads"])
+    elif cfg["cpu_mode"]:
+        configure_cpu_threads()
+    torch.manual_seed(0)
+    packing = cfg["mode"] == "packing"
+
+    with tempfile.TemporaryDirectory(prefix="tc_bench_llm_") as tmp:
+        tmp_p     = Path(tmp)
+        jsonl     = _common.write_alpaca_jsonl(tmp_p / "shard.jsonl", cfg["samples"])
+        tokenizer = _common.build_tokenizer(jsonl)
+        data_file = _common.convert_shard(jsonl, cfg.get("shard_format", "jsonl"))
+
+        t0 = time.perf_counter()
+        train_ds, n_samples, real_tokens = train_llm._tokenize_shard(
+            data_file, tokenizer, cfg["seq_len"], packing, tmp_p / "arrow"
+        )
+        tokenize_s = time.perf_counter() - t0
+
+        model = get_peft_model(_tiny_llama(len(tokenizer), cfg["seq_len"]), LoraConfig(
+            task_type=TaskType.CAUSAL_LM, r=8, lora_alpha=16, lora_dropout=0.05,
+            target_modules=train_llm._LORA_TARGETS, bias="none",
+        ))
+        if packing:
+            collator = train_llm._PackedCollator(tokenizer.pad_token_id, torch.float32)
+        elif cfg["mode"] == "max_length":
+            # Rows are truncated to seq_len, so this pads every batch to exactly seq_len
+            collator = DataCollatorForLanguageModeling(
+                tokenizer, mlm=False, pad_to_multiple_of=cfg["seq_len"]
+            )
+        else:
+            collator = DataCollatorForLanguageModeling(tokenizer, mlm=False)
+
+        marks: dict[int, float] = {}
+
+        class _StepClock(TrainerCallback):
+            def on_step_end(self, args, state, control, **kwargs):
+                marks[state.global_step] = time.perf_counter()
+
+        device_kw = (
+            cpu_training_kwargs(cpu_supports_bf16())
+            if cfg["cpu_mode"]
+            else {"use_cpu": True, "dataloader_pin_memory": False}
+        )
+        args = TrainingArguments(
+            output_dir=str(tmp_p / "out"),
+            max_steps=cfg["steps"],
+            per_device_train_batch_size=cfg["batch_size"],
+            remove_unused_columns=not packing,
+            learning_rate=2e-4,
+            logging_steps=cfg["steps"],
+            save_strategy="no",
+            report_to="none",
+            **train_llm._length_grouping_kwargs(cfg["mode"] == "dynamic"),
+            **device_kw,
+        )
+        Trainer(
+            model=model, args=args, train_dataset=train_ds,
+            data_collator=collator, callbacks=[_StepClock()],
+        ).train()
+
+    steady_steps = cfg["steps"] - _WARMUP_STEPS
+    steady_s     = marks[cfg["steps"]] - marks[_WARMUP_STEPS]
+    rows_s       = steady_steps * cfg["batch_size"] / steady_s
+    return {
+        **cfg,
+        "samples_per_sec":      round(rows_s * n_samples / len(train_ds), 2),
+        "tokens_per_sec":       round(rows_s * real_tokens / len(train_ds), 1),
+        "time_to_first_step_s": round(marks[1] - _T_START, 2),
+        "tokenize_s":           round(tokenize_s, 2),
+        "peak_rss_mb":          round(_common.peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="TrainChain LLM pipeline benchmark")
+    p.add_argument("--modes", nargs="+", default=["dynamic", "packing"],
+                   choices=["dynamic", "packing", "max_length"], help="Padding mode(s)")
+    p.add_argument("--batch-sizes", nargs="+", type=int, default=[4, 8])
+    p.add_argument("--threads", nargs="+", type=int, default=[0],
+                   help="torch intra-op threads; 0 = cpu_mode.py's sizing")
+    p.add_argument("--no-cpu-mode", action="store_true",
+                   help="Skip cpu_mode.py's TrainingArguments (bf16 autocast, workers)")
+    p.add_argument("--shard-formats", nargs="+", default=["jsonl"],
+                   choices=["jsonl", "zstd", "parquet"], help="Shard encoding(s) to read")
+    p.add_argument("--steps", type=int, default=20)
+    p.add_argument("--samples", type=int, default=2000)
+    p.add_argument("--seq-len", type=int, default=512)
+    p.add_argument("--out", type=Path, help="Result file (default: benchmarks/results/…)")
+    p.add_argument("--run-config", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.run_config:
+        print(json.dumps(run_config(json.loads(args.run_config))), flush=True)
+        return
+
+    results = []
+    for fmt in args.shard_formats:
+        for mode in args.modes:
+            for bs in args.batch_sizes:
+                for threads in args.threads:
+                    suffix = "" if fmt == "jsonl" else f"-{fmt}"
+                    cfg = {
+                        "name":         f"{mode}-bs{bs}-t{threads or 'auto'}{suffix}",
+                        "mode":         mode,
+                        "shard_format": fmt,
+                        "batch_size":   bs,
+                        "threads":      threads,
+                        "cpu_mode":     not args.no_cpu_mode,
+                        "steps":        max(args.steps, _WARMUP_STEPS + 1),
+                        "samples":      args.samples,
+                        "seq_len":      args.seq_len,
+                    }
+                    print(f"running {cfg['name']} …", flush=True)
+                    results.append(_common.run_config_subprocess(Path(__file__), cfg))
+
+    _common.print_table(
+        results,
+        ["samples_per_sec", "tokens_per_sec", "time_to_first_step_s", "peak_rss_mb"],
+    )
+    print(f"results: {_common.write_results('llm', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+bench_yolo.py — Offline throughput benchmark for the train_yolo.py pipeline.
+
+Generates a synthetic labelled detection dataset (noise images with random
+filled boxes), lays it out with train_yolo's own arrange_dataset() and
+create_data_yaml(), and trains the smallest YOLO built from its YAML
+(random init — no weight download). Every configuration (batch size ×
+dataloader workers × CPU threads) runs in a fresh process and reports:
+
+    samples_per_sec          — training images/sec, after _WARMUP_BATCHES
+    time_to_first_step_s     — process start → first training batch done
+    arrange_s, peak_rss_mb
+
+Run inside the training venv (no network needed):
+    python benchmarks/bench_yolo.py
+    python benchmarks/bench_yolo.py --batch-sizes 8 16 --workers 0 4 --imgsz 320
+Results go to benchmarks/results/yolo_<commit>_<time>.json; compare with compare.py.
+"""
+
+import time
+
+_T_START = time.perf_counter()
+
+import argparse
+import json
+import os
+import random
+import tempfile
+from pathlib import Path
+
+import _common
+
+_WARMUP_BATCHES = 2
+
+
+def write_synthetic_images(dest: Path, n: int, imgsz: int, n_classes: int, seed: int = 0) -> Path:
+    """Flat folder of JPEG + YOLO-format .txt pairs, like an extracted job ZIP."""
+    import numpy as np
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(seed)
+    nrng = np.random.default_rng(seed)
+    dest.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        img  = Image.fromarray(nrng.integers(0, 255, (imgsz, imgsz, 3), dtype=np.uint8))
+        draw = ImageDraw.Draw(img)
+        rows = []
+        for _ in range(rng.randint(1, 4)):
+            w, h   = rng.uniform(0.1, 0.5), rng.uniform(0.1, 0.5)
+            cx, cy = rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2)
+            box    = [(cx - w / 2) * imgsz, (cy - h / 2) * imgsz, (cx + w / 2) * imgsz, (cy + h / 2) * imgsz]
+            cls    = rng.randrange(n_classes)
+            draw.rectangle(box, fill=tuple(rng.randrange(256) for _ in range(3)))
+            rows.append(f"{cls} {cx:.6f} {cy:.6f} {w:.6f} {h:.6f}")
+        img.save(dest / f"img_{i:05d}.jpg", quality=90)
+        (dest / f"img_{i:05d}.txt").write_text("\n".join(rows) + "\n")
+    return dest
+
+
+def run_config(cfg: dict) -> dict:
+    """Benchmark one configuration in this process."""
+    import torch
+    from ultralytics import YOLO
+
+    import train_yolo
+
+    if cfg["threads"]:
+        torch.set_num_threads(cfg["threads"])
+    random.seed(0)
+    classes = [f"c{i}" for i in range(cfg["classes"])]
+
+    with tempfile.TemporaryDirectory(prefix="tc_bench_yolo_") as tmp:
+        tmp_p = Path(tmp)
+        src   = write_synthetic_images(tmp_p / "dataset_files", cfg["images"], cfg["imgsz"], len(classes))
+
+        t0 = time.perf_counter()
+        train_yolo.arrange_dataset(src, tmp_p / "dataset")
+        arrange_s = time.perf_counter() - t0
+        yaml_path = train_yolo.create_data_yaml(tmp_p / "dataset", len(classes), classes)
+
+        marks: list[float] = []
+        model = YOLO(cfg["model"])
+        model.add_callback("on_train_batch_end", lambda trainer: marks.append(time.perf_counter()))
+        os.chdir(tmp_p)   # ultralytics writes runs/ and settings relative to cwd
+        model.train(
+            data=str(yaml_path),
+            imgsz=cfg["imgsz"],
+            epochs=cfg["epochs"],
+            batch=cfg["batch_size"],
+            workers=cfg["workers"],
+            device="cpu",
+            project=str(tmp_p / "runs"),
+            name="bench",
+            val=False,
+            plots=False,
+            amp=False,
+            verbose=False,
+        )
+
+    steady = len(marks) - _WARMUP_BATCHES
+    return {
+        **cfg,
+        "batches":              len(marks),
+        "samples_per_sec":      round(steady * cfg["batch_size"] / (marks[-1] - marks[_WARMUP_BATCHES - 1]), 2)
+                                if steady > 0 else None,
+        "time_to_first_step_s": round(marks[0] - _T_START, 2) if marks else None,
+        "arrange_s":            round(arrange_s, 2),
+        "peak_rss_mb":          round(_common.peak_rss_mb(), 1),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="TrainChain YOLO pipeline benchmark")
+    p.add_argument("--model", default="yolo11n.yaml", help="Model YAML (random init)")
+    p.add_argument("--batch-sizes", nargs="+", type=int, default=[8, 16])
+    p.add_argument("--workers", nargs="+", type=int, default=[0, 2])
+    p.add_argument("--threads", nargs="+", type=int, default=[0], help="0 = torch default")
+    p.add_argument("--images", type=int, default=240)
+    p.add_argument("--imgsz", type=int, default=320)
+    p.add_argument("--classes", type=int, default=3)
+    p.add_argument("--epochs", type=int, default=1)
+    p.add_argument("--out", type=Path, help="Result file (default: benchmarks/results/…)")
+    p.add_argument("--run-config", help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.run_config:
+        print(json.dumps(run_config(json.loads(args.run_config))), flush=True)
+        return
+
+    results = []
+    for bs in args.batch_sizes:
+        for workers in args.workers:
+            for threads in args.threads:
+                cfg = {
+                    "name":       f"bs{bs}-w{workers}-t{threads or 'auto'}",
+                    "model":      args.model,
+                    "batch_size": bs,
+                    "workers":    workers,
+                    "threads":    threads,
+                    "images":     args.images,
+                    "imgsz":      args.imgsz,
+                    "classes":    args.classes,
+                    "epochs":     args.epochs,
+                }
+                print(f"running {cfg['name']} …", flush=True)
+                results.append(_common.run_config_subprocess(Path(__file__), cfg))
+
+    _common.print_table(results, ["samples_per_sec", "time_to_first_step_s", "peak_rss_mb"])
+    print(f"results: {_common.write_results('yolo', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+compare.py — Diff two benchmark result files (e.g. before / after a change).
+
+    python benchmarks/compare.py results/llm_abc123_….json results/llm_def456_….json
+
+Configurations are matched by name; each metric is shown as base → new with
+the relative change. Higher is better for throughput, lower for everything
+else.
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+_METRICS = {
+    "samples_per_sec":      "higher",
+    "tokens_per_sec":       "higher",
+    "speedup":              "higher",
+    "time_to_first_step_s": "lower",
+    "tokenize_s":           "lower",
+    "arrange_s":            "lower",
+    "peak_rss_mb":          "lower",
+}
+
+
+def _load(path: Path) -> tuple[dict, dict]:
+    data = json.loads(path.read_text())
+    return data.get("environment", {}), {r["name"]: r for r in data["results"] if "name" in r}
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Compare two TrainChain benchmark result files")
+    p.add_argument("base", type=Path)
+    p.add_argument("new", type=Path)
+    args = p.parse_args()
+
+    base_env, base = _load(args.base)
+    new_env, new   = _load(args.new)
+    print(f"base: {base_env.get('commit')}   new: {new_env.get('commit')}")
+    if base_env.get("cpu") != new_env.get("cpu") or base_env.get("cores") != new_env.get("cores"):
+        print("warning: results come from different hardware")
+
+    for name in sorted(base.keys() & new.keys()):
+        print(f"\n{name}")
+        for metric, better in _METRICS.items():
+            a, b = base[name].get(metric), new[name].get(metric)
+            if not isinstance(a, (int, float)) or not isinstance(b, (int, float)) or a == 0:
+                continue
+            change   = (b - a) / a
+            improved = change > 0 if better == "higher" else change < 0
+            mark     = "+" if improved else ("-" if change else " ")
+            print(f"  {metric:<22} {a:>10.2f} → {b:>10.2f}  {change:>+7.1%} {mark}")
+
+    for name in sorted(base.keys() ^ new.keys()):
+        print(f"\n{name}: only in {'base' if name in base else 'new'}")
+
+
+if __name__ == "__main__":
+    main()
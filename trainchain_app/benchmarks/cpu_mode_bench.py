@@ -0,0 +1,136 @@
+"""
+cpu_mode_bench.py — Offline CPU training benchmark for train_llm.py's CPU mode.
+
+Trains LoRA on a tiny randomly-initialised Llama for a fixed number of steps,
+once with the previous CPU settings (fp32, default threads, no DataLoader
+workers) and once with cpu_mode.py's settings, each in a fresh process so
+thread-pool sizing and pinning take effect before torch loads. No network
+access or downloaded weights are needed.
+
+Run inside the training venv:
+    .trainchain_env/Scripts/python.exe benchmarks/cpu_mode_bench.py [--steps 30] [--compile]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+_TRAINING_DIR = Path(__file__).resolve().parent.parent / "training"
+sys.path.insert(0, str(_TRAINING_DIR))
+
+_VOCAB   = 8000
+_SEQ_LEN = 256
+_BATCH   = 8
+
+
+def _tiny_llama():
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    cfg = LlamaConfig(
+        vocab_size=_VOCAB,
+        hidden_size=512,
+        intermediate_size=1376,
+        num_hidden_layers=6,
+        num_attention_heads=8,
+        num_key_value_heads=8,
+        max_position_embeddings=_SEQ_LEN,
+    )
+    return LlamaForCausalLM(cfg)
+
+
+def _run_mode(mode: str, steps: int, compile_model: bool) -> dict:
+    """Train in this process and return throughput for one mode."""
+    if mode == "cpu_mode":
+        from cpu_mode import configure_cpu_threads
+
+        configure_cpu_threads()
+
+    import tempfile
+
+    import torch
+    from datasets import Dataset
+    from peft import LoraConfig, TaskType, get_peft_model
+    from transformers import Trainer, TrainingArguments, default_data_collator
+
+    from cpu_mode import cpu_supports_bf16, cpu_training_kwargs
+
+    torch.manual_seed(0)
+    rows = _BATCH * steps
+    ids  = torch.randint(0, _VOCAB, (rows, _SEQ_LEN)).tolist()
+    ds   = Dataset.from_dict({"input_ids": ids, "labels": ids})
+
+    model = get_peft_model(_tiny_llama(), LoraConfig(
+        task_type=TaskType.CAUSAL_LM, r=8, lora_alpha=16,
+        target_modules=["q_proj", "v_proj"], bias="none",
+    ))
+
+    bf16 = mode == "cpu_mode" and cpu_supports_bf16()
+    if mode == "cpu_mode":
+        device_kw = cpu_training_kwargs(bf16, compile_model)
+    else:
+        device_kw = {"use_cpu": True, "dataloader_pin_memory": False}
+
+    with tempfile.TemporaryDirectory(prefix="tc_bench_") as tmp:
+        args = TrainingArguments(
+            output_dir=tmp,
+            max_steps=steps,
+            per_device_train_batch_size=_BATCH,
+            learning_rate=2e-4,
+            logging_steps=steps,
+            save_strategy="no",
+            report_to="none",
+            **device_kw,
+        )
+        trainer = Trainer(
+            model=model, args=args, train_dataset=ds, data_collator=default_data_collator
+        )
+        t0 = time.perf_counter()
+        trainer.train()
+        elapsed = time.perf_counter() - t0
+
+    return {
+        "mode":       mode,
+        "bf16":       bf16,
+        "compile":    compile_model and mode == "cpu_mode",
+        "threads":    torch.get_num_threads(),
+        "steps":      steps,
+        "seconds":    round(elapsed, 2),
+        "tokens_sec": round(rows * _SEQ_LEN / elapsed, 1),
+    }
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="TrainChain CPU mode benchmark")
+    p.add_argument("--steps", type=int, default=30)
+    p.add_argument("--compile", action="store_true", help="Also torch.compile in cpu_mode")
+    p.add_argument("--mode", choices=["baseline", "cpu_mode"], help=argparse.SUPPRESS)
+    args = p.parse_args()
+
+    if args.mode:
+        print(json.dumps(_run_mode(args.mode, args.steps, args.compile)), flush=True)
+        return
+
+    results = []
+    for mode in ("baseline", "cpu_mode"):
+        cmd = [sys.executable, __file__, "--mode", mode, "--steps", str(args.steps)]
+        if args.compile:
+            cmd.append("--compile")
+        env = dict(os.environ, CUDA_VISIBLE_DEVICES="")
+        out = subprocess.run(cmd, capture_output=True, text=True, env=env, check=True)
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        r = results[-1]
+        print(
+            f"{mode:<9} | {r['tokens_sec']:>9.1f} tokens/sec  {r['seconds']:>7.1f}s  "
+            f"threads={r['threads']}  bf16={r['bf16']}  compile={r['compile']}"
+        )
+
+    base, opt = results
+    print(f"speed-up: {opt['tokens_sec'] / base['tokens_sec']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
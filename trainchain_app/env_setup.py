@@ -131,7 +131,8 @@ _LLM_PACKAGES = [
     "accelerate",
     "safetensors",
     "sentencepiece",
-    "tiktoken"
+    "tiktoken",
+    "zstandard",
 ]
 
 
@@ -21,6 +21,7 @@ from PyQt6.QtWidgets import (
     QPushButton,
     QProgressBar,
     QRadioButton,
+    QCheckBox,
     QGroupBox,
     QMessageBox,
 )
@@ -38,6 +39,22 @@ from env_setup import get_python_bin, ENV_DIR, load_api_url  # noqa: E402
 _TRAIN_YOLO = _ROOT / "train_yolo.py"
 _TRAIN_LLM = _ROOT / "training" / "train_llm.py"
 _SPEC_CHECK = _ROOT / "training" / "spec_check.py"
+_MODEL_STORE = _ROOT / "training" / "model_store.py"
+_THROUGHPUT_PROBE = _ROOT / "training" / "throughput_probe.py"
+
+# Structured progress lines from the trainers (see training/progress_events.py)
+_PROGRESS_PREFIX = "@@trainchain-progress "
+_STAGE_LABELS = {
+    "fetch":      "Fetching job",
+    "download":   "Downloading data",
+    "prepare":    "Preparing dataset",
+    "load_model": "Loading model",
+    "train":      "Training",
+    "save":       "Saving",
+    "upload":     "Uploading",
+    "submit":     "Submitting",
+    "done":       "Done",
+}
 
 # API base URL — read from .env, falls back to production
 _API_URL = load_api_url()
@@ -45,6 +62,8 @@ _API_URL = load_api_url()
 # Log file written next to the exe / project root for post-mortem debugging
 _LOG_FILE = _ROOT / "trainchain_error.log"
 _TRAINING_LOG_FILE = _ROOT / "trainchain_training.log"
+# --profile output (stage timings + torch.profiler trace), next to the training log
+_PROFILE_DIR = _ROOT / "trainchain_profiles"
 
 
 def _write_log(text: str) -> None:
@@ -82,6 +101,7 @@ class _Signals(QObject):
     log = pyqtSignal(str)
     done = pyqtSignal(bool, str)  # success, message
     spec_check = pyqtSignal(bool, str)  # passed, display_message
+    progress = pyqtSignal(dict)  # parsed progress event
 
 
 # ---------------------------------------------------------------------------
@@ -106,9 +126,18 @@ class JobsPage(QMainWindow):
         self._signals.log.connect(self._on_log)
         self._signals.done.connect(self._on_done)
         self._signals.spec_check.connect(self._on_spec_check_done)
+        self._signals.progress.connect(self._on_progress)
         self._training_process: subprocess.Popen | None = (
             None  # tracked for cancellation
         )
+        # Background base-model download, started as soon as a slot is known
+        self._prefetch_process: subprocess.Popen | None = None
+        self._prefetched_model: str | None = None
+        self._probe_process: subprocess.Popen | None = None
+        # (job_id, use_gpu) of the last throughput probe started this session
+        self._probed: tuple | None = None
+        # Slot still waiting for sharding — re-probed if the hardware changes
+        self._sharding_slot: dict | None = None
 
         container = QWidget()
         self.layout = QVBoxLayout()
@@ -149,6 +178,8 @@ class JobsPage(QMainWindow):
         self.gpu_radio.toggled.connect(self._on_hardware_selected)
         hw_layout.addWidget(self.gpu_radio)
         hw_layout.addWidget(self.cpu_radio)
+        self.profile_check = QCheckBox("Capture performance profile (for bug reports)")
+        hw_layout.addWidget(self.profile_check)
         self.hardware_group.setLayout(hw_layout)
         self.hardware_group.setVisible(False)
         self.layout.addWidget(self.hardware_group)
@@ -165,6 +196,13 @@ class JobsPage(QMainWindow):
         self.loader.setVisible(False)
         self.layout.addWidget(self.loader)
 
+        # Structured training stats (stage, step, loss, throughput, ETA)
+        self.stats_label = QLabel("", self)
+        self.stats_label.setFont(QFont("Helvetica", 10))
+        self.stats_label.setWordWrap(True)
+        self.stats_label.setVisible(False)
+        self.layout.addWidget(self.stats_label)
+
         # Live training log (last line of subprocess stdout)
         self.log_label = QLabel("", self)
         self.log_label.setFont(QFont("Courier New", 9))
@@ -205,7 +243,7 @@ class JobsPage(QMainWindow):
                 background-color: #FFFFFF; border: 1px solid #D1D9E6;
                 border-radius: 4px; padding: 15px; margin-top: 15px;
             }
-            QRadioButton { color: #1A3C5A; padding: 5px; }
+            QRadioButton, QCheckBox { color: #1A3C5A; padding: 5px; }
         """)
 
         self.fetch_job_details()
@@ -214,15 +252,64 @@ class JobsPage(QMainWindow):
 
     def _on_hardware_selected(self):
         self.use_gpu = self.gpu_radio.isChecked()
+        # Shard not sized yet: report the speed of the hardware just chosen
+        if self._sharding_slot is not None:
+            self._probe_throughput(self._sharding_slot, rerun=True)
 
     def _on_log(self, line: str):
         self.log_label.setText(line[-120:])
 
+    def _on_progress(self, event: dict):
+        stage = event.get("stage", "")
+        step, total = event.get("step"), event.get("total")
+        if stage == "train" and step is not None and total:
+            self.loader.setRange(0, int(total))
+            self.loader.setValue(min(int(step), int(total)))
+        else:
+            self.loader.setRange(0, 0)  # indeterminate between training stages
+
+        parts = [_STAGE_LABELS.get(stage, stage)]
+        if step is not None and total:
+            parts.append(f"step {step}/{total}")
+        if event.get("epoch") is not None and event.get("epochs"):
+            parts.append(f"epoch {event['epoch']}/{event['epochs']}")
+        if event.get("loss") is not None:
+            parts.append(f"loss {event['loss']:.4f}")
+        if event.get("samples_per_sec"):
+            parts.append(f"{event['samples_per_sec']:.1f} samples/s")
+        if event.get("tokens_per_sec"):
+            parts.append(f"{event['tokens_per_sec']:,.0f} tok/s")
+        mem = f"RAM {event['rss_gb']:.1f} GB" if event.get("rss_gb") is not None else ""
+        if event.get("vram_gb") is not None:
+            mem += f"  VRAM {event['vram_gb']:.1f} GB"
+        if mem:
+            parts.append(mem.strip())
+        if event.get("eta_sec") is not None:
+            mins, secs = divmod(int(event["eta_sec"]), 60)
+            hours, mins = divmod(mins, 60)
+            parts.append(f"ETA {hours}h {mins:02d}m" if hours else f"ETA {mins}m {secs:02d}s")
+        elif event.get("message"):
+            parts.append(event["message"])
+        self.stats_label.setText("  ·  ".join(parts))
+        self.stats_label.setVisible(True)
+
+    def _emit_output_line(self, line: str) -> None:
+        """Route one subprocess stdout line to the progress or log signal."""
+        if line.startswith(_PROGRESS_PREFIX):
+            try:
+                self._signals.progress.emit(json.loads(line[len(_PROGRESS_PREFIX):]))
+                return
+            except ValueError:
+                pass  # malformed event — fall through and show it as text
+        self._signals.log.emit(line)
+
     def _on_done(self, success: bool, message: str):
         self._training_process = None  # process has exited
         self.loader.setVisible(False)
+        self.loader.setRange(0, 0)
         self.warning_label.setVisible(False)
         self.log_label.setVisible(False)
+        self.stats_label.setVisible(False)
         self.start_button.setEnabled(True)
         self.start_button.setVisible(not success)
         self.hardware_group.setEnabled(True)
@@ -261,15 +348,97 @@ class JobsPage(QMainWindow):
         self._training_process = None
 
     def closeEvent(self, event):
-        """Kill the training process when the window is closed."""
+        """Kill the training, prefetch and probe processes when the window is closed."""
         self._kill_training()
+        proc = self._prefetch_process
+        if proc is not None and proc.poll() is None:
+            proc.terminate()  # partial downloads are discarded by the model store
+        proc = self._probe_process
+        if proc is not None and proc.poll() is None:
+            proc.terminate()
         super().closeEvent(event)
 
+    def _prefetch_model(self, model_name: str) -> None:
+        """Start downloading the slot's base model into the managed model store."""
+        if not model_name or model_name == self._prefetched_model:
+            return
+        proc = self._prefetch_process
+        if proc is not None and proc.poll() is None:
+            return  # one download at a time
+        python_bin = get_python_bin()
+        if not python_bin.exists() or not _MODEL_STORE.exists():
+            return
+
+        popen_kw: dict = {}
+        if os.name == "nt":
+            popen_kw["creationflags"] = subprocess.CREATE_NO_WINDOW
+        try:
+            self._prefetch_process = subprocess.Popen(
+                [str(python_bin), str(_MODEL_STORE), "--prefetch", model_name],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                **popen_kw,
+            )
+            self._prefetched_model = model_name
+        except Exception as exc:
+            # Prefetch is an optimisation — training downloads on demand anyway
+            _write_log(f"Model prefetch failed to start: {exc}")
+
+    def _probe_throughput(self, slot: dict, rerun: bool = False) -> None:
+        """
+        Benchmark this machine and report tokens/sec with the slot, so the
+        backend can size the shard to it. Runs once per job and hardware
+        choice, before sharding; rerun replaces a report from an earlier session.
+        """
+        job_id  = slot.get("job_id")
+        use_gpu = self.gpu_radio.isChecked()   # the hardware training will use
+        if (job_id, use_gpu) == self._probed:
+            return
+        if slot.get("tokens_per_sec") and self._probed is None and not rerun:
+            return
+        proc = self._probe_process
+        if proc is not None and proc.poll() is None:
+            proc.terminate()   # measuring hardware that is no longer selected
+        python_bin = get_python_bin()
+        if not python_bin.exists() or not _THROUGHPUT_PROBE.exists():
+            return
+
+        env = os.environ.copy()
+        if not use_gpu:
+            env["CUDA_VISIBLE_DEVICES"] = ""
+        popen_kw: dict = {}
+        if os.name == "nt":
+            popen_kw["creationflags"] = subprocess.CREATE_NO_WINDOW
+        try:
+            self._probe_process = subprocess.Popen(
+                [
+                    str(python_bin),
+                    str(_THROUGHPUT_PROBE),
+                    "--job-id",
+                    str(job_id),
+                    "--api-url",
+                    _API_URL,
+                    "--contributor-wallet",
+                    self.wallet_address,
+                    "--model-name",
+                    slot.get("model_name", ""),
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=env,
+                **popen_kw,
+            )
+            self._probed = (job_id, use_gpu)
+        except Exception as exc:
+            # Unreported slots are sharded at the median speed
+            _write_log(f"Throughput probe failed to start: {exc}")
+
     # ── API fetch ─────────────────────────────────────────────────────────
 
     def fetch_job_details(self):
         # Reset spec label for a fresh check
         self.spec_label.setVisible(False)
+        self._sharding_slot = None
         self.spec_label.setText("")
         self.refresh_button.setVisible(False)
 
@@ -309,6 +478,11 @@ class JobsPage(QMainWindow):
                     self.job_id = slot.get("job_id")
                     self.job_type = "llm_finetune"
 
+                    if not (
+                        slot.get("slot_status") == "submitted" or slot.get("adapter_cid")
+                    ):
+                        self._prefetch_model(slot.get("model_name", ""))
+
                     # Already submitted — training complete
                     if slot.get("slot_status") == "submitted" or slot.get(
                         "adapter_cid"
@@ -335,14 +509,18 @@ class JobsPage(QMainWindow):
 
                     # Sharding still in progress — shard_cid not yet assigned
                     if not slot.get("shard_cid"):
+                        self._sharding_slot = slot
+                        self._probe_throughput(slot)
                         self.label.setText(
                             f"Wallet: {self.wallet_address}\n"
                             f"Job ID: {self.job_id}\n"
                             f"Model: {slot.get('model_name', 'N/A')}\n"
                             f"\u23f3 Waiting for dataset sharding to complete\u2026\n"
+                            f"Pick your hardware now — your shard is sized to its speed.\n"
                             f"Tap Refresh in a moment."
                         )
-                        self.hardware_group.setVisible(False)
+                        # Choosing before sharding lets the probe measure that device
+                        self.hardware_group.setVisible(True)
                         self.start_button.setVisible(False)
                         self.refresh_button.setVisible(True)
                         return
@@ -355,6 +533,7 @@ class JobsPage(QMainWindow):
                         f"Model: {slot.get('model_name', 'N/A')}\n"
                         f"Reward: {slot.get('reward', 'N/A')} POL\n"
                         f"Slot: #{slot.get('slot_index', '?')}\n"
+                        f"Round: {slot.get('current_round', 1)}/{slot.get('max_rounds', 1)}\n"
                         f"\u23f3 Checking hardware compatibility\u2026"
                     )
                     self.hardware_group.setVisible(True)
@@ -421,6 +600,8 @@ class JobsPage(QMainWindow):
             "--contributor-wallet",
             self.wallet_address,
         ]
+        if self.profile_check.isChecked():
+            cmd += ["--profile", str(_PROFILE_DIR)]
 
         hardware = "GPU" if self.use_gpu else "CPU"
         self._signals.log.emit(
@@ -455,7 +636,7 @@ class JobsPage(QMainWindow):
             for line in process.stdout:
                 stripped = line.rstrip()
                 output_lines.append(stripped)
-                self._signals.log.emit(stripped)
+                self._emit_output_line(stripped)
             process.wait()
             _write_training_log(output_lines, str(self.job_id))
 
@@ -484,7 +665,8 @@ class JobsPage(QMainWindow):
             f"Type: LLM Finetune\n"
             f"Model: {slot.get('model_name', 'N/A')}\n"
             f"Reward: {slot.get('reward', 'N/A')} POL\n"
-            f"Slot: #{slot.get('slot_index', '?')}"
+            f"Slot: #{slot.get('slot_index', '?')}\n"
+            f"Round: {slot.get('current_round', 1)}/{slot.get('max_rounds', 1)}"
         )
         self.label.setText(base_info)
 
@@ -605,6 +787,8 @@ class JobsPage(QMainWindow):
             "--contributor-wallet",
             self.wallet_address,
         ]
+        if self.profile_check.isChecked():
+            cmd += ["--profile", str(_PROFILE_DIR)]
 
         hardware = "GPU" if self.use_gpu else "CPU"
         self._signals.log.emit(
@@ -639,7 +823,7 @@ class JobsPage(QMainWindow):
             for line in process.stdout:
                 stripped = line.rstrip()
                 output_lines.append(stripped)
-                self._signals.log.emit(stripped)
+                self._emit_output_line(stripped)
             process.wait()
             _write_training_log(output_lines, str(self.job_id))
 
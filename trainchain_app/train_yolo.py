@@ -8,22 +8,52 @@ Invoked by jobs_window.py inside the uv-managed venv:
     .trainchain_env/Scripts/python.exe train_yolo.py --job-id <id> --api-url <url> ...
 
 API endpoints (same as the Docker entrypoint used):
-    GET  {api_url}/jobs/get-dataset/{job_id}/           -> dataset zip
+    GET  {api_url}/jobs/get-dataset/{job_id}/           -> dataset zip (ranged reads)
     GET  {api_url}/jobs/image_processing/get-job/{job_id}/ -> job details JSON
     POST {api_url}/jobs/model/upload                    -> multipart upload of output files
+
+Progress is also reported as tagged JSON lines (stage, batch/total, loss,
+images/sec, memory, ETA) for jobs_window.py — see training/progress_events.py.
+--profile [DIR] saves per-stage timings and a torch.profiler capture of a few
+training batches (training/profiling.py).
 """
 
 import argparse
 import os
-import random
 import shutil
 import sys
 import tempfile
-import zipfile
+import time
 from pathlib import Path
 
 import requests
 
+# training/ holds helpers shared with the LLM trainer
+sys.path.insert(0, str(Path(__file__).resolve().parent / "training"))
+from cache_utils import LRUCache  # noqa: E402
+from dataset_stream import extract_split, plan_splits  # noqa: E402
+from file_links import LinkPlacer  # noqa: E402
+from image_prep import prepare_images  # noqa: E402
+from profiling import DEFAULT_PROFILE_DIR, StageTimer, StepProfiler, profile_run_dir  # noqa: E402
+from progress_events import RateMeter, emit  # noqa: E402
+
+# Minimum seconds between per-batch progress events (epoch ends always report)
+_PROGRESS_INTERVAL_S = 2.0
+
+# Arranged datasets kept across runs (LRU across jobs) — a retried job
+# revalidates its entry instead of downloading and unpacking it again
+_DATASET_CACHE_BYTES = int(float(os.getenv("TRAINCHAIN_YOLO_CACHE_GB", "20")) * 1024 ** 3)
+
+# Encoding of images shrunk to imgsz (training/image_prep.py): jpg | webp;
+# images that already fit keep their original encoding
+_IMAGE_FORMAT = os.getenv("TRAINCHAIN_YOLO_IMAGE_FORMAT", "jpg")
+
+# Seed of the train/valid/test shuffle — a retried job splits identically
+_SPLIT_SEED = 0
+
+# Wall-clock per pipeline stage (printed at exit, saved with --profile)
+_STAGES = StageTimer()
+
 
 # ---------------------------------------------------------------------------
 # CLI
@@ -34,6 +64,8 @@ def parse_args():
     parser.add_argument("--job-id",             required=True)
     parser.add_argument("--api-url",            required=True)
     parser.add_argument("--contributor-wallet", required=True)
+    parser.add_argument("--profile", nargs="?", const=str(DEFAULT_PROFILE_DIR), default=None,
+                        metavar="DIR", help="Save a torch.profiler capture + stage timings under DIR")
     return parser.parse_args()
 
 def fetch_job_details(api_url: str, job_id: str) -> dict:
@@ -47,67 +79,96 @@ def fetch_job_details(api_url: str, job_id: str) -> dict:
 
 
 # ---------------------------------------------------------------------------
-# Step 2 — download + unzip dataset  (mirrors: curl .../jobs/get-dataset/{id}/)
+# Step 2 — download + split dataset  (mirrors: curl .../jobs/get-dataset/{id}/
+#           + dataset_arrange.py in one pass — training/dataset_stream.py),
+#           kept per job in a persistent LRU cache so retries skip it.
+#           Images are validated and shrunk to imgsz once, before caching.
 # ---------------------------------------------------------------------------
 
-def download_dataset(api_url: str, job_id: str, dest_dir: Path) -> Path:
-    url = f"{api_url}/jobs/get-dataset/{job_id}/"
-    print(f"[trainchain] Downloading dataset from {url}")
-    r = requests.get(url, timeout=300, stream=True)
-    r.raise_for_status()
+def download_dataset(api_url: str, job_id: str, cache: LRUCache, imgsz: int) -> Path:
+    """
+    The job's dataset in the persistent cache, as <entry>/dataset/<split>/images|labels.
+    A cached entry is revalidated with a conditional request and reused as-is;
+    otherwise the ZIP is streamed into a staging entry, its images validated
+    and shrunk to imgsz (prepare_images), and the entry committed.
+    """
+    url    = f"{api_url}/jobs/get-dataset/{job_id}/"
+    key    = f"job_{job_id}"
+    layout = {"seed": _SPLIT_SEED, "imgsz": imgsz, "image_format": _IMAGE_FORMAT}
+    hit    = cache.get(key)
+    # An entry split with another seed or prepared for another size is a
+    # different layout — re-download it
+    cached = hit[1] if hit and all(hit[1].get(k) == v for k, v in layout.items()) else None
 
-    zip_path = dest_dir / "dataset.zip"
-    with open(zip_path, "wb") as f:
-        for chunk in r.iter_content(chunk_size=8192):
-            f.write(chunk)
-    print(f"[trainchain] Dataset zip saved ({zip_path.stat().st_size // 1024} KB)")
+    print(f"[trainchain] Downloading dataset from {url}")
+    staging = cache.staging_dir(key)
+    try:
+        with _STAGES.stage("download"):
+            result = extract_split(url, staging / "dataset", seed=_SPLIT_SEED, cached=cached)
+        if result is None:
+            print(f"[trainchain] Dataset cache hit ({key}) — unchanged on the server")
+            return hit[0] / "dataset"
+        emit("prepare", message="Validating images")
+        with _STAGES.stage("prepare"):
+            report = prepare_images(staging / "dataset", imgsz, _IMAGE_FORMAT)
+        meta  = {**result, **layout, "dropped_images": report["dropped"]}
+        entry = cache.commit(key, staging, meta)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
 
-    extract_dir = dest_dir / "dataset_files"
-    extract_dir.mkdir(exist_ok=True)
-    with zipfile.ZipFile(zip_path, "r") as zf:
-        zf.extractall(extract_dir)
-    print(f"[trainchain] Dataset extracted to {extract_dir}")
-    return extract_dir
+    counts = result["splits"]
+    print(
+        f"[trainchain] Dataset arranged: {counts['train']} train / "
+        f"{counts['valid']} valid / {counts['test']} test  (cached as {key})"
+    )
+    return entry / "dataset"
 
 
 # ---------------------------------------------------------------------------
-# Step 3 — arrange dataset  (mirrors: dataset_arrange.py)
-# 70 % train / 20 % valid / 10 % test — flat images+labels layout
+# Step 3 — arrange an already-extracted dataset  (mirrors: dataset_arrange.py)
+# 70 % train / 20 % valid / 10 % test — flat images+labels layout. main() gets
+# this layout straight from download_dataset(); this is for local folders
+# (benchmarks/bench_yolo.py). Files are hardlinked / reflinked / symlinked
+# into place (training/file_links.py) — metadata operations, not copies.
 # ---------------------------------------------------------------------------
 
-def arrange_dataset(source_dir: Path, dest_dir: Path) -> None:
-    """Replicate dataset_arrange.py exactly."""
+def arrange_dataset(
+    source_dir: Path,
+    dest_dir: Path,
+    allow_move: bool = False,
+    seed: int = 0,
+) -> None:
+    """
+    Replicate dataset_arrange.py's split (seeded: deterministic).
+    allow_move lets files be moved out of source_dir when no link works —
+    only for scratch sources, so it is off unless the caller opts in.
+    """
     # Collect all image files (flat — same as Docker script)
     image_files = []
     for ext in [".jpg", ".jpeg", ".png"]:
         image_files.extend(source_dir.glob(f"*{ext}"))
-    random.shuffle(image_files)
 
     total = len(image_files)
     if total == 0:
         raise RuntimeError(f"No images found in {source_dir}")
 
-    train_size = int(0.7 * total)
-    valid_size = int(0.2 * total)
-
-    splits = {
-        "train": image_files[:train_size],
-        "valid": image_files[train_size:train_size + valid_size],
-        "test":  image_files[train_size + valid_size:],
-    }
+    # Same seeded split download_dataset() streams into place
+    splits = plan_splits(image_files, seed)
+    counts = " / ".join(f"{len(files)} {split}" for split, files in splits.items())
 
     for split in splits:
         (dest_dir / split / "images").mkdir(parents=True, exist_ok=True)
         (dest_dir / split / "labels").mkdir(parents=True, exist_ok=True)
 
+    placer = LinkPlacer(allow_move=allow_move)
     for split, files in splits.items():
         for img_path in files:
             label_path = img_path.with_suffix(".txt")
-            shutil.copy2(img_path, dest_dir / split / "images" / img_path.name)
+            placer.place(img_path, dest_dir / split / "images" / img_path.name)
             if label_path.exists():
-                shutil.copy2(label_path, dest_dir / split / "labels" / label_path.name)
+                placer.place(label_path, dest_dir / split / "labels" / label_path.name)
 
-    print(f"[trainchain] Dataset arranged: {train_size} train / {valid_size} valid / {total - train_size - valid_size} test")
+    print(f"[trainchain] Dataset arranged: {counts}  ({placer.summary()})")
 
 
 # ---------------------------------------------------------------------------
@@ -148,7 +209,68 @@ def resolve_model(model_str: str) -> str:
 # Step 6 — train  (mirrors: model_train.py)
 # ---------------------------------------------------------------------------
 
-def train(work_dir: Path, yaml_path: Path, model_name: str, epochs: int, imgsz: int) -> Path:
+class _ProgressCallbacks:
+    """ultralytics trainer callbacks → structured progress events."""
+
+    def __init__(self):
+        self.batch = 0
+        self.meter = None
+        self.last  = 0.0
+
+    def on_train_epoch_start(self, trainer):
+        self.batch = 0
+
+    def on_train_batch_end(self, trainer):
+        self.batch += 1
+        nb    = len(trainer.train_loader)
+        total = trainer.epochs * nb
+        step  = trainer.epoch * nb + self.batch
+        if self.meter is None:
+            self.meter = RateMeter(total)
+        rate, eta = self.meter.update(step)
+
+        now = time.monotonic()
+        if now - self.last < _PROGRESS_INTERVAL_S and self.batch != nb:
+            return
+        self.last = now
+        tloss = getattr(trainer, "tloss", None)   # running mean of the loss components
+        emit(
+            "train",
+            step=step,
+            total=total,
+            epoch=trainer.epoch + 1,
+            epochs=trainer.epochs,
+            loss=round(float(tloss.sum()), 4) if tloss is not None else None,
+            samples_per_sec=round(rate * trainer.batch_size, 2) if rate else None,
+            tokens_per_sec=None,
+            eta_sec=round(eta) if eta is not None else None,
+        )
+
+
+class _ProfilerCallbacks:
+    """Runs torch.profiler over a bounded window of training batches."""
+
+    def __init__(self, out_dir: Path):
+        self.profiler = StepProfiler(out_dir)
+
+    def on_train_start(self, trainer):
+        self.profiler.start()
+
+    def on_train_batch_end(self, trainer):
+        self.profiler.step()
+
+    def on_train_end(self, trainer):
+        self.profiler.stop()
+
+
+def train(
+    work_dir: Path,
+    yaml_path: Path,
+    model_name: str,
+    epochs: int,
+    imgsz: int,
+    profile_dir: Path | None = None,
+) -> Path:
     from ultralytics import YOLO  # only available inside the managed venv
 
     print(f"[trainchain] Training: model={model_name}  epochs={epochs}  imgsz={imgsz}")
@@ -159,6 +281,13 @@ def train(work_dir: Path, yaml_path: Path, model_name: str, epochs: int, imgsz:
     os.chdir(work_dir)
     try:
         model = YOLO(model=model_name)
+        progress = _ProgressCallbacks()
+        for event in ("on_train_epoch_start", "on_train_batch_end"):
+            model.add_callback(event, getattr(progress, event))
+        if profile_dir is not None:
+            prof = _ProfilerCallbacks(profile_dir)
+            for event in ("on_train_start", "on_train_batch_end", "on_train_end"):
+                model.add_callback(event, getattr(prof, event))
         model.train(
             data=str(yaml_path),
             imgsz=imgsz,
@@ -218,12 +347,17 @@ def main():
     args = parse_args()
     api_url = args.api_url.rstrip("/")
 
+    # Scratch space for weights and training output; the dataset itself
+    # lives in the persistent cache (download_dataset)
     work_dir = Path(tempfile.mkdtemp(prefix="trainchain_"))
     print(f"[trainchain] Working directory: {work_dir}")
+    profile_dir = profile_run_dir(Path(args.profile), "yolo", args.job_id) if args.profile else None
 
     try:
         # 1. Job details
-        job = fetch_job_details(api_url, args.job_id)
+        emit("fetch", message="Fetching job")
+        with _STAGES.stage("fetch"):
+            job = fetch_job_details(api_url, args.job_id)
 
         model_name  = resolve_model(job.get("model", "yolo11n.pt"))
         epochs      = int(job.get("epochs", 100))
@@ -238,25 +372,32 @@ def main():
         if not classes:
             classes = ["object"]
 
-        # 2. Download + unzip
-        extract_dir = download_dataset(api_url, args.job_id, work_dir)
-
-        # 3. Arrange
-        dataset_dir = work_dir / "dataset"
-        arrange_dataset(extract_dir, dataset_dir)
+        # 2 + 3. Download, unzip and arrange in one streaming pass (or reuse the cache)
+        emit("download", message="Downloading dataset")
+        dataset_dir = download_dataset(
+            api_url, args.job_id, LRUCache("yolo_datasets", _DATASET_CACHE_BYTES), imgsz
+        )
 
         # 4. YAML
         yaml_path = create_data_yaml(dataset_dir, num_classes, classes)
 
         # 5 + 6. Train
-        output_dir = train(work_dir, yaml_path, model_name, epochs, imgsz)
+        with _STAGES.stage("train"):
+            output_dir = train(work_dir, yaml_path, model_name, epochs, imgsz, profile_dir)
 
         # 7. Upload
-        upload_results(api_url, args.job_id, output_dir)
+        emit("upload", message="Uploading results")
+        with _STAGES.stage("upload"):
+            upload_results(api_url, args.job_id, output_dir)
 
+        emit("done", message="Results uploaded")
         print("[trainchain] Pipeline finished successfully.")
 
     finally:
+        print(f"[trainchain] Stage timings | {_STAGES.summary()}")
+        if profile_dir is not None:
+            _STAGES.write(profile_dir)
+            print(f"[trainchain] Profile saved to {profile_dir}")
         shutil.rmtree(work_dir, ignore_errors=True)
 
 
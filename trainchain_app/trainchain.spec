@@ -60,6 +60,20 @@ added_datas = [
     (str(_here / "env_setup.py"),  "."),
     (str(_here / "training" / "train_llm.py"),  "training"),
     (str(_here / "training" / "spec_check.py"), "training"),
+    (str(_here / "training" / "cache_utils.py"), "training"),
+    (str(_here / "training" / "model_store.py"), "training"),
+    (str(_here / "training" / "batch_tuner.py"), "training"),
+    (str(_here / "training" / "cpu_mode.py"),    "training"),
+    (str(_here / "training" / "cpu_ddp.py"),     "training"),
+    (str(_here / "training" / "low_mem.py"),     "training"),
+    (str(_here / "training" / "checkpoints.py"), "training"),
+    (str(_here / "training" / "progress_events.py"), "training"),
+    (str(_here / "training" / "shard_formats.py"), "training"),
+    (str(_here / "training" / "file_links.py"),  "training"),
+    (str(_here / "training" / "dataset_stream.py"), "training"),
+    (str(_here / "training" / "image_prep.py"),  "training"),
+    (str(_here / "training" / "profiling.py"),   "training"),
+    (str(_here / "training" / "throughput_probe.py"), "training"),
 
     # .env config — read at runtime for API_URL
     (str(_here / ".env"), "."),
@@ -0,0 +1,232 @@
+"""
+batch_tuner.py — Pick per-device batch size and gradient accumulation for
+the contributor's hardware while keeping the job's effective batch size.
+
+GPU: run a couple of real forward/backward steps on the longest samples at
+     growing batch sizes until CUDA runs out of memory (or peak use passes
+     _GPU_HEADROOM of the card) and keep the largest size that fit.
+CPU: sample the current RSS while one sample's step runs, take its growth
+     over the RSS just before the step, and size the batch to
+     _CPU_RAM_FRACTION of the RAM still available, shared across DDP ranks.
+
+Results are cached per (model, seq_len, packing, base precision, CPU bf16
+autocast, DDP world size, hardware fingerprint) in
+<user data dir>/TrainChain/batch_tuning.json so later runs skip probing.
+
+Public API
+----------
+    hardware_fingerprint(use_gpu) -> str
+    tune_batch_config(model, collator, train_ds, ...) -> (batch_size, grad_accum)
+"""
+
+import json
+import os
+import platform
+import threading
+
+import psutil
+
+from cache_utils import app_data_dir
+
+_CACHE_FILE       = "batch_tuning.json"
+_MAX_BATCH        = 64
+_PROBE_STEPS      = 2
+_GPU_HEADROOM     = 0.90   # keep ≥10 % VRAM free for allocator fragmentation
+_CPU_RAM_FRACTION = 0.60   # of currently available RAM
+_CPU_MIN_SAMPLE   = 16 * 1024 ** 2   # floor on the measured per-sample growth
+_RSS_SAMPLE_S     = 0.005            # RSS sampling interval during the CPU probe
+
+
+def _log(msg: str) -> None:
+    print(f"[trainchain-llm] {msg}", flush=True)
+
+
+def hardware_fingerprint(use_gpu: bool) -> str:
+    """Coarse identity of the training device — same box, same answer."""
+    if use_gpu:
+        import torch
+
+        props = torch.cuda.get_device_properties(0)
+        return f"cuda:{props.name}:{props.total_memory // 1024 ** 3}GB"
+    ram_gb = psutil.virtual_memory().total // 1024 ** 3
+    return f"cpu:{platform.processor() or platform.machine()}:{os.cpu_count()}c:{ram_gb}GB"
+
+
+def _cache_path():
+    return app_data_dir() / _CACHE_FILE
+
+
+def _load_cache() -> dict:
+    try:
+        return json.loads(_cache_path().read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+
+
+def _save_cache(cache: dict) -> None:
+    path = _cache_path()
+    tmp  = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(cache, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _base_precision(model) -> str:
+    """Precision of the frozen base weights (low_mem.py): int8, bfloat16, float32 …"""
+    import torch
+
+    if any(buf.dtype == torch.int8 for buf in model.buffers()):
+        return "int8"
+    frozen = next((p for p in model.parameters() if not p.requires_grad and p.is_floating_point()), None)
+    return str(frozen.dtype).removeprefix("torch.") if frozen is not None else "unknown"
+
+
+class _RssSampler:
+    """
+    Highest current RSS seen while active, polled on a thread. ru_maxrss /
+    peak_wset are lifetime peaks — model loading has usually set them far
+    above anything one probe step reaches.
+    """
+
+    def __init__(self):
+        self.peak  = 0
+        self._proc = psutil.Process()
+        self._stop = threading.Event()
+
+    def _sample(self) -> None:
+        self.peak = max(self.peak, self._proc.memory_info().rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(_RSS_SAMPLE_S):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def _probe_batch(
+    model, collator, train_ds, indices: list[int], use_gpu: bool, cpu_bf16: bool = False
+) -> None:
+    """Run _PROBE_STEPS forward/backward passes on the given rows."""
+    import torch
+
+    feats = [
+        {k: v for k, v in train_ds[i].items() if k != "length"}
+        for i in indices
+    ]
+    batch  = collator(feats)
+    device = next(p for p in model.parameters() if p.requires_grad).device
+    batch  = {k: v.to(device) for k, v in batch.items()}
+
+    # Mirror the Trainer's autocast: fp16 on GPU, bf16 when CPU mode enables it
+    dtype = torch.float16 if use_gpu else torch.bfloat16
+
+    model.train()
+    for _ in range(_PROBE_STEPS):
+        with torch.autocast(device.type, dtype=dtype, enabled=use_gpu or cpu_bf16):
+            loss = model(**batch).loss
+        loss.backward()
+        model.zero_grad(set_to_none=True)
+
+
+def _longest_rows(train_ds, n: int) -> list[int]:
+    lengths = train_ds["length"]
+    order   = sorted(range(len(lengths)), key=lengths.__getitem__, reverse=True)
+    # Repeat the longest rows if the shard is smaller than the batch
+    return [order[i % len(order)] for i in range(n)]
+
+
+def _probe_gpu(model, collator, train_ds, limit: int) -> int:
+    import torch
+
+    total = torch.cuda.get_device_properties(0).total_memory
+    best, bs = 1, 1
+    while bs <= limit:
+        torch.cuda.empty_cache()
+        torch.cuda.reset_peak_memory_stats()
+        try:
+            _probe_batch(model, collator, train_ds, _longest_rows(train_ds, bs), True)
+        except torch.cuda.OutOfMemoryError:
+            break
+        finally:
+            model.zero_grad(set_to_none=True)
+        peak = torch.cuda.max_memory_allocated()
+        _log(f"Batch probe | bs={bs}  peak VRAM {peak / 1024 ** 3:.2f} GB")
+        if peak > _GPU_HEADROOM * total:
+            break
+        best = bs
+        bs  *= 2
+    torch.cuda.empty_cache()
+    return best
+
+
+def _probe_cpu(model, collator, train_ds, limit: int, world_size: int, cpu_bf16: bool) -> int:
+    baseline = psutil.Process().memory_info().rss
+    with _RssSampler() as rss:
+        _probe_batch(model, collator, train_ds, _longest_rows(train_ds, 1), False, cpu_bf16)
+    per_sample = max(rss.peak - baseline, _CPU_MIN_SAMPLE)
+    # Every DDP rank trains at the size rank 0 picks, all from the same RAM
+    budget     = _CPU_RAM_FRACTION * psutil.virtual_memory().available / world_size
+    _log(
+        f"Batch probe | ~{per_sample / 1024 ** 2:.0f} MB per sample, "
+        f"{budget / 1024 ** 3:.1f} GB budget per rank"
+    )
+    fits = int(budget // per_sample)
+    # Powers of two keep the length-grouped sampler's buckets even
+    best = 1
+    while best * 2 <= min(fits, limit):
+        best *= 2
+    return best
+
+
+def tune_batch_config(
+    model,
+    collator,
+    train_ds,
+    model_name: str,
+    max_seq_len: int,
+    packing: bool,
+    effective_batch: int,
+    use_gpu: bool,
+    world_size: int = 1,
+    cpu_bf16: bool = False,
+) -> tuple[int, int]:
+    """
+    Return (per_device_batch_size, gradient_accumulation_steps) with
+    batch * accum ≈ effective_batch. Cached per hardware fingerprint.
+    world_size is the number of CPU DDP ranks sharing this machine's RAM;
+    cpu_bf16 is whether CPU training runs under bf16 autocast (cpu_mode.py).
+    """
+    key = (
+        f"{model_name}|seq={max_seq_len}|packing={packing}|base={_base_precision(model)}"
+        f"|bf16={cpu_bf16}|world={world_size}|{hardware_fingerprint(use_gpu)}"
+    )
+    cache = _load_cache()
+    limit = max(1, min(_MAX_BATCH, effective_batch, len(train_ds)))
+    if key in cache:
+        # The cached size came from another job; this one's batch or shard may be smaller
+        bs = min(int(cache[key]["batch_size"]), limit)
+        _log(f"Batch config cached for this hardware: batch_size={bs}")
+    else:
+        try:
+            if use_gpu:
+                bs = _probe_gpu(model, collator, train_ds, limit)
+            else:
+                bs = _probe_cpu(model, collator, train_ds, limit, world_size, cpu_bf16)
+        except Exception as exc:
+            # Probing is best-effort; fall back to the smallest safe batch
+            _log(f"Batch probe failed ({exc}) — using batch_size=1")
+            return 1, effective_batch
+        cache[key] = {"batch_size": bs}
+        _save_cache(cache)
+
+    accum = max(1, round(effective_batch / bs))
+    _log(f"Batch config | batch_size={bs}  grad_accum={accum}  effective={bs * accum}")
+    return bs, accum
@@ -0,0 +1,259 @@
+"""
+cache_utils.py — Persistent, size-capped caches for the training scripts.
+
+Lives next to train_llm.py and is imported by it inside the uv-managed venv.
+Caches are stored under the same per-user app data directory as the desktop
+app's session file (see frontend/session.py):
+
+    <user data dir>/TrainChain/cache/<name>/
+        manifest.json        — {key: {"size", "last_used", "meta"}}
+        .manifest.lock       — held across every manifest read-modify-write
+        .lock_<key>          — held while an entry is written; eviction skips it
+        .staging_<key>_<pid> — entry being written (swept once <pid> has exited)
+        <key>/               — one directory per entry
+
+Public API
+----------
+    app_data_dir() -> Path           — TrainChain per-user data directory
+    file_sha256(path) -> str         — streaming content hash
+    FileLock(path)                   — cross-process lock, released if the holder dies
+    LRUCache(name, max_bytes)        — directory cache with LRU eviction
+        .key_lock(key) -> FileLock   — per-entry lock
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+import psutil
+
+_APP_FOLDER_NAME = "TrainChain"
+
+
+def app_data_dir() -> Path:
+    """
+    Return the persistent TrainChain data directory.
+
+    Windows: %APPDATA%\\TrainChain
+    macOS:   ~/Library/Application Support/TrainChain
+    Linux:   ~/.local/share/TrainChain
+    """
+    if sys.platform == "win32":
+        base = Path(os.environ.get("APPDATA", Path.home() / "AppData" / "Roaming"))
+    elif sys.platform == "darwin":
+        base = Path.home() / "Library" / "Application Support"
+    else:
+        base = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share"))
+    path = base / _APP_FOLDER_NAME
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    """Hash a file in 1 MB chunks so large shards never load into memory."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FileLock:
+    """
+    Exclusive cross-process lock on `path` (fcntl.flock / msvcrt.locking).
+
+    The lock belongs to the open file, so the OS drops it when the holder
+    exits — crashed or killed included — and a lock is never left stale.
+    The lock file itself stays behind; it is empty and reused next time.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd  = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Take the lock; with blocking=False return False if another process holds it."""
+        fd = os.open(self.path, os.O_CREAT | os.O_RDWR)
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+
+                while True:
+                    try:
+                        # Byte 0; LK_LOCK retries for ~10 s, then raises
+                        os.lseek(fd, 0, os.SEEK_SET)
+                        msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+                        break
+                    except OSError:
+                        if not blocking:
+                            os.close(fd)
+                            return False
+            else:
+                import fcntl
+
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    return False
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if sys.platform == "win32":
+            import msvcrt
+
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)   # also releases the flock
+        self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _dir_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class LRUCache:
+    """
+    Directory-per-key cache with a JSON manifest and least-recently-used
+    eviction once the total size exceeds max_bytes.
+
+    Entries are written to a staging directory and renamed into place by
+    commit(), so a crash mid-write never leaves a half-written entry behind.
+    Several processes share a cache (prefetch, trainer, benchmarks): every
+    manifest update runs under a FileLock, so none of them loses another's.
+    A writer may hold key_lock(key) while it produces an entry; eviction
+    never deletes an entry whose lock another process holds.
+    """
+
+    def __init__(self, name: str, max_bytes: int):
+        self.root      = app_data_dir() / "cache" / name
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._manifest_path = self.root / "manifest.json"
+        self._lock_path     = self.root / ".manifest.lock"
+
+    # ── Manifest ──────────────────────────────────────────────────────────
+
+    def _load(self) -> dict:
+        try:
+            return json.loads(self._manifest_path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}   # missing or corrupt — entries are re-indexed lazily
+
+    def _save(self, manifest: dict) -> None:
+        # Per-process temp name: a reader never sees another writer's partial file
+        tmp = self._manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        os.replace(tmp, self._manifest_path)
+
+    def _locked(self) -> FileLock:
+        """Hold across a _load() → _save() so concurrent updates aren't lost."""
+        return FileLock(self._lock_path)
+
+    def key_lock(self, key: str) -> FileLock:
+        """Per-entry lock, taken by eviction before it deletes the entry."""
+        return FileLock(self.root / f".lock_{key}")
+
+    def entries(self) -> dict:
+        """Return the manifest: {key: {"size", "last_used", "meta"}}."""
+        return self._load()
+
+    # ── Lookup / store ────────────────────────────────────────────────────
+
+    def get(self, key: str) -> tuple[Path, dict] | None:
+        """Return (entry_dir, meta) and mark it as used, or None on a miss."""
+        with self._locked():
+            manifest = self._load()
+            entry    = manifest.get(key)
+            path     = self.root / key
+            if entry is None or not path.is_dir():
+                return None
+            entry["last_used"] = time.time()
+            self._save(manifest)
+        return path, entry.get("meta", {})
+
+    def staging_dir(self, key: str) -> Path:
+        """Fresh directory to write a new entry into before commit()."""
+        self._sweep_staging()
+        path = self.root / f".staging_{key}_{os.getpid()}"
+        shutil.rmtree(path, ignore_errors=True)
+        path.mkdir(parents=True)
+        return path
+
+    def commit(self, key: str, staging: Path, meta: dict | None = None) -> Path:
+        """Atomically move a staged entry into place, then evict down to max_bytes."""
+        final = self.root / key
+        with self._locked():
+            shutil.rmtree(final, ignore_errors=True)
+            os.replace(staging, final)
+
+            manifest = self._load()
+            manifest[key] = {
+                "size":      _dir_size(final),
+                "last_used": time.time(),
+                "meta":      meta or {},
+            }
+            self._evict(manifest, keep=key)
+        return final
+
+    def touch(self, key: str) -> None:
+        with self._locked():
+            manifest = self._load()
+            if key in manifest:
+                manifest[key]["last_used"] = time.time()
+                self._save(manifest)
+
+    def evict(self, keep: str | None = None) -> list[str]:
+        """Drop least-recently-used entries until the cache fits max_bytes."""
+        with self._locked():
+            return self._evict(self._load(), keep)
+
+    def _sweep_staging(self) -> None:
+        """Remove staging dirs whose writer has exited (crashed or killed mid-write)."""
+        for path in self.root.glob(".staging_*"):
+            pid = path.name.rsplit("_", 1)[-1]
+            if pid.isdigit() and int(pid) != os.getpid() and not psutil.pid_exists(int(pid)):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _evict(self, manifest: dict, keep: str | None) -> list[str]:
+        """evict() body; the caller holds the manifest lock and passes what it loaded."""
+        self._sweep_staging()
+        # Forget entries whose directory was deleted by hand
+        manifest = {k: v for k, v in manifest.items() if (self.root / k).is_dir()}
+        total    = sum(v["size"] for v in manifest.values())
+        evicted  = []
+        for key, entry in sorted(manifest.items(), key=lambda kv: kv[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            # Non-blocking: a writer takes key_lock() before the manifest lock,
+            # so waiting here could deadlock — a busy entry is skipped instead
+            lock = self.key_lock(key)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(self.root / key, ignore_errors=True)
+            finally:
+                lock.release()
+            total -= entry["size"]
+            evicted.append(key)
+        for key in evicted:
+            manifest.pop(key, None)
+        self._save(manifest)
+        return evicted
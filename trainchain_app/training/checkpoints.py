@@ -0,0 +1,125 @@
+"""
+checkpoints.py — Preemption-safe training state for train_llm.py.
+
+Each slot gets a persistent run directory that survives app restarts,
+crashes and reboots:
+
+    <user data dir>/TrainChain/checkpoints/job<id>_r<round>_<hash>/
+        run.json                 — slot identity + batch config of the run
+        checkpoints/
+            checkpoint-<step>/   — LoRA weights, optimizer, scheduler, RNG,
+                                   trainer state (→ data position)
+                .complete        — written last; only marked dirs are resumed
+        adapter/                 — final adapter, once training has finished
+
+The hash covers the contributor wallet and shard CID, so a re-sharded job
+never resumes onto the wrong data. Trainer keeps at most two checkpoints;
+whole run directories are dropped after a successful submit or once stale.
+
+Public API
+----------
+    run_dir(slot, contributor_wallet) -> Path
+    latest_checkpoint(run_dir) -> Path | None
+    mark_complete(checkpoint_dir) -> None
+    load_run_config(run_dir) -> dict | None
+    save_run_config(run_dir, config) -> None
+    finished_adapter(run_dir) -> Path | None
+    discard(run_dir) -> None
+    prune_stale(max_age_days) -> list[str]
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+
+from cache_utils import app_data_dir
+
+_MARKER = ".complete"
+_CKPT_RE = re.compile(r"^checkpoint-(\d+)$")
+
+
+def _root() -> Path:
+    path = app_data_dir() / "checkpoints"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def run_dir(slot: dict, contributor_wallet: str) -> Path:
+    """Persistent directory for this (job, round, contributor, shard)."""
+    ident = f"{contributor_wallet.lower()}|{slot.get('shard_cid')}|{slot.get('model_name')}"
+    digest = hashlib.sha256(ident.encode()).hexdigest()[:12]
+    rnd    = int(slot.get("current_round") or 1)
+    path   = _root() / f"job{slot['job_id']}_r{rnd}_{digest}"
+    path.mkdir(parents=True, exist_ok=True)
+    os.utime(path)   # last activity, for prune_stale()
+    return path
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write(text)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def mark_complete(checkpoint_dir: Path) -> None:
+    """Commit a checkpoint once Trainer has finished writing every file in it."""
+    _write_atomic(checkpoint_dir / _MARKER, json.dumps({"saved_at": time.time()}))
+
+
+def latest_checkpoint(run_dir: Path) -> Path | None:
+    """
+    Newest committed checkpoint. Unmarked ones (process killed mid-save)
+    are deleted so Trainer's rotation never counts them.
+    """
+    ckpt_root = run_dir / "checkpoints"
+    if not ckpt_root.is_dir():
+        return None
+    committed: list[tuple[int, Path]] = []
+    for child in ckpt_root.iterdir():
+        m = _CKPT_RE.match(child.name)
+        if not m or not child.is_dir():
+            continue
+        if (child / _MARKER).exists():
+            committed.append((int(m.group(1)), child))
+        else:
+            shutil.rmtree(child, ignore_errors=True)
+    return max(committed)[1] if committed else None
+
+
+def load_run_config(run_dir: Path) -> dict | None:
+    try:
+        return json.loads((run_dir / "run.json").read_text(encoding="utf-8"))
+    except Exception:
+        return None
+
+
+def save_run_config(run_dir: Path, config: dict) -> None:
+    _write_atomic(run_dir / "run.json", json.dumps(config, indent=2))
+
+
+def finished_adapter(run_dir: Path) -> Path | None:
+    """Adapter from a run that trained to completion but was never submitted."""
+    adapter = run_dir / "adapter"
+    return adapter if (adapter / "train_metrics.json").exists() else None
+
+
+def discard(run_dir: Path) -> None:
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def prune_stale(max_age_days: float = 14) -> list[str]:
+    """Drop run directories untouched for max_age_days (abandoned slots)."""
+    cutoff  = time.time() - max_age_days * 86400
+    removed = []
+    for child in _root().iterdir():
+        if child.is_dir() and child.stat().st_mtime < cutoff:
+            shutil.rmtree(child, ignore_errors=True)
+            removed.append(child.name)
+    return removed
@@ -0,0 +1,225 @@
+"""
+cpu_ddp.py — Multi-process data-parallel CPU training (torch.distributed, gloo).
+
+One Trainer process stops scaling long before a many-core CPU runs out of
+cores: per-op threading (small GEMMs, elementwise kernels, the optimizer
+step) leaves most of them idle. With --cpu-workers N, train_llm.py prepares
+the shard once, then re-launches itself N times as DDP ranks on 127.0.0.1:
+
+    - each rank is pinned to its own contiguous slice of the physical cores
+      and sizes its thread pools to that slice,
+    - the Trainer's DistributedSampler gives each rank its own slice of the
+      shard; LoRA gradients are all-reduced over gloo every optimizer step,
+      so all ranks hold identical weights,
+    - rank 0 alone tunes the batch, writes checkpoints and saves the adapter.
+
+Rank 0's output is forwarded to the launcher's stdout (so jobs_window.py
+sees one normal log / progress stream); the other ranks log to
+rank<k>.log in the run directory.
+
+Every rank holds a full copy of the base model, so the worker count is
+also capped by RAM (see plan_workers).
+
+Public API
+----------
+    rank() -> int
+    world_size() -> int
+    is_main_process() -> bool
+    worker_cpus() -> list[int] | None         — this rank's pinned cores
+    plan_workers(requested, model_path) -> int
+    launch(cmd, n_workers, log_dir) -> int    — exit code of the run
+    init_worker() -> None                     — join the gloo process group
+    broadcast(obj) -> obj                     — rank 0's value on every rank
+    any_rank(flag) -> bool                    — True if any rank passed True
+    barrier() -> None
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import psutil
+
+from cpu_mode import _physical_core_cpus
+
+_CPUS_ENV = "TRAINCHAIN_DDP_CPUS"
+
+# Below this many cores per rank the all-reduce and per-rank overhead outweigh
+# the extra parallelism
+_MIN_CORES_PER_WORKER = 2
+# Per-rank RAM on top of the weights: activations, optimizer state, DataLoader
+_WORKER_OVERHEAD_GB   = 1.5
+_RAM_FRACTION         = 0.80
+
+
+def _log(msg: str) -> None:
+    print(f"[trainchain-llm] {msg}", flush=True)
+
+
+def rank() -> int:
+    return int(os.environ.get("RANK", "0"))
+
+
+def world_size() -> int:
+    return int(os.environ.get("WORLD_SIZE", "1"))
+
+
+def is_main_process() -> bool:
+    return rank() == 0
+
+
+def worker_cpus() -> list[int] | None:
+    """Cores the launcher assigned to this rank; None outside a DDP run."""
+    cpus = os.environ.get(_CPUS_ENV)
+    return [int(c) for c in cpus.split(",")] if cpus else None
+
+
+def _core_slices(n_workers: int) -> list[list[int]]:
+    """Split the physical cores into n contiguous, near-equal slices."""
+    cores = _physical_core_cpus()
+    size, extra = divmod(len(cores), n_workers)
+    slices, start = [], 0
+    for i in range(n_workers):
+        end = start + size + (1 if i < extra else 0)
+        slices.append(cores[start:end])
+        start = end
+    return slices
+
+
+def plan_workers(requested: int, model_path: str | None = None) -> int:
+    """Clamp the requested rank count to the cores and RAM this machine has."""
+    n = min(requested, max(1, len(_physical_core_cpus()) // _MIN_CORES_PER_WORKER))
+    if model_path and Path(model_path).is_dir():
+        weights    = sum(f.stat().st_size for f in Path(model_path).glob("*.safetensors"))
+        per_worker = weights + _WORKER_OVERHEAD_GB * 1024 ** 3
+        fits       = int(_RAM_FRACTION * psutil.virtual_memory().available // per_worker)
+        n          = min(n, max(1, fits))
+    if n < requested:
+        _log(f"CPU workers: {requested} requested, {n} fit this machine's cores / RAM")
+    return n
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _forward(stream) -> None:
+    for line in stream:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def launch(cmd: list[str], n_workers: int, log_dir: Path) -> int:
+    """
+    Run `cmd` as n_workers DDP ranks and wait for them. If any rank fails the
+    others are terminated (they would otherwise block in the next all-reduce).
+    Returns 0 on success, else the first non-zero exit code.
+    """
+    port   = _free_port()
+    slices = _core_slices(n_workers)
+    procs: list[subprocess.Popen] = []
+    logs  = []
+    for r, cpus in enumerate(slices):
+        env = dict(
+            os.environ,
+            RANK=str(r),
+            LOCAL_RANK=str(r),
+            WORLD_SIZE=str(n_workers),
+            LOCAL_WORLD_SIZE=str(n_workers),
+            MASTER_ADDR="127.0.0.1",
+            MASTER_PORT=str(port),
+            CUDA_VISIBLE_DEVICES="",
+            PYTHONUNBUFFERED="1",
+        )
+        env[_CPUS_ENV] = ",".join(map(str, cpus))
+        if sys.platform == "win32":
+            env["USE_LIBUV"] = "0"   # Windows torch builds ship TCPStore without libuv
+        if r == 0:
+            proc = subprocess.Popen(
+                cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                text=True, encoding="utf-8", errors="replace",
+            )
+            threading.Thread(target=_forward, args=(proc.stdout,), daemon=True).start()
+        else:
+            fh = open(log_dir / f"rank{r}.log", "w", encoding="utf-8")
+            logs.append(fh)
+            proc = subprocess.Popen(cmd, env=env, stdout=fh, stderr=subprocess.STDOUT)
+        procs.append(proc)
+    _log(f"CPU DDP | {n_workers} ranks  cores/rank={[len(s) for s in slices]}  port={port}")
+
+    code = 0
+    try:
+        while any(p.poll() is None for p in procs):
+            failed = [p for p in procs if p.returncode not in (None, 0)]
+            if failed:
+                code = failed[0].returncode
+                break
+            time.sleep(0.5)
+        else:
+            code = next((p.returncode for p in procs if p.returncode != 0), 0)
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        for fh in logs:
+            fh.close()
+    if code != 0:
+        _log(f"CPU DDP | a rank exited with code {code}; other ranks' logs are in {log_dir}")
+    return code
+
+
+def init_worker() -> None:
+    """Join the launcher's process group (env:// rendezvous on MASTER_ADDR/PORT)."""
+    import torch.distributed as dist
+
+    if world_size() > 1 and not dist.is_initialized():
+        dist.init_process_group("gloo", rank=rank(), world_size=world_size())
+
+
+def _distributed() -> bool:
+    if world_size() <= 1:
+        return False
+    import torch.distributed as dist
+
+    return dist.is_available() and dist.is_initialized()
+
+
+def broadcast(obj):
+    """Rank 0's `obj` on every rank (identity outside a DDP run)."""
+    if not _distributed():
+        return obj
+    import torch.distributed as dist
+
+    box = [obj]
+    dist.broadcast_object_list(box, src=0)
+    return box[0]
+
+
+def any_rank(flag: bool) -> bool:
+    """Collective OR — keeps per-rank decisions (stop, save) in lock-step."""
+    if not _distributed():
+        return flag
+    import torch
+    import torch.distributed as dist
+
+    t = torch.tensor([1 if flag else 0], dtype=torch.int32)
+    dist.all_reduce(t, op=dist.ReduceOp.MAX)
+    return bool(t.item())
+
+
+def barrier() -> None:
+    if _distributed():
+        import torch.distributed as dist
+
+        dist.barrier()
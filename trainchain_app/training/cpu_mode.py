@@ -0,0 +1,118 @@
+"""
+cpu_mode.py — Tuning for contributors who train without a CUDA GPU.
+
+Threads: one intra-op thread per physical core, and the process is pinned to
+one logical CPU per core — SMT siblings share the FPUs, so they add cache
+contention to dense GEMMs rather than throughput. configure_cpu_threads()
+should run before torch is imported so the OpenMP / MKL pools are sized from
+the environment; it also re-applies the counts if torch is already loaded.
+
+Precision: the frozen base weights are fp32, bf16 or int8 (low_mem.py) and
+the LoRA weights fp32; on CPUs with AVX512-BF16 or AMX the forward and
+backward passes run under bf16 autocast, which roughly doubles matmul
+throughput there. Older CPUs emulate bf16 and get slower, so they compute
+in fp32.
+
+Public API
+----------
+    configure_cpu_threads(cpus=None, pin=True) -> dict   — {"intra_op", "inter_op", "cpus"}
+    cpu_supports_bf16() -> bool
+    cpu_training_kwargs(bf16, compile_model) -> dict   — TrainingArguments overrides
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import psutil
+
+# DataLoader workers prefetch/collate the next batches while the main
+# process is inside a step; 2 is enough since collation is cheap.
+_DATALOADER_WORKERS = 2
+_PREFETCH_FACTOR    = 4
+
+
+def _physical_core_cpus() -> list[int]:
+    """One logical CPU id per physical core (first SMT sibling)."""
+    logical = list(range(os.cpu_count() or 1))
+    if sys.platform.startswith("linux"):
+        chosen, seen = [], set()
+        for cpu in logical:
+            sib = Path(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list")
+            try:
+                siblings = sib.read_text().strip()
+            except OSError:
+                return logical
+            if siblings not in seen:
+                seen.add(siblings)
+                chosen.append(cpu)
+        return chosen
+    physical = psutil.cpu_count(logical=False) or len(logical)
+    if physical < len(logical) and sys.platform == "win32":
+        # Windows enumerates SMT siblings adjacently (0,1), (2,3), …
+        step = len(logical) // physical
+        return logical[::step][:physical]
+    return logical[:physical]
+
+
+def configure_cpu_threads(cpus: list[int] | None = None, pin: bool = True) -> dict:
+    """
+    Set thread-pool sizes (env + torch if already imported) and CPU affinity.
+    cpus — cores to use (a DDP rank's slice, see cpu_ddp.py); default all physical.
+    Returns {"intra_op", "inter_op", "cpus"} for logging.
+    """
+    cpus     = cpus or _physical_core_cpus()
+    intra_op = max(1, len(cpus))
+    inter_op = 1 if intra_op <= 4 else 2
+
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(intra_op)
+
+    if pin:
+        try:
+            psutil.Process().cpu_affinity(cpus)   # not supported on macOS
+        except (AttributeError, NotImplementedError, OSError):
+            pass
+
+    if "torch" in sys.modules:
+        import torch
+
+        torch.set_num_threads(intra_op)
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError:
+            pass   # fixed for the process once any parallel work has run
+
+    return {"intra_op": intra_op, "inter_op": inter_op, "cpus": cpus}
+
+
+def cpu_supports_bf16() -> bool:
+    """True when the CPU has native bf16 matmul (AVX512-BF16 or AMX)."""
+    import torch
+
+    for probe in ("_is_amx_tile_supported", "_is_avx512_bf16_supported"):
+        fn = getattr(torch.cpu, probe, None)
+        try:
+            if fn is not None and fn():
+                return True
+        except Exception:
+            pass
+    try:
+        flags = Path("/proc/cpuinfo").read_text()
+        return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        return False
+
+
+def cpu_training_kwargs(bf16: bool, compile_model: bool = False) -> dict:
+    """TrainingArguments overrides for the CPU path."""
+    return {
+        "use_cpu":                       True,   # no_cuda was removed in Transformers ≥4.37
+        "bf16":                          bf16,   # CPU autocast; LoRA weights stay fp32
+        "fp16":                          False,
+        "torch_compile":                 compile_model,
+        "dataloader_num_workers":        _DATALOADER_WORKERS,
+        "dataloader_prefetch_factor":    _PREFETCH_FACTOR,
+        "dataloader_persistent_workers": True,
+        "dataloader_pin_memory":         False,
+    }
@@ -0,0 +1,340 @@
+"""
+dataset_stream.py — Download a YOLO dataset ZIP straight into its split layout.
+
+The train / valid / test assignment is decided from the ZIP's central
+directory alone (names only, seeded shuffle — the same archive always
+splits the same way), then the archive body is streamed once and every
+image / label is inflated directly into dest/<split>/images|labels:
+
+    1. GET Range: bytes=-_TAIL_BYTES   — end of the archive; zipfile parses the
+                                          central directory from it (extra
+                                          ranges only for very large directories)
+    2. GET Range: bytes=<first>-<cd>   — the member data (skipped when step 1
+                                          already returned the whole archive),
+                                          consumed sequentially;
+                                          members that aren't images / labels
+                                          are skipped, never written
+
+Peak disk use is one extracted copy of the dataset. If the server ignores
+Range (200 instead of 206) or refuses the tail request (416 for an archive
+smaller than _TAIL_BYTES), or a member uses a compression other than
+stored / deflate, the archive is spooled to disk once and extracted from
+there instead — still straight into the split folders.
+
+Re-downloads are conditional: the first request carries the previous
+ETag / Last-Modified (304 → nothing to do), and the central directory's
+fingerprint (every member's name, CRC-32 and size) catches an unchanged
+archive from servers that send neither.
+
+Public API
+----------
+    SPLITS                                        — ("train", "valid", "test")
+    IMAGE_SUFFIXES
+    plan_splits(items, seed) -> dict[str, list]   — 70 / 20 / 10, deterministic
+    extract_split(url, dest_dir, seed, timeout, cached) -> dict | None
+                                                  — None: `cached` is still current
+"""
+
+import hashlib
+import io
+import random
+import shutil
+import struct
+import zipfile
+import zlib
+from pathlib import Path
+
+import requests
+
+from file_links import LinkPlacer
+
+SPLITS         = ("train", "valid", "test")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png")
+
+# Tail fetched first: EOCD + max comment, and the whole central directory of
+# any archive up to ~10k files (~100 bytes per entry)
+_TAIL_BYTES  = 1024 ** 2
+_CHUNK_BYTES = 1024 ** 2
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_LOCAL_MAGIC  = b"PK\x03\x04"
+_STREAMABLE   = (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED)
+
+
+def _log(msg: str) -> None:
+    print(f"[trainchain] {msg}", flush=True)
+
+
+def plan_splits(items: list, seed: int) -> dict[str, list]:
+    """Sorted, then shuffled with `seed` and cut 70 % / 20 % / 10 %."""
+    items = sorted(items)
+    random.Random(seed).shuffle(items)
+    train_size = int(0.7 * len(items))
+    valid_size = int(0.2 * len(items))
+    return {
+        "train": items[:train_size],
+        "valid": items[train_size:train_size + valid_size],
+        "test":  items[train_size + valid_size:],
+    }
+
+
+# ── Remote archive access ─────────────────────────────────────────────────────
+
+class _HttpRangeFile(io.RawIOBase):
+    """Seekable read-only view of a remote file; reads inside the tail are free."""
+
+    def __init__(self, session: requests.Session, url: str, size: int, tail: bytes, timeout: float):
+        self._session  = session
+        self._url      = url
+        self._size     = size
+        self._tail     = tail
+        self._tail_at  = size - len(tail)
+        self._timeout  = timeout
+        self._pos      = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base      = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def read(self, n: int = -1) -> bytes:
+        end = self._size if n is None or n < 0 else min(self._size, self._pos + n)
+        if end <= self._pos:
+            return b""
+        if self._pos >= self._tail_at:
+            data = self._tail[self._pos - self._tail_at:end - self._tail_at]
+        else:
+            r = self._session.get(
+                self._url, headers={"Range": f"bytes={self._pos}-{end - 1}"}, timeout=self._timeout
+            )
+            r.raise_for_status()
+            if r.status_code != 206:
+                raise OSError(f"{self._url} stopped honouring Range requests")
+            data = r.content
+        self._pos += len(data)
+        return data
+
+
+class _Sequential:
+    """Forward-only reader over a response body, tracking the archive offset."""
+
+    def __init__(self, chunks, start: int):
+        self._it  = chunks
+        self._buf = memoryview(b"")
+        self.pos  = start
+
+    def chunks(self, n: int):
+        while n > 0:
+            if not self._buf:
+                chunk = next(self._it, b"")
+                if not chunk:
+                    raise zipfile.BadZipFile("dataset archive ended early")
+                self._buf = memoryview(chunk)
+            piece, self._buf = self._buf[:n], self._buf[n:]
+            n        -= len(piece)
+            self.pos += len(piece)
+            yield piece
+
+    def read(self, n: int) -> bytes:
+        return b"".join(bytes(p) for p in self.chunks(n))
+
+    def skip(self, n: int) -> None:
+        for _ in self.chunks(n):
+            pass
+
+
+# ── Plan ──────────────────────────────────────────────────────────────────────
+
+def _targets(infos: list[zipfile.ZipInfo], dest_dir: Path, seed: int) -> tuple[dict, dict[str, int]]:
+    """{member name: [destination paths]} for every image / label, plus split sizes."""
+    # Flat layout, as dataset_arrange.py expects: top-level files only
+    members = {i.filename: i for i in infos if not i.is_dir() and "/" not in i.filename}
+    images  = [n for n in members if Path(n).suffix.lower() in IMAGE_SUFFIXES]
+    if not images:
+        raise RuntimeError("No images found in the dataset archive")
+
+    plan    = plan_splits(images, seed)
+    targets: dict[str, list[Path]] = {}
+    for split, names in plan.items():
+        for name in names:
+            targets.setdefault(name, []).append(dest_dir / split / "images" / name)
+            label = f"{Path(name).stem}.txt"
+            dest  = dest_dir / split / "labels" / label
+            # a.jpg and a.png in the same split share one a.txt
+            if label in members and dest not in targets.get(label, ()):
+                targets.setdefault(label, []).append(dest)
+    return targets, {split: len(names) for split, names in plan.items()}
+
+
+def _fan_out(paths: list[Path]) -> None:
+    """Same file under several splits (e.g. a.jpg and a.png share a.txt)."""
+    # Links within dest_dir must survive the whole tree being renamed
+    placer = LinkPlacer(allow_move=False, allow_symlink=False)
+    for extra in paths[1:]:
+        placer.place(paths[0], extra)
+
+
+# ── Extraction ────────────────────────────────────────────────────────────────
+
+def _extract_stream(stream: _Sequential, info: zipfile.ZipInfo, paths: list[Path]) -> None:
+    stream.skip(info.header_offset - stream.pos)
+    fields = _LOCAL_HEADER.unpack(stream.read(_LOCAL_HEADER.size))
+    if fields[0] != _LOCAL_MAGIC:
+        raise zipfile.BadZipFile(f"bad local header for {info.filename}")
+    stream.skip(fields[10] + fields[11])   # file name + extra field
+
+    inflate = zlib.decompressobj(-zlib.MAX_WBITS) if info.compress_type == zipfile.ZIP_DEFLATED else None
+    crc     = 0
+    with open(paths[0], "wb") as out:
+        for piece in stream.chunks(info.compress_size):
+            data = inflate.decompress(piece) if inflate else piece
+            crc  = zlib.crc32(data, crc)
+            out.write(data)
+        if inflate:
+            data = inflate.flush()
+            crc  = zlib.crc32(data, crc)
+            out.write(data)
+    if crc != info.CRC:
+        raise zipfile.BadZipFile(f"CRC mismatch in {info.filename}")
+    _fan_out(paths)
+
+
+def _extract_local(zf: zipfile.ZipFile, targets: dict) -> None:
+    for info in sorted((zf.getinfo(n) for n in targets), key=lambda i: i.header_offset):
+        paths = targets[info.filename]
+        with zf.open(info) as src, open(paths[0], "wb") as out:
+            shutil.copyfileobj(src, out, _CHUNK_BYTES)
+        _fan_out(paths)
+
+
+def _prepare(dest_dir: Path) -> None:
+    for split in SPLITS:
+        (dest_dir / split / "images").mkdir(parents=True, exist_ok=True)
+        (dest_dir / split / "labels").mkdir(parents=True, exist_ok=True)
+
+
+def _fingerprint(infos: list[zipfile.ZipInfo]) -> str:
+    """Content hash of the archive from its central directory (names, CRC-32s, sizes)."""
+    h = hashlib.sha256()
+    for info in sorted(infos, key=lambda i: i.filename):
+        h.update(f"{info.filename}\0{info.CRC:08x}\0{info.file_size}\n".encode())
+    return h.hexdigest()
+
+
+def _result(resp: requests.Response, counts: dict[str, int], fingerprint: str) -> dict:
+    return {
+        "splits":        counts,
+        "etag":          resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "fingerprint":   fingerprint,
+    }
+
+
+def _spool(resp: requests.Response, dest_dir: Path, seed: int, cached: dict | None) -> dict | None:
+    """Server without Range support: one copy of the ZIP, extracted into place."""
+    zip_path = dest_dir.parent / f"{dest_dir.name}.zip"
+    try:
+        with open(zip_path, "wb") as fh:
+            for chunk in resp.iter_content(chunk_size=_CHUNK_BYTES):
+                fh.write(chunk)
+        _log(f"Dataset zip saved ({zip_path.stat().st_size // 1024} KB)")
+        with zipfile.ZipFile(zip_path) as zf:
+            fingerprint = _fingerprint(zf.infolist())
+            if cached and cached.get("fingerprint") == fingerprint:
+                return None
+            targets, counts = _targets(zf.infolist(), dest_dir, seed)
+            _prepare(dest_dir)
+            _extract_local(zf, targets)
+    finally:
+        zip_path.unlink(missing_ok=True)
+    return _result(resp, counts, fingerprint)
+
+
+def _conditional_headers(cached: dict | None) -> dict:
+    headers = {}
+    if cached and cached.get("etag"):
+        headers["If-None-Match"] = cached["etag"]
+    if cached and cached.get("last_modified"):
+        headers["If-Modified-Since"] = cached["last_modified"]
+    return headers
+
+
+def extract_split(
+    url: str,
+    dest_dir: Path,
+    seed: int = 0,
+    timeout: float = 300,
+    cached: dict | None = None,
+) -> dict | None:
+    """
+    Download the dataset ZIP at `url` into dest_dir/<split>/images|labels.
+
+    `cached` is the result of an earlier call for the same URL. Its ETag /
+    Last-Modified make the first request conditional; without them the
+    archive's fingerprint is compared once the central directory is read.
+    Returns None if that earlier extraction is still current (nothing is
+    written), else {"splits": {split: images}, "etag", "last_modified",
+    "fingerprint"}.
+    """
+    session = requests.Session()
+    resp    = session.get(
+        url,
+        headers={"Range": f"bytes=-{_TAIL_BYTES}", **_conditional_headers(cached)},
+        stream=True,
+        timeout=timeout,
+    )
+    if resp.status_code == 304:
+        return None
+    if resp.status_code == 416:
+        # Some servers refuse a suffix longer than the archive instead of
+        # sending all of it (RFC 7233 §2.1) — ask again for the whole body
+        resp.close()
+        resp = session.get(url, headers=_conditional_headers(cached), stream=True, timeout=timeout)
+        if resp.status_code == 304:
+            return None
+    resp.raise_for_status()
+    if resp.status_code != 206:
+        _log("Dataset server sent the whole archive, not a byte range — spooling the ZIP")
+        return _spool(resp, dest_dir, seed, cached)
+
+    size = int(resp.headers["Content-Range"].rsplit("/", 1)[1])
+    tail = resp.content
+    zf   = zipfile.ZipFile(_HttpRangeFile(session, url, size, tail, timeout))
+    fingerprint = _fingerprint(zf.infolist())
+    if cached and cached.get("fingerprint") == fingerprint:
+        return None
+    targets, counts = _targets(zf.infolist(), dest_dir, seed)
+    infos = sorted((zf.getinfo(n) for n in targets), key=lambda i: i.header_offset)
+    if any(i.compress_type not in _STREAMABLE or i.flag_bits & 0x1 for i in infos):
+        _log("Dataset archive needs zipfile to decode — spooling the ZIP")
+        full = session.get(url, stream=True, timeout=timeout)
+        full.raise_for_status()
+        return _spool(full, dest_dir, seed, None)
+
+    _prepare(dest_dir)
+    first = infos[0].header_offset
+    if len(tail) == size:
+        # Small archive: the tail request already fetched all of it
+        stream = _Sequential(iter([tail[first:zf.start_dir]]), first)
+        body   = None
+    else:
+        body = session.get(
+            url, headers={"Range": f"bytes={first}-{zf.start_dir - 1}"}, stream=True, timeout=timeout
+        )
+        body.raise_for_status()
+        stream = _Sequential(body.iter_content(chunk_size=_CHUNK_BYTES), first)
+    for info in infos:
+        _extract_stream(stream, info, targets[info.filename])
+    if body is not None:
+        body.close()
+    _log(f"Dataset streamed: {len(targets)} files from a {size // 1024} KB archive")
+    return _result(resp, counts, fingerprint)
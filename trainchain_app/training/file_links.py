@@ -0,0 +1,117 @@
+"""
+file_links.py — Place dataset files without copying their bytes.
+
+Used by train_yolo.arrange_dataset() to lay a local, already-extracted
+dataset out into train/valid/test (downloaded datasets are streamed straight
+into that layout by dataset_stream.py, which also uses it when one archive
+member lands in several splits). Each file is placed with the cheapest
+operation that works, in this order:
+
+    hardlink  — os.link; same filesystem, no data written
+    reflink   — copy-on-write clone (FICLONE on Linux btrfs/XFS, clonefile on APFS)
+    symlink   — needs Developer Mode / admin on Windows
+    move      — os.replace; a rename on the same filesystem (consumes the source)
+    copy      — shutil.copy2, the last resort
+
+The first mode that fails because the filesystem or platform can't do it
+(EXDEV, EPERM, EOPNOTSUPP / ENOTSUP, EINVAL …) is skipped for the rest of the
+run (LinkPlacer is sticky), so a filesystem without hardlink support costs
+one failed syscall, not one per file. Any other OSError — a missing source,
+a full disk — is raised: falling through to the next mode would only hide it.
+
+Public API
+----------
+    MODES                          — placement modes, cheapest first
+    reflink(src, dst) -> None      — raises OSError where unsupported
+    LinkPlacer(allow_move=True, allow_symlink=True)
+        .place(src, dst) -> str    — mode used
+        .counts -> dict[str, int]  — files placed per mode
+        .summary() -> str
+"""
+
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+
+MODES = ("hardlink", "reflink", "symlink", "move", "copy")
+
+# "This mode doesn't work here" — anything else is a real error. ENOTTY /
+# ENOSYS: FICLONE on filesystems and kernels without it; EINVAL also covers
+# Windows errors Python has no errno for (e.g. symlinks without privilege)
+_UNSUPPORTED = frozenset({
+    errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP, errno.ENOTSUP,
+    errno.EINVAL, errno.ENOTTY, errno.ENOSYS,
+})
+
+# linux/fs.h: _IOW(0x94, 9, int)
+_FICLONE = 0x40049409
+
+
+def reflink(src: Path, dst: Path) -> None:
+    """Copy-on-write clone of src at dst; OSError if the filesystem can't."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        with open(src, "rb") as fin, open(dst, "wb") as fout:
+            try:
+                fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+            except OSError:
+                fout.close()
+                os.unlink(dst)
+                raise
+    elif sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) != 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(dst))
+    else:
+        raise OSError(errno.EOPNOTSUPP, f"reflink not supported on {sys.platform}", str(dst))
+
+
+def _place(mode: str, src: Path, dst: Path) -> None:
+    if mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "reflink":
+        reflink(src, dst)
+    elif mode == "symlink":
+        os.symlink(Path(src).resolve(), dst)
+    elif mode == "move":
+        os.replace(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+class LinkPlacer:
+    """
+    Places files with the cheapest mode that works and remembers it.
+    With allow_move=False the source tree is left intact (no "move").
+    allow_symlink=False is for trees that may be renamed as a whole — an
+    absolute symlink inside one would dangle after the move.
+    """
+
+    def __init__(self, allow_move: bool = True, allow_symlink: bool = True):
+        skip        = {m for m, ok in (("move", allow_move), ("symlink", allow_symlink)) if not ok}
+        self.modes  = [m for m in MODES if m not in skip]
+        self.counts = {m: 0 for m in self.modes}
+
+    def place(self, src: Path, dst: Path) -> str:
+        if os.path.lexists(dst):
+            os.unlink(dst)
+        while True:
+            mode = self.modes[0]
+            try:
+                _place(mode, src, dst)
+            except OSError as exc:
+                if mode == "copy" or exc.errno not in _UNSUPPORTED:
+                    raise
+                self.modes.pop(0)   # sticky: don't retry this mode per file
+                continue
+            self.counts[mode] += 1
+            return mode
+
+    def summary(self) -> str:
+        return "  ".join(f"{m}={n}" for m, n in self.counts.items() if n) or "nothing placed"
@@ -0,0 +1,162 @@
+"""
+image_prep.py — Validate and pre-resize a YOLO dataset before training.
+
+Ultralytics decodes every source image again on every epoch, then shrinks
+it so the long side is imgsz. Contributor datasets are often 12 MP phone
+photos trained at 640, so most of that decode is thrown away. This pass
+does it once, across a process pool, over an arranged dataset
+(<dataset>/<split>/images + labels):
+
+    - each image is verified and fully decoded; corrupt or unreadable files
+      are dropped together with their label and listed in the report,
+    - images larger than imgsz are shrunk so the long side is imgsz — JPEGs
+      are DCT-scaled while decoding (Image.draft), so a 12 MP photo is never
+      decoded at full size — with EXIF orientation applied (Ultralytics
+      labels are in the oriented frame), and re-encoded as compact JPEG (or
+      WebP) under the same stem,
+    - images that already fit are left exactly as they are, in their
+      original encoding; Ultralytics applies their EXIF orientation itself.
+
+The aspect ratio is kept and the padding is left to Ultralytics' own
+letterbox, so normalised YOLO label coordinates stay valid unchanged. The
+pixels of a shrunk image are close to, not identical with, what Ultralytics
+would have made of the original: PIL's draft + LANCZOS resample stands in
+for its cv2 INTER_AREA resize, and the lossy re-encode adds its own small
+artefacts. Images that fit are untouched.
+
+Writes <dataset>/image_report.json:
+{
+    "imgsz": int, "format": str,
+    "checked": int, "resized": int, "reencoded": int, "dropped": int,
+    "bytes_before": int, "bytes_after": int,
+    "dropped_files": [{"file": "train/images/x.jpg", "error": str}, ...]
+}
+
+Public API
+----------
+    FORMATS                                           — output encodings
+    prepare_images(dataset_dir, imgsz, fmt, workers) -> dict   — the report
+"""
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+FORMATS = {"jpg": ("JPEG", ".jpg"), "webp": ("WEBP", ".webp")}
+
+_IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+_JPEG_QUALITY   = 90
+_WEBP_QUALITY   = 85
+# Files per task sent to a pool worker
+_CHUNKSIZE      = 16
+
+
+def _log(msg: str) -> None:
+    print(f"[trainchain] {msg}", flush=True)
+
+
+def _save(img, dest: Path, pil_format: str) -> None:
+    kwargs = {"quality": _WEBP_QUALITY} if pil_format == "WEBP" else {"quality": _JPEG_QUALITY, "optimize": True}
+    img.save(dest, pil_format, **kwargs)
+
+
+def _prepare_one(task: tuple[str, int, str]) -> dict:
+    """Pool worker: validate one image; shrink and re-encode it in place if it is too big."""
+    from PIL import Image, ImageOps
+
+    path, imgsz, fmt = Path(task[0]), task[1], task[2]
+    before = path.stat().st_size
+    try:
+        with Image.open(path) as img:
+            img.verify()   # structure / CRC checks, without decoding pixels
+        with Image.open(path) as img:
+            src_format = img.format
+            too_big    = max(img.size) > imgsz
+            if not too_big:
+                img.load()   # decodes fully — catches truncated data verify() misses
+                return {"file": str(path), "before": before, "after": before}
+            # thumbnail() drafts JPEGs first: DCT-scaled decode, then LANCZOS
+            img.thumbnail((imgsz, imgsz), Image.Resampling.LANCZOS)
+            img = ImageOps.exif_transpose(img)   # the re-encoded file carries no EXIF
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+    except Exception as exc:   # PIL raises OSError, SyntaxError, ValueError, DecompressionBombError …
+        return {"file": str(path), "error": f"{type(exc).__name__}: {exc}"}
+
+    pil_format, suffix = FORMATS[fmt]
+    dest = path.with_suffix(suffix)
+    if dest != path and dest.exists():
+        # Another source image already owns this stem + suffix — keep ours
+        pil_format, dest = src_format, path
+
+    _save(img, dest, pil_format)
+    if dest != path:
+        path.unlink()
+    return {
+        "file":      str(dest),
+        "before":    before,
+        "after":     dest.stat().st_size,
+        "resized":   True,
+        "reencoded": True,
+    }
+
+
+def prepare_images(
+    dataset_dir: Path,
+    imgsz: int,
+    fmt: str = "jpg",
+    workers: int | None = None,
+) -> dict:
+    """Validate and shrink every image under dataset_dir/*/images; returns the report."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown image format {fmt!r} (expected one of {sorted(FORMATS)})")
+    images = sorted(
+        p for p in dataset_dir.glob("*/images/*") if p.suffix.lower() in _IMAGE_SUFFIXES
+    )
+    report = {
+        "imgsz": imgsz, "format": fmt,
+        "checked": len(images), "resized": 0, "reencoded": 0, "dropped": 0,
+        "bytes_before": 0, "bytes_after": 0,
+        "dropped_files": [],
+    }
+    workers = max(1, min(workers or os.cpu_count() or 1, len(images) // _CHUNKSIZE + 1))
+    tasks   = [(str(p), imgsz, fmt) for p in images]
+
+    if workers == 1:
+        results = map(_prepare_one, tasks)
+        pool    = None
+    else:
+        pool    = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_prepare_one, tasks, chunksize=_CHUNKSIZE)
+    try:
+        for res in results:
+            if "error" in res:
+                img = Path(res["file"])
+                label = img.parent.parent / "labels" / f"{img.stem}.txt"
+                img.unlink(missing_ok=True)
+                label.unlink(missing_ok=True)
+                report["dropped"] += 1
+                report["dropped_files"].append({
+                    "file":  img.relative_to(dataset_dir).as_posix(),
+                    "error": res["error"],
+                })
+                continue
+            report["bytes_before"] += res["before"]
+            report["bytes_after"]  += res["after"]
+            report["resized"]      += int(res.get("resized", False))
+            report["reencoded"]    += int(res.get("reencoded", False))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    (dataset_dir / "image_report.json").write_text(json.dumps(report, indent=2), encoding="utf-8")
+    mb = 1024 ** 2
+    _log(
+        f"Images prepared ({workers} workers): {report['checked']} checked  "
+        f"{report['resized']} resized  {report['dropped']} dropped  "
+        f"{report['bytes_before'] / mb:.1f} MB → {report['bytes_after'] / mb:.1f} MB"
+    )
+    for entry in report["dropped_files"][:10]:
+        _log(f"  dropped {entry['file']}: {entry['error']}")
+    return report
@@ -0,0 +1,252 @@
+"""
+low_mem.py — Low-memory base-model loading for CPU LoRA training.
+
+Only the LoRA matrices are trained, so the base weights never need fp32:
+
+    bf16  — the checkpoint is loaded straight into bf16 with low_cpu_mem_usage
+            (safetensors are memory-mapped, no fp32 copy is materialised).
+            Half the RAM of the old fp32 load.
+    int8  — the model is built on the meta device with every frozen
+            nn.Linear outside the LoRA targets replaced by Int8FrozenLinear
+            (per-output-channel absmax int8), then filled one checkpoint
+            tensor at a time, quantising those weights as they are read. Load
+            peak is the int8 model plus one tensor, never the bf16 model.
+            Weights are dequantised one layer at a time in forward and again
+            in backward, so no full-precision copy outlives its matmul.
+            Roughly a quarter of fp32 for the MLP / attention-output weights,
+            which dominate.
+
+LoRA parameters (and therefore the optimizer state) are always kept in fp32.
+
+"auto" picks bf16 only on CPUs with native bf16 matmul (AVX512-BF16 / AMX,
+cpu_mode.cpu_supports_bf16); elsewhere bf16 is emulated and slower than
+fp32, so it loads fp32. Either way int8 is the fallback when those weights
+won't fit in RAM.
+
+torch.ao's dynamic quantisation is not used: its quantised Linear has no
+backward, and gradients must flow through the frozen layers to reach
+earlier LoRA adapters.
+
+Public API
+----------
+    choose_base_precision(model_path, requested) -> "fp32" | "bf16" | "int8"
+    load_kwargs(precision) -> dict           — extra from_pretrained kwargs (fp32 / bf16)
+    load_int8_model(model_path, keep) -> (model, layers quantised)
+    quantize_frozen_linears(model, keep) -> int   — layers replaced
+    upcast_trainable(model) -> int           — LoRA params cast to fp32
+"""
+
+import json
+from pathlib import Path
+
+import psutil
+import torch
+import torch.nn.functional as F
+from torch import nn
+
+# Tokenizer, activations, optimizer state and Python overhead on top of weights
+_RUNTIME_OVERHEAD_GB = 1.5
+# Keep bf16 / fp32 only when its weights + overhead fit this share of available RAM
+_WEIGHTS_RAM_FRACTION = 0.80
+
+_BYTES_PER_DTYPE = {"float32": 4, "float16": 2, "bfloat16": 2}
+
+
+def _log(msg: str) -> None:
+    print(f"[trainchain-llm] {msg}", flush=True)
+
+
+def _checkpoint_bytes_bf16(model_path: str) -> int | None:
+    """Size the weights would take in bf16, from the safetensors on disk."""
+    path = Path(model_path)
+    if not path.is_dir():
+        return None
+    files = list(path.glob("*.safetensors"))
+    if not files:
+        return None
+    on_disk = sum(f.stat().st_size for f in files)
+    try:
+        dtype = json.loads((path / "config.json").read_text()).get("torch_dtype", "bfloat16")
+    except Exception:
+        dtype = "bfloat16"
+    return on_disk * 2 // _BYTES_PER_DTYPE.get(dtype, 2)
+
+
+def choose_base_precision(model_path: str, requested: str = "auto") -> str:
+    """
+    Resolve "auto" to bf16 on CPUs with native bf16, fp32 on the rest, or
+    int8 when those weights won't fit in RAM.
+    """
+    if requested != "auto":
+        return requested
+    from cpu_mode import cpu_supports_bf16
+
+    native     = cpu_supports_bf16()
+    precision  = "bf16" if native else "fp32"
+    bf16_bytes = _checkpoint_bytes_bf16(model_path)
+    if bf16_bytes is None:
+        return precision
+    weights = bf16_bytes if native else 2 * bf16_bytes
+    need    = weights + _RUNTIME_OVERHEAD_GB * 1024 ** 3
+    avail   = psutil.virtual_memory().available
+    return precision if need <= _WEIGHTS_RAM_FRACTION * avail else "int8"
+
+
+def load_kwargs(precision: str) -> dict:
+    """from_pretrained kwargs for a CPU fp32 / bf16 load (int8: load_int8_model)."""
+    if precision == "fp32":
+        return {"torch_dtype": torch.float32}
+    # low_cpu_mem_usage loads straight from the mmap'd safetensors into the
+    # target dtype instead of initialising a random fp32 model first
+    return {"torch_dtype": torch.bfloat16, "low_cpu_mem_usage": True}
+
+
+class _Int8Linear(torch.autograd.Function):
+    """
+    F.linear against an int8 weight that saves only the int8 weight and its
+    scale for backward. Going through F.linear directly would keep the
+    dequantised weight alive in the autograd graph until backward — a full
+    bf16 copy of every frozen layer at once.
+    """
+
+    @staticmethod
+    def forward(ctx, x, weight_int8, weight_scale, bias):
+        w = weight_int8.to(x.dtype) * weight_scale.to(x.dtype)
+        ctx.save_for_backward(weight_int8, weight_scale)
+        ctx.x_dtype = x.dtype
+        return F.linear(x, w, bias.to(x.dtype) if bias is not None else None)
+
+    @staticmethod
+    def backward(ctx, grad_out):
+        weight_int8, weight_scale = ctx.saved_tensors
+        w = weight_int8.to(grad_out.dtype) * weight_scale.to(grad_out.dtype)
+        return (grad_out @ w).to(ctx.x_dtype), None, None, None
+
+
+class Int8FrozenLinear(nn.Module):
+    """Frozen Linear stored as int8 + per-row scale; gradients flow to the input only."""
+
+    def __init__(self, in_features: int, out_features: int, bias: bool, dtype: torch.dtype):
+        super().__init__()
+        self.in_features  = in_features
+        self.out_features = out_features
+        self.register_buffer("weight_int8", torch.zeros(out_features, in_features, dtype=torch.int8))
+        self.register_buffer("weight_scale", torch.ones(out_features, 1, dtype=dtype))
+        self.register_buffer("bias", torch.zeros(out_features, dtype=dtype) if bias else None)
+
+    @classmethod
+    def from_linear(cls, linear: nn.Linear) -> "Int8FrozenLinear":
+        q = cls(linear.in_features, linear.out_features, linear.bias is not None, linear.weight.dtype)
+        q.load_weight(linear.weight)
+        if linear.bias is not None:
+            q.bias.copy_(linear.bias.detach())
+        return q
+
+    @torch.no_grad()
+    def load_weight(self, weight: torch.Tensor) -> None:
+        """Quantise a full-precision weight into this layer's int8 buffers."""
+        w     = weight.detach().float()
+        scale = w.abs().amax(dim=1, keepdim=True).clamp(min=1e-8) / 127.0
+        self.weight_int8.copy_(torch.round(w / scale).to(torch.int8))
+        self.weight_scale.copy_(scale)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return _Int8Linear.apply(x, self.weight_int8, self.weight_scale, self.bias)
+
+    def extra_repr(self) -> str:
+        return f"in_features={self.in_features}, out_features={self.out_features}, int8"
+
+
+def _frozen_linears(model: nn.Module, keep: list[str]):
+    """(parent, child_name, linear) for every nn.Linear whose name isn't in `keep`."""
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if type(child) is nn.Linear and child_name not in keep:
+                yield module, child_name, child
+
+
+def quantize_frozen_linears(model: nn.Module, keep: list[str]) -> int:
+    """
+    Replace nn.Linear modules whose name doesn't end in one of `keep`
+    (LoRA targets, lm_head) with Int8FrozenLinear. Returns the count.
+    """
+    replaced = 0
+    for module, child_name, child in _frozen_linears(model, keep):
+        setattr(module, child_name, Int8FrozenLinear.from_linear(child))
+        replaced += 1
+    return replaced
+
+
+def _checkpoint_files(model_path: str) -> list[Path]:
+    path  = Path(model_path)
+    index = path / "model.safetensors.index.json"
+    if index.is_file():
+        shards = set(json.loads(index.read_text())["weight_map"].values())
+        return [path / name for name in sorted(shards)]
+    return sorted(path.glob("*.safetensors")) if path.is_dir() else []
+
+
+def load_int8_model(model_path: str, keep: list[str]):
+    """
+    Build the model on the meta device with int8 frozen linears, then fill it
+    from the safetensors one tensor at a time. Returns (model, layers
+    quantised). Checkpoints this can't map (no local safetensors, renamed
+    keys) fall back to a bf16 load followed by quantize_frozen_linears.
+    """
+    from accelerate import init_empty_weights
+    from accelerate.utils import set_module_tensor_to_device
+    from safetensors import safe_open
+    from transformers import AutoConfig, AutoModelForCausalLM
+
+    files = _checkpoint_files(model_path)
+    if files:
+        config = AutoConfig.from_pretrained(model_path, trust_remote_code=True)
+        # Parameters go to meta; buffers (rotary tables …) are small and real
+        with init_empty_weights(include_buffers=False):
+            model = AutoModelForCausalLM.from_config(
+                config, torch_dtype=torch.bfloat16, trust_remote_code=True
+            )
+        for module, child_name, child in _frozen_linears(model, keep):
+            setattr(module, child_name, Int8FrozenLinear(
+                child.in_features, child.out_features, child.bias is not None, torch.bfloat16
+            ))
+        by_name = {name: m for name, m in model.named_modules() if isinstance(m, Int8FrozenLinear)}
+        params  = dict(model.named_parameters())
+        prefix  = f"{model.base_model_prefix}."
+
+        for file in files:
+            with safe_open(str(file), framework="pt") as f:
+                for key in f.keys():
+                    # Checkpoints saved from the bare base model lack the prefix
+                    name = key if key in params or key.rsplit(".", 1)[0] in by_name else prefix + key
+                    owner, _, leaf = name.rpartition(".")
+                    tensor = f.get_tensor(key)
+                    if owner in by_name:
+                        if leaf == "weight":
+                            by_name[owner].load_weight(tensor)
+                        elif leaf == "bias":
+                            by_name[owner].bias.copy_(tensor)
+                    elif name in params:
+                        # Copy out of the mmap so the shard can be unmapped once read
+                        set_module_tensor_to_device(
+                            model, name, "cpu", value=tensor.to(params[name].dtype, copy=True)
+                        )
+                    del tensor
+        model.tie_weights()
+        if not any(p.is_meta for p in model.parameters()):
+            model.eval()
+            return model, len(by_name)
+
+    _log("Streaming int8 load not possible — quantising after a bf16 load")
+    model = AutoModelForCausalLM.from_pretrained(model_path, trust_remote_code=True, **load_kwargs("bf16"))
+    return model, quantize_frozen_linears(model, keep)
+
+
+def upcast_trainable(model: nn.Module) -> int:
+    """Keep trainable (LoRA) parameters — and so optimizer state — in fp32."""
+    n = 0
+    for p in model.parameters():
+        if p.requires_grad and p.dtype != torch.float32:
+            p.data = p.data.float()
+            n += 1
+    return n
@@ -0,0 +1,129 @@
+"""
+model_store.py — TrainChain-managed cache of HuggingFace base model weights.
+
+Models are downloaded once into the app data directory instead of whatever
+default HF cache happens to be configured, under an explicit size budget:
+
+    <user data dir>/TrainChain/cache/models/
+        manifest.json                 — model, revision, size, last use
+        <org>--<name>/                — one snapshot per model
+
+Used as a library by train_llm.py, and run as a script by jobs_window.py
+inside the uv-managed venv so weights are fetched as soon as a slot is
+assigned, long before the user clicks Start:
+
+    .trainchain_env/Scripts/python.exe model_store.py --prefetch <model>
+    .trainchain_env/Scripts/python.exe model_store.py --list
+
+Public API
+----------
+    ensure_model(model_name) -> Path   — cached snapshot dir (downloads on miss)
+    prefetch(model_name)     -> Path   — same, with progress logging
+    model_revision(model_name) -> str | None
+    list_models()            -> dict   — the manifest
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from pathlib import Path
+
+from cache_utils import LRUCache
+
+# Eviction budget across all cached models (least recently used go first)
+_MODEL_CACHE_BYTES = int(float(os.getenv("TRAINCHAIN_MODEL_CACHE_GB", "40")) * 1024 ** 3)
+
+# Only what from_pretrained needs — skips .bin / .onnx / .gguf duplicates
+_ALLOW_PATTERNS = ["*.json", "*.safetensors", "*.model", "*.txt", "*.tiktoken", "*.py"]
+
+
+def _store() -> LRUCache:
+    return LRUCache("models", _MODEL_CACHE_BYTES)
+
+
+def _key(model_name: str) -> str:
+    return model_name.strip().replace("/", "--")
+
+
+def _log(msg: str) -> None:
+    print(f"[trainchain-models] {msg}", flush=True)
+
+
+def ensure_model(model_name: str) -> Path:
+    """Return the local snapshot directory for model_name, downloading on a miss."""
+    store = _store()
+    key   = _key(model_name)
+
+    hit = store.get(key)
+    if hit is not None:
+        return hit[0]
+
+    # Held across the download so the prefetch process and the trainer never
+    # fetch the same model twice; the OS releases it if the holder crashes
+    with store.key_lock(key):
+        # Another process may have finished the download while we waited
+        hit = store.get(key)
+        if hit is not None:
+            return hit[0]
+
+        from huggingface_hub import HfApi, snapshot_download
+
+        revision = HfApi().model_info(model_name).sha
+        _log(f"Downloading {model_name}@{revision[:10]} into the TrainChain model store …")
+        staging = store.staging_dir(key)
+        try:
+            snapshot_download(
+                model_name,
+                revision=revision,
+                local_dir=str(staging),
+                allow_patterns=_ALLOW_PATTERNS,
+            )
+            path = store.commit(key, staging, {"model": model_name, "revision": revision})
+        finally:
+            # No-op after commit() renamed it; a failed download leaves no orphan
+            shutil.rmtree(staging, ignore_errors=True)
+
+    size_gb = store.entries().get(key, {}).get("size", 0) / 1024 ** 3
+    _log(f"{model_name} cached ({size_gb:.2f} GB) at {path}")
+    return path
+
+
+def prefetch(model_name: str) -> Path:
+    """Warm the store for model_name (no-op if already cached)."""
+    _log(f"Prefetch requested for {model_name}")
+    t0   = time.perf_counter()
+    path = ensure_model(model_name)
+    _log(f"Prefetch ready in {time.perf_counter() - t0:.1f}s")
+    return path
+
+
+def model_revision(model_name: str) -> str | None:
+    entry = _store().entries().get(_key(model_name))
+    return entry["meta"].get("revision") if entry else None
+
+
+def list_models() -> dict:
+    return _store().entries()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TrainChain model store")
+    parser.add_argument("--prefetch", metavar="MODEL", help="Download a model into the store")
+    parser.add_argument("--list", action="store_true", help="Print the store manifest as JSON")
+    args = parser.parse_args()
+
+    if args.prefetch:
+        try:
+            prefetch(args.prefetch)
+        except Exception as exc:
+            _log(f"Prefetch failed: {exc}")
+            sys.exit(1)
+    if args.list:
+        print(json.dumps(list_models(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
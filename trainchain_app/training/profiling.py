@@ -0,0 +1,150 @@
+"""
+profiling.py — Performance capture for train_llm.py and train_yolo.py.
+
+With --profile [DIR] a trainer writes a bundle that can be attached to a
+"training is slow" report, by default next to trainchain_training.log:
+
+    <app root>/trainchain_profiles/<llm|yolo>_job<id>_<YYYYmmdd-HHMMSS>/
+        stages.json / stages.txt   — wall-clock per pipeline stage
+        trace.json                 — Chrome trace (chrome://tracing, Perfetto)
+        top_ops.txt / top_ops.json — top ops by self time, grouped by input shape
+
+Only a bounded window of steps runs under torch.profiler (_WAIT skipped,
+_WARMUP discarded, _ACTIVE recorded) so the overhead and trace size stay
+small no matter how long training runs.
+
+Public API
+----------
+    DEFAULT_PROFILE_DIR
+    profile_run_dir(base, kind, job_id) -> Path
+    StageTimer()                     — .stage(name) context manager, .write(dir), .summary()
+    StepProfiler(out_dir)            — .start(), .step() after every train step, .stop()
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_PROFILE_DIR = Path(__file__).resolve().parent.parent / "trainchain_profiles"
+
+_WAIT     = 1
+_WARMUP   = 2
+_ACTIVE   = 5
+_TOP_OPS  = 30
+
+
+def profile_run_dir(base: Path, kind: str, job_id: str) -> Path:
+    path = Path(base) / f"{kind}_job{job_id}_{time.strftime('%Y%m%d-%H%M%S')}"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class StageTimer:
+    """
+    Wall-clock per named stage. Stages may overlap (e.g. the model load runs
+    on a background thread during the shard download), so each records its
+    start offset as well as its duration.
+    """
+
+    def __init__(self):
+        self._t0     = time.perf_counter()
+        self._lock   = threading.Lock()
+        self.stages: dict[str, dict] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                entry = self.stages.setdefault(
+                    name, {"start_s": round(start - self._t0, 3), "seconds": 0.0}
+                )
+                entry["seconds"] = round(entry["seconds"] + end - start, 3)
+
+    def summary(self) -> str:
+        return "  ".join(f"{k}={v['seconds']:.1f}s" for k, v in self.stages.items())
+
+    def write(self, out_dir: Path) -> None:
+        total = round(time.perf_counter() - self._t0, 3)
+        (out_dir / "stages.json").write_text(
+            json.dumps({"total_s": total, "stages": self.stages}, indent=2)
+        )
+        lines = [f"{'stage':<12} {'start':>9} {'seconds':>9} {'share':>7}"]
+        for name, v in self.stages.items():
+            lines.append(
+                f"{name:<12} {v['start_s']:>8.1f}s {v['seconds']:>8.1f}s "
+                f"{v['seconds'] / max(total, 1e-9):>6.0%}"
+            )
+        lines.append(f"{'total':<12} {'':>9} {total:>8.1f}s")
+        (out_dir / "stages.txt").write_text("\n".join(lines) + "\n")
+
+
+class StepProfiler:
+    """torch.profiler over a fixed window of training steps; stops itself after it."""
+
+    def __init__(self, out_dir: Path):
+        self.out_dir = out_dir
+        self._prof   = None
+        self._steps  = 0
+
+    def start(self) -> None:
+        import torch
+        from torch.profiler import ProfilerActivity, profile, schedule
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        self._prof = profile(
+            activities=activities,
+            schedule=schedule(wait=_WAIT, warmup=_WARMUP, active=_ACTIVE, repeat=1),
+            on_trace_ready=self._export,
+            record_shapes=True,
+            profile_memory=True,
+        )
+        self._prof.start()
+
+    def step(self) -> None:
+        if self._prof is None:
+            return
+        self._prof.step()
+        self._steps += 1
+        if self._steps >= _WAIT + _WARMUP + _ACTIVE:
+            self.stop()
+
+    def stop(self) -> None:
+        if self._prof is not None:
+            prof, self._prof = self._prof, None
+            prof.stop()
+
+    def _export(self, prof) -> None:
+        prof.export_chrome_trace(str(self.out_dir / "trace.json"))
+
+        cuda = any(getattr(e, "self_device_time_total", 0) or getattr(e, "self_cuda_time_total", 0)
+                   for e in prof.key_averages())
+        sort_by = "self_cuda_time_total" if cuda else "self_cpu_time_total"
+        averages = prof.key_averages(group_by_input_shape=True)
+        (self.out_dir / "top_ops.txt").write_text(
+            averages.table(sort_by=sort_by, row_limit=_TOP_OPS)
+        )
+
+        rows = sorted(averages, key=lambda e: e.self_cpu_time_total, reverse=True)[:_TOP_OPS]
+        (self.out_dir / "top_ops.json").write_text(json.dumps([
+            {
+                "op":             e.key,
+                "calls":          e.count,
+                "self_cpu_ms":    round(e.self_cpu_time_total / 1000, 3),
+                "cpu_total_ms":   round(e.cpu_time_total / 1000, 3),
+                "self_device_ms": round(
+                    (getattr(e, "self_device_time_total", None)
+                     or getattr(e, "self_cuda_time_total", 0)) / 1000, 3
+                ),
+                "self_cpu_mem_mb": round(e.self_cpu_memory_usage / 1024 ** 2, 2),
+                "input_shapes":   str(e.input_shapes),
+            }
+            for e in rows
+        ], indent=2))
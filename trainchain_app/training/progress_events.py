@@ -0,0 +1,73 @@
+"""
+progress_events.py — Machine-readable progress from the trainers to the app.
+
+Both trainers print ordinary log lines to stdout; progress events share the
+same pipe as single tagged JSON lines, so no extra channel has to be set up:
+
+    @@trainchain-progress {"stage": "train", "step": 120, "total": 800, ...}
+
+jobs_window.py recognises the prefix, parses the JSON and updates its
+progress bar and stats label; every other line is shown as plain log text.
+
+Event fields (all but "stage" and "time" optional / null when unknown):
+    stage          — fetch | download | prepare | load_model | train | save |
+                     upload | submit | done
+    step, total    — optimizer steps (LLM) or batches (YOLO) done / planned
+    epoch, epochs
+    loss
+    samples_per_sec, tokens_per_sec
+    rss_gb, vram_gb — process resident memory / peak CUDA memory allocated
+    eta_sec
+    message        — short human-readable status
+
+Public API
+----------
+    PREFIX
+    emit(stage, **fields) -> None
+    memory_stats() -> dict
+    RateMeter(total)                 — step rate + ETA since the first update
+"""
+
+import json
+import sys
+import time
+
+import psutil
+
+PREFIX = "@@trainchain-progress "
+
+
+def memory_stats() -> dict:
+    stats = {"rss_gb": round(psutil.Process().memory_info().rss / 1024 ** 3, 2), "vram_gb": None}
+    torch = sys.modules.get("torch")   # never import torch just to report memory
+    if torch is not None and torch.cuda.is_available():
+        stats["vram_gb"] = round(torch.cuda.max_memory_allocated() / 1024 ** 3, 2)
+    return stats
+
+
+def emit(stage: str, **fields) -> None:
+    """Print one progress event line (flushed so the app sees it immediately)."""
+    event = {"stage": stage, "time": round(time.time(), 3), **memory_stats(), **fields}
+    print(PREFIX + json.dumps(event, default=float), flush=True)
+
+
+class RateMeter:
+    """Steps/sec and ETA measured from the first update (excludes start-up)."""
+
+    def __init__(self, total: int):
+        self.total  = total
+        self._t0    = None
+        self._step0 = 0
+
+    def update(self, step: int) -> tuple[float | None, float | None]:
+        """Return (steps_per_sec, eta_sec) at `step`, or (None, None) before a rate exists."""
+        now = time.perf_counter()
+        if self._t0 is None:
+            self._t0, self._step0 = now, step
+            return None, None
+        done = step - self._step0
+        if done <= 0:
+            return None, None
+        rate = done / (now - self._t0)
+        eta  = max(0.0, (self.total - step) / rate) if self.total else None
+        return rate, eta
@@ -0,0 +1,176 @@
+"""
+shard_formats.py — Detect and read LLM dataset shards without extraction.
+
+Shards arrive as one of:
+
+    zip      — legacy ZIP_DEFLATED archive holding a .jsonl / .json file
+    zstd     — zstd-compressed JSONL (one Alpaca object per line)
+    parquet  — Parquet with instruction / input / output columns
+    jsonl    — anything else (plain JSONL or a JSON array)
+
+The format is taken from the file's magic bytes, never its name. zstd JSONL
+and Parquet are read in place: record batches are decoded column-wise by
+Arrow's C++ readers (zstd is decompressed on the fly), normalised to three
+non-null string columns and streamed into an Arrow IPC file that datasets
+memory-maps — no extraction step, no per-line Python JSON decoding.
+
+Every value becomes str(value or ""), exactly as train_llm's JSONL path
+reads it. zstd JSON is parsed with an explicit string schema, so Arrow never
+re-types a value (inferring would turn "2024-01-01T00:00:00" into a
+timestamp and 3 into 3.0 beside 3.5); a shard with any non-string value
+(42, true, {...}) fails that parse and is decoded line by line in Python
+instead. Parquet columns that aren't strings go through the same str() rule.
+
+Public API
+----------
+    FIELDS                         — the Alpaca columns every shard is read into
+    COLUMNAR                       — formats handled by write_arrow()
+    SUFFIXES                       — file suffix to store each format under
+    sniff_format(path) -> str
+    write_arrow(src, dest) -> int  — rows written to the Arrow stream file
+"""
+
+import io
+import json
+from pathlib import Path
+
+FIELDS = ("instruction", "input", "output")
+
+_MAGIC = {
+    b"PK\x03\x04":       "zip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"PAR1":             "parquet",
+}
+
+COLUMNAR = frozenset({"zstd", "parquet"})
+SUFFIXES = {"zip": ".zip", "zstd": ".jsonl.zst", "parquet": ".parquet", "jsonl": ".jsonl"}
+
+# Rows per decoded record batch (Parquet) / bytes per JSON block
+_BATCH_ROWS  = 16_384
+_JSON_BLOCK  = 8 * 1024 ** 2
+
+
+def sniff_format(path: Path) -> str:
+    """Shard format from its first four bytes."""
+    with open(path, "rb") as fh:
+        return _MAGIC.get(fh.read(4), "jsonl")
+
+
+def _normalise(batch):
+    """Exactly FIELDS as str(value or "") — train_llm's JSONL rule; missing columns become ""."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    names  = batch.schema.names
+    arrays = []
+    for field in FIELDS:
+        if field not in names:
+            arrays.append(pa.array([""] * batch.num_rows, pa.string()))
+            continue
+        col = batch.column(names.index(field))
+        if pa.types.is_string(col.type) or pa.types.is_large_string(col.type):
+            # str(s or "") is s for any string; only null needs filling
+            arrays.append(pc.fill_null(col.cast(pa.string()), ""))
+        else:
+            # Arrow's casts disagree with str() (True → "true", 3.0 → "3")
+            arrays.append(pa.array([str(v or "") for v in col.to_pylist()], pa.string()))
+    return pa.RecordBatch.from_arrays(arrays, names=list(FIELDS))
+
+
+def _parquet_batches(path: Path):
+    import pyarrow.parquet as pq
+
+    pf      = pq.ParquetFile(str(path))
+    columns = [f for f in FIELDS if f in pf.schema_arrow.names]
+    if not columns:
+        raise ValueError(f"Parquet shard has none of the columns {FIELDS}: {pf.schema_arrow.names}")
+    yield from pf.iter_batches(batch_size=_BATCH_ROWS, columns=columns)
+
+
+def _zstd_line_blocks(path: Path):
+    """Decompressed zstd JSONL in ~_JSON_BLOCK pieces, each ending on a line break."""
+    import zstandard
+
+    with open(path, "rb") as fh, zstandard.ZstdDecompressor().stream_reader(fh) as reader:
+        tail = b""
+        while chunk := reader.read(_JSON_BLOCK):
+            block = tail + chunk
+            cut   = block.rfind(b"\n") + 1
+            tail  = block[cut:]
+            if cut:
+                yield block[:cut]
+        if tail.strip():
+            yield tail
+
+
+def _zstd_jsonl_batches(path: Path):
+    import pyarrow as pa
+    import pyarrow.json as pj
+
+    # All-string schema: a non-string value raises instead of being re-typed
+    read_opts  = pj.ReadOptions(block_size=_JSON_BLOCK)
+    parse_opts = pj.ParseOptions(
+        explicit_schema=pa.schema([(f, pa.string()) for f in FIELDS]),
+        unexpected_field_behavior="ignore",
+    )
+    if hasattr(pj, "open_json"):   # streaming reader, pyarrow ≥ 19
+        stream = pa.CompressedInputStream(pa.OSFile(str(path)), "zstd")
+        yield from pj.open_json(stream, read_options=read_opts, parse_options=parse_opts)
+    else:
+        # read_json takes a whole file — give it one line-aligned block at a time
+        for block in _zstd_line_blocks(path):
+            table = pj.read_json(io.BytesIO(block), read_options=read_opts, parse_options=parse_opts)
+            yield from table.to_batches()
+
+
+def _zstd_jsonl_python_batches(path: Path):
+    """Per-line fallback for shards with non-string values: str(value or ""), as train_llm's JSONL path."""
+    import pyarrow as pa
+
+    rows   = {f: [] for f in FIELDS}
+    stream = pa.CompressedInputStream(pa.OSFile(str(path)), "zstd")
+    with io.TextIOWrapper(io.BufferedReader(stream), encoding="utf-8") as fh:
+        for ln in fh:
+            if not ln.strip():
+                continue
+            obj = json.loads(ln)
+            for f in FIELDS:
+                rows[f].append(str(obj.get(f) or ""))
+            if len(rows[FIELDS[0]]) == _BATCH_ROWS:
+                yield pa.RecordBatch.from_pydict(rows)
+                rows = {f: [] for f in FIELDS}
+    if rows[FIELDS[0]]:
+        yield pa.RecordBatch.from_pydict(rows)
+
+
+def _write_batches(batches, dest: Path) -> int:
+    import pyarrow as pa
+
+    rows   = 0
+    schema = pa.schema([(f, pa.string()) for f in FIELDS])
+    with pa.OSFile(str(dest), "wb") as sink, pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            if batch.num_rows:
+                writer.write_batch(_normalise(batch))
+                rows += batch.num_rows
+    return rows
+
+
+def write_arrow(src: Path, dest: Path) -> int:
+    """
+    Stream a zstd-JSONL or Parquet shard into an Arrow IPC stream file at
+    `dest` (the layout Dataset.from_file memory-maps). Returns the row count.
+    """
+    import pyarrow as pa
+
+    fmt = sniff_format(src)
+    if fmt not in COLUMNAR:
+        raise ValueError(f"{src} is {fmt}, not a columnar shard")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "parquet":
+        return _write_batches(_parquet_batches(src), dest)
+    try:
+        return _write_batches(_zstd_jsonl_batches(src), dest)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        # A non-string value somewhere in the shard (42, true, {...})
+        return _write_batches(_zstd_jsonl_python_batches(src), dest)
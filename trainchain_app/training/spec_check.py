@@ -19,6 +19,7 @@ Exit code is always 0 — callers check the "ok" field.
 
 import argparse
 import json
+import re
 import shutil
 import sys
 
@@ -44,9 +45,25 @@ _VRAM_REQUIREMENTS: dict[str, float] = {
 _DEFAULT_VRAM_REQ = 4.0
 
 # Minimum system requirements (hard errors if below)
-_MIN_RAM_GB  = 6.0
+_MIN_RAM_GB  = 4.0
 _MIN_DISK_GB = 10.0
 
+# CPU training loads the frozen base in bf16 (2 bytes/param) on CPUs with
+# native bf16, fp32 (4 bytes/param) on the rest, or, when that does not fit,
+# int8 (~1 byte/param) — see low_mem.py. Overhead covers activations,
+# LoRA optimizer state, tokenizer and the Python runtime.
+_CPU_OVERHEAD_GB = 2.5
+
+
+def _cpu_native_bf16() -> bool:
+    """cpu_mode.cpu_supports_bf16(), or False when torch is unavailable."""
+    try:
+        from cpu_mode import cpu_supports_bf16  # noqa: PLC0415 — imports torch
+
+        return cpu_supports_bf16()
+    except Exception:
+        return False
+
 
 def _get_vram_gb() -> float | None:
     """Return total VRAM of device 0 in GB, or None if no CUDA GPU found."""
@@ -59,6 +76,16 @@ def _get_vram_gb() -> float | None:
     return None
 
 
+def _params_billions(model_name: str) -> float | None:
+    """Parameter count from the model ID, e.g. "Qwen2.5-1.5B" → 1.5, "SmolLM2-360M" → 0.36."""
+    # Whole size token only: "bloomz-1b1" or "v2.5b-chat" carry no usable size
+    m = re.search(r"(?<![\w.])(\d+(?:\.\d+)?)\s*([bm])(?!\w)", model_name.lower())
+    if not m:
+        return None
+    n = float(m.group(1))
+    return n if m.group(2) == "b" else n / 1000
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(description="TrainChain hardware spec check")
     parser.add_argument("--model-name", default="",  help="HuggingFace model ID")
@@ -94,6 +121,21 @@ def main() -> None:
             f"Insufficient RAM: {ram_gb:.1f} GB available, "
             f"{_MIN_RAM_GB:.0f} GB minimum required."
         )
+    params_b = _params_billions(args.model_name)
+    if vram_gb is None and params_b is not None and ram_gb >= _MIN_RAM_GB:
+        full, bytes_per_param = ("bf16", 2.0) if _cpu_native_bf16() else ("fp32", 4.0)
+        int8_gb = params_b * 1.0 + _CPU_OVERHEAD_GB
+        full_gb = params_b * bytes_per_param + _CPU_OVERHEAD_GB
+        if ram_gb < int8_gb:
+            errors.append(
+                f"Insufficient RAM for CPU training of {args.model_name}: "
+                f"{ram_gb:.1f} GB available, ~{int8_gb:.1f} GB needed even with int8 base weights."
+            )
+        elif ram_gb < full_gb:
+            warnings.append(
+                f"{ram_gb:.1f} GB RAM is below the ~{full_gb:.1f} GB needed for {full} base weights — "
+                "the frozen base model will be quantised to int8 (slightly slower steps)."
+            )
 
     # ── Free disk ─────────────────────────────────────────────────────────────
     disk_free_gb: float | None = None
@@ -0,0 +1,143 @@
+"""
+throughput_probe.py — Calibrated training-throughput micro-benchmark.
+
+Run by jobs_window.py while an LLM slot waits for dataset sharding:
+    .trainchain_env/Scripts/python.exe throughput_probe.py
+        --job-id <id> --api-url <url> --contributor-wallet <0x...> --model-name <name>
+
+Times dense matmuls on the device training will use (same core pinning and
+autocast dtype as train_llm.py) for a fixed wall-clock window after warm-up,
+then converts the sustained FLOP/s into tokens/sec for the job's model:
+
+    tokens/sec ≈ FLOP/s × _MFU / (4 × params)
+
+LoRA training costs ~4 FLOPs per frozen parameter per token (the forward
+pass plus the input-gradient half of backward; the adapters are negligible)
+and _MFU is the share of matmul peak a full training step sustains. The
+backend only compares contributors with each other when sizing shards, so
+the constant factors cancel; the absolute figure is an estimate.
+
+Prints a single JSON object to stdout and POSTs it to
+{api}/jobs/llm/report-throughput (skipped with --no-report):
+{
+    "tokens_per_sec": float,
+    "gflops":         float,   # sustained matmul throughput
+    "device":         "cpu" | "cuda",
+    "dtype":          str,
+    "reported":       bool
+}
+
+Exit code is always 0 — an unreported slot is sharded at the median speed.
+"""
+
+import argparse
+import json
+import os
+import time
+
+import requests
+
+from cpu_mode import configure_cpu_threads
+from spec_check import _params_billions
+
+# One micro-batch of tokens through a square projection of a ~1B model
+_GEMM_TOKENS     = 512
+_GEMM_DIM        = 2048
+_WARMUP_ITERS    = 3
+_ITERS_PER_CHECK = 4
+_PROBE_SECONDS   = 3.0
+
+_MFU              = 0.35   # whole-step efficiency vs the matmul peak
+_DEFAULT_PARAMS_B = 1.0    # when the model ID carries no size
+
+
+def measure_matmul_gflops(device: str, dtype, seconds: float = _PROBE_SECONDS) -> float:
+    """Sustained GFLOP/s of [tokens × dim] @ [dim × dim] matmuls on `device`."""
+    import torch
+
+    a = torch.randn(_GEMM_TOKENS, _GEMM_DIM, device=device, dtype=dtype)
+    b = torch.randn(_GEMM_DIM, _GEMM_DIM, device=device, dtype=dtype)
+    sync = torch.cuda.synchronize if device == "cuda" else (lambda: None)
+
+    for _ in range(_WARMUP_ITERS):
+        a @ b
+    sync()
+    iters, t0 = 0, time.perf_counter()
+    while True:
+        for _ in range(_ITERS_PER_CHECK):
+            a @ b
+        sync()
+        iters  += _ITERS_PER_CHECK
+        elapsed = time.perf_counter() - t0
+        if elapsed >= seconds:
+            break
+    return 2 * _GEMM_TOKENS * _GEMM_DIM * _GEMM_DIM * iters / elapsed / 1e9
+
+
+def estimate_throughput(model_name: str) -> dict:
+    """Probe the training device and estimate LoRA tokens/sec for `model_name`."""
+    import torch
+
+    from cpu_mode import cpu_supports_bf16
+
+    if torch.cuda.is_available():
+        device, dtype = "cuda", torch.float16
+    else:
+        device = "cpu"
+        dtype  = torch.bfloat16 if cpu_supports_bf16() else torch.float32
+
+    gflops   = measure_matmul_gflops(device, dtype)
+    params_b = _params_billions(model_name) or _DEFAULT_PARAMS_B
+    return {
+        "tokens_per_sec": round(gflops * 1e9 * _MFU / (4 * params_b * 1e9), 1),
+        "gflops":         round(gflops, 1),
+        "device":         device,
+        "dtype":          str(dtype).replace("torch.", ""),
+    }
+
+
+def report_throughput(api_url: str, job_id: str, contributor_wallet: str, result: dict) -> bool:
+    """POST the estimate with the slot; False if the backend did not take it."""
+    try:
+        resp = requests.post(
+            f"{api_url}/jobs/llm/report-throughput",
+            json={
+                "jobId":              int(job_id),
+                "contributorAddress": contributor_wallet,
+                "tokensPerSec":       result["tokens_per_sec"],
+                "device":             result["device"],
+            },
+            timeout=15,
+        )
+        return resp.status_code == 200
+    except requests.RequestException:
+        return False
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="TrainChain throughput probe")
+    p.add_argument("--job-id",             required=True)
+    p.add_argument("--api-url",            required=True)
+    p.add_argument("--contributor-wallet", required=True)
+    p.add_argument("--model-name",         default="", help="HuggingFace model ID")
+    p.add_argument("--no-report", action="store_true", help="Print the estimate only")
+    args = p.parse_args()
+
+    if os.environ.get("CUDA_VISIBLE_DEVICES") == "":
+        # Same pinning / thread pools as a CPU training run, before torch loads
+        configure_cpu_threads()
+
+    try:
+        result = estimate_throughput(args.model_name)
+    except Exception as exc:
+        print(json.dumps({"error": str(exc), "reported": False}))
+        return
+    result["reported"] = (
+        False if args.no_report
+        else report_throughput(args.api_url, args.job_id, args.contributor_wallet, result)
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
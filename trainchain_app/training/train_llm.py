@@ -11,11 +11,14 @@ Flow
 ----
   1. GET  {api}/jobs/llm/my-slot?contributorAddress=...
          → model_name, epochs, lora_rank, lora_alpha, max_seq_length,
-           learning_rate, shard_cid
+           learning_rate, shard_cid, current_round, merged_adapter_cid
   2. GET  {api}/jobs/llm/get-shard/{jobId}?contributorAddress=...
-         → dataset shard ZIP (JSONL inside)
+         → dataset shard: ZIP (JSONL inside), zstd JSONL or Parquet
+     GET  {gateway}/{merged_adapter_cid}   (rounds ≥ 2 only)
+         → previous round's merged adapter, used as the warm start
   3. Fine-tune the base model with LoRA via PEFT + HuggingFace Transformers
-  4. Save adapter files (adapter_config.json + adapter_model.safetensors)
+  4. Save adapter files (adapter_config.json + adapter_model.safetensors
+     + train_metrics.json with the final train loss for the aggregator)
   5. POST {api}/jobs/llm/upload-adapter (multipart)
          → adapterCid (IPFS CID stored by backend via Pinata)
   6. POST {api}/jobs/llm/submit-adapter
@@ -27,15 +30,79 @@ Exit codes
   1  — slot not found
   2  — shard not ready yet (retry later)
   3  — training / upload error
+
+Start-up
+--------
+  torch / transformers / peft / datasets are imported lazily, so the slot
+  pre-checks (exit codes 1 and 2) return in well under a second. The shard
+  download then runs on the main thread while the tokenizer and base model
+  load on background threads; tokenisation starts as soon as the tokenizer
+  and shard are both ready, still overlapping the model load.
+
+CPU mode
+--------
+  When no GPU is used (the app sets CUDA_VISIBLE_DEVICES=""), thread pools
+  are sized to the physical cores and the process is pinned before torch is
+  imported; training runs under bf16 autocast on CPUs with native bf16, with
+  DataLoader workers collating ahead of each step. --compile additionally
+  wraps the model in torch.compile (slower start, faster steps on long runs).
+  See cpu_mode.py.
+
+  The CPU base model is loaded low-memory (low_mem.py): mmap'd safetensors
+  straight into bf16 on CPUs with native bf16 (fp32 on the rest), or int8 for
+  the frozen non-LoRA linears when that would not fit in RAM
+  (--base-precision auto); LoRA weights and optimizer state stay fp32.
+
+  --cpu-workers N (or TRAINCHAIN_CPU_WORKERS) trains with N local processes
+  under gloo DDP instead, each pinned to its own slice of the cores and
+  training on its own slice of the shard; this process downloads and
+  tokenises once, launches the ranks and uploads rank 0's adapter. See
+  cpu_ddp.py.
+
+Checkpoints
+-----------
+  Training state (LoRA weights, optimizer, scheduler, RNG, data position) is
+  checkpointed every TRAINCHAIN_CHECKPOINT_MINUTES (default 10) into a
+  persistent per-slot directory (checkpoints.py). Relaunching the same slot
+  after a close, crash or reboot resumes from the newest complete checkpoint;
+  a finished but unsubmitted adapter is uploaded without retraining.
+
+Time budget
+-----------
+  When the job sets max_train_minutes (or --time-budget-minutes is given),
+  seconds/step is measured over the first optimizer steps and the finish
+  time projected. If the planned steps would overrun the budget (counted
+  from the slot's first launch, less a reserve for save + upload), training
+  is capped at the steps that fit and the LR schedule is shortened to match.
+  train_metrics.json reports steps and planned_steps, so the aggregator
+  weights a capped adapter by the share of its shard it actually saw.
+
+Progress
+--------
+  Besides the [trainchain-llm] log lines, stage changes and per-logging-step
+  training stats (step/total, loss, samples/sec, tokens/sec, memory, ETA)
+  are printed as tagged JSON lines for jobs_window.py — see progress_events.py.
+  A per-stage wall-clock breakdown is always logged at exit; --profile [DIR]
+  also saves it with a torch.profiler capture of a few steps (profiling.py).
 """
 
+from __future__ import annotations
+
 import argparse
+import hashlib
+import inspect
 import json
 import os
+import shutil
 import sys
 import tempfile
+import time
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import TYPE_CHECKING
+
+_T_START = time.perf_counter()
 
 # Force UTF-8 stdout so emoji log lines don't crash on Windows cp1252 terminals.
 # The Popen caller already uses encoding="utf-8" but the subprocess's own stdout
@@ -43,17 +110,54 @@ from pathlib import Path
 if hasattr(sys.stdout, "reconfigure"):
     sys.stdout.reconfigure(encoding="utf-8", errors="replace")
 
+import psutil
 import requests
-import torch
-from datasets import Dataset
-from peft import LoraConfig, TaskType, get_peft_model
-from transformers import (
-    AutoModelForCausalLM,
-    AutoTokenizer,
-    DataCollatorForLanguageModeling,
-    Trainer,
-    TrainingArguments,
-)
+
+import checkpoints
+import cpu_ddp
+import shard_formats
+from batch_tuner import tune_batch_config
+from cache_utils import LRUCache, file_sha256
+from cpu_mode import configure_cpu_threads, cpu_supports_bf16, cpu_training_kwargs
+from model_store import ensure_model, model_revision
+from profiling import DEFAULT_PROFILE_DIR, StageTimer, StepProfiler, profile_run_dir
+from progress_events import RateMeter, emit
+
+if TYPE_CHECKING:  # heavy ML imports happen inside the functions that need them
+    import torch
+    from datasets import Dataset
+
+
+IPFS_GATEWAY = "https://gateway.pinata.cloud/ipfs"
+
+# Samples are padded per batch (not to max_seq_length) and batched by similar
+# length, so a bigger batch costs little extra compute on short prompts.
+# Job-level effective batch = per-device batch × gradient accumulation; the
+# split is chosen per machine by batch_tuner.py.
+_EFFECTIVE_BATCH = 16
+
+# Tokenised shards are cached across runs so retries skip data prep entirely
+_TOKEN_CACHE_BYTES = int(float(os.getenv("TRAINCHAIN_TOKEN_CACHE_GB", "5")) * 1024 ** 3)
+
+# Tokenisation worker sizing: each process holds its own tokenizer copy plus a
+# write buffer; below _MIN_ROWS_PER_PROC rows the process start-up cost dominates.
+_TOKENIZE_PROC_RAM_GB = 0.5
+_MIN_ROWS_PER_PROC    = 2000
+
+# Persistent checkpoints: wall-clock interval and how many to keep per run
+_CHECKPOINT_SECONDS = float(os.getenv("TRAINCHAIN_CHECKPOINT_MINUTES", "10")) * 60
+_CHECKPOINT_KEEP    = 2
+
+# Time budget: steps timed before projecting the finish (the first step of a
+# process is excluded — it carries warm-up), and time held back for save + upload
+_CALIBRATION_STEPS = 5
+_UPLOAD_RESERVE_S  = 180
+
+# Wall-clock per pipeline stage (logged at exit, saved with --profile)
+_STAGES = StageTimer()
+
+# Attention projections that get LoRA adapters; kept unquantised in int8 mode
+_LORA_TARGETS = ["q_proj", "v_proj"]
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -74,6 +178,21 @@ def _parse_args() -> argparse.Namespace:
     p.add_argument("--job-id",             required=True,  help="TrainChain job ID")
     p.add_argument("--api-url",            required=True,  help="Backend API base URL")
     p.add_argument("--contributor-wallet", required=True,  help="Contributor wallet address")
+    p.add_argument("--packing", action="store_true",
+                   help="Pack short samples into full max_seq_length windows")
+    p.add_argument("--compile", action="store_true",
+                   help="torch.compile the model (CPU mode; pays off on long runs)")
+    p.add_argument("--base-precision", choices=["auto", "fp32", "bf16", "int8"], default="auto",
+                   help="CPU only: precision of the frozen base weights (auto = bf16 with "
+                        "native CPU bf16, else fp32; int8 when that does not fit in RAM)")
+    p.add_argument("--profile", nargs="?", const=str(DEFAULT_PROFILE_DIR), default=None,
+                   metavar="DIR", help="Save a torch.profiler capture + stage timings under DIR")
+    p.add_argument("--cpu-workers", type=int, default=int(os.getenv("TRAINCHAIN_CPU_WORKERS", "1")),
+                   metavar="N", help="CPU only: train with N data-parallel processes (gloo DDP)")
+    p.add_argument("--ddp-worker", default=None, help=argparse.SUPPRESS)
+    p.add_argument("--time-budget-minutes", type=float, default=None, metavar="MIN",
+                   help="Cap training to fit MIN minutes (the job's max_train_minutes, "
+                        "if stricter, still applies)")
     return p.parse_args()
 
 
@@ -93,7 +212,8 @@ def fetch_slot_info(api_url: str, contributor_wallet: str) -> dict | None:
         return None
     log(
         f"Slot info | job={data.get('job_id')}  model={data.get('model_name')}  "
-        f"rank={data.get('lora_rank')}  epochs={data.get('epochs')}"
+        f"rank={data.get('lora_rank')}  epochs={data.get('epochs')}  "
+        f"round={data.get('current_round', 1)}/{data.get('max_rounds', 1)}"
     )
     return data
 
@@ -105,168 +225,788 @@ def fetch_slot_info(api_url: str, contributor_wallet: str) -> dict | None:
 def download_shard(api_url: str, job_id: str, contributor_wallet: str, dest: Path) -> Path:
     url = f"{api_url}/jobs/llm/get-shard/{job_id}"
     log(f"Downloading shard: {url}")
-    r = requests.get(
-        url,
-        params={"contributorAddress": contributor_wallet},
-        timeout=300,
-        stream=True,
-    )
-    if r.status_code == 202:
-        raise RuntimeError(
-            "Dataset shard is not ready yet — sharding is still in progress. "
-            "Please wait a few minutes and try again."
+    with _STAGES.stage("download"):
+        r = requests.get(
+            url,
+            params={"contributorAddress": contributor_wallet},
+            timeout=300,
+            stream=True,
         )
-    r.raise_for_status()
+        if r.status_code == 202:
+            raise RuntimeError(
+                "Dataset shard is not ready yet — sharding is still in progress. "
+                "Please wait a few minutes and try again."
+            )
+        r.raise_for_status()
 
-    zip_path = dest / "shard.zip"
-    with open(zip_path, "wb") as fh:
-        for chunk in r.iter_content(8192):
-            fh.write(chunk)
-    log(f"Shard saved ({zip_path.stat().st_size // 1024} KB)")
+        raw_path = dest / "shard.download"
+        with open(raw_path, "wb") as fh:
+            for chunk in r.iter_content(1024 * 1024):
+                fh.write(chunk)
+    fmt = shard_formats.sniff_format(raw_path)
+    log(f"Shard saved ({raw_path.stat().st_size // 1024} KB, {fmt})")
 
     extract_dir = dest / "shard_data"
     extract_dir.mkdir()
-    with zipfile.ZipFile(zip_path, "r") as zf:
+    if fmt != "zip":
+        # zstd JSONL / Parquet are read in place by _load_dataset
+        os.replace(raw_path, extract_dir / f"shard{shard_formats.SUFFIXES[fmt]}")
+        return extract_dir
+    with _STAGES.stage("extract"), zipfile.ZipFile(raw_path, "r") as zf:
         zf.extractall(extract_dir)
     log(f"Shard extracted to {extract_dir}")
     return extract_dir
 
 
+def download_merged_adapter(cid: str, dest: Path) -> Path:
+    """Fetch the previous round's merged adapter ZIP from IPFS and extract it."""
+    url = f"{IPFS_GATEWAY}/{cid}"
+    log(f"Downloading warm-start adapter: {url}")
+    r = requests.get(url, timeout=300, stream=True)
+    r.raise_for_status()
+
+    zip_path = dest / "merged_adapter.zip"
+    with open(zip_path, "wb") as fh:
+        for chunk in r.iter_content(8192):
+            fh.write(chunk)
+
+    adapter_dir = dest / "warm_start_adapter"
+    adapter_dir.mkdir()
+    with zipfile.ZipFile(zip_path, "r") as zf:
+        zf.extractall(adapter_dir)
+    log(f"Warm-start adapter extracted to {adapter_dir}")
+    return adapter_dir
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Step 3a — Load dataset from extracted shard
 # ─────────────────────────────────────────────────────────────────────────────
 
-def _load_samples(data_dir: Path) -> list[dict]:
-    """Find and parse the first JSONL / JSON file in the shard directory."""
-    for pattern in ("*.jsonl", "*.json"):
+def _find_data_file(data_dir: Path) -> Path:
+    """Return the first Parquet / zstd JSONL / JSONL / JSON file in the shard directory."""
+    for pattern in ("*.parquet", "*.zst", "*.jsonl", "*.json"):
         files = list(data_dir.rglob(pattern))
         if files:
-            with open(files[0], encoding="utf-8") as fh:
-                if files[0].suffix == ".jsonl":
-                    return [json.loads(ln) for ln in fh if ln.strip()]
-                data = json.load(fh)
-                return data if isinstance(data, list) else [data]
-    raise FileNotFoundError(f"No JSONL/JSON dataset file found under {data_dir}")
+            return files[0]
+    raise FileNotFoundError(f"No Parquet/JSONL/JSON dataset file found under {data_dir}")
+
+
+def _iter_samples(path: str):
+    """
+    Yield Alpaca fields one sample at a time. JSONL is parsed line by line so
+    only the current line is ever resident; a .json array has to be parsed whole.
+    """
+    def _fields(obj: dict) -> dict:
+        return {k: str(obj.get(k) or "") for k in ("instruction", "input", "output")}
+
+    with open(path, encoding="utf-8") as fh:
+        if path.endswith(".jsonl"):
+            for ln in fh:
+                if ln.strip():
+                    yield _fields(json.loads(ln))
+            return
+        data = json.load(fh)
+    for obj in data if isinstance(data, list) else [data]:
+        yield _fields(obj)
+
+
+def _load_dataset(path: Path, cache_dir: Path) -> Dataset:
+    """
+    Stream the shard into an Arrow table on disk. The returned Dataset is
+    memory-mapped, so shard size is bounded by disk rather than RAM.
+    zstd JSONL and Parquet are decoded column-wise by Arrow (shard_formats.py);
+    JSONL / JSON fall back to the per-sample generator.
+    """
+    from datasets import Dataset
+
+    if shard_formats.sniff_format(path) in shard_formats.COLUMNAR:
+        arrow_path = cache_dir / "shard.arrow"
+        rows = shard_formats.write_arrow(path, arrow_path)
+        log(f"Columnar shard decoded: {rows} rows")
+        return Dataset.from_file(str(arrow_path))
+
+    return Dataset.from_generator(
+        _iter_samples,
+        gen_kwargs={"path": str(path)},
+        cache_dir=str(cache_dir),
+        keep_in_memory=False,
+    )
 
 
 def _build_prompt(sample: dict) -> str:
     """Alpaca-format prompt builder."""
-    prompt = f"### Instruction:\n{sample.get('instruction', '')}\n"
+    prompt = f"### Instruction:\n{sample.get('instruction') or ''}\n"
     if sample.get("input"):
         prompt += f"\n### Input:\n{sample['input']}\n"
-    prompt += f"\n### Response:\n{sample.get('output', '')}"
+    prompt += f"\n### Response:\n{sample.get('output') or ''}"
     return prompt
 
 
+def _tokenized_cache_key(
+    data_file: Path, tokenizer, max_seq_len: int, packing: bool, revision: str | None = None
+) -> str:
+    """
+    Identify a tokenised shard by everything that changes its contents:
+    shard bytes, tokenizer identity + revision, sequence length, prompt
+    template and packing mode.
+    """
+    revision = (
+        revision
+        or getattr(tokenizer, "_commit_hash", None)
+        or tokenizer.init_kwargs.get("_commit_hash")
+    )
+    parts = [
+        file_sha256(data_file),
+        tokenizer.name_or_path,
+        str(revision),
+        type(tokenizer).__name__,
+        str(len(tokenizer)),
+        str(max_seq_len),
+        hashlib.sha256(inspect.getsource(_build_prompt).encode()).hexdigest(),
+        f"packing={packing}",
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()[:32]
+
+
+def _pack_sequences(batch: dict, max_len: int) -> dict:
+    """
+    Greedily concatenate EOS-terminated samples into rows of at most max_len
+    tokens. position_ids restart at 0 for every sample and segment_ids number
+    the samples within a row, so the collator can stop them attending across
+    each other.
+    """
+    rows: dict[str, list] = {"input_ids": [], "position_ids": [], "segment_ids": [], "length": []}
+    ids: list[int] = []
+    pos: list[int] = []
+    seg: list[int] = []
+
+    def _flush() -> None:
+        if ids:
+            rows["input_ids"].append(ids.copy())
+            rows["position_ids"].append(pos.copy())
+            rows["segment_ids"].append(seg.copy())
+            rows["length"].append(len(ids))
+            ids.clear(); pos.clear(); seg.clear()
+
+    for sample in batch["input_ids"]:
+        if len(ids) + len(sample) > max_len:
+            _flush()
+        n_seg = (seg[-1] + 1) if seg else 0
+        ids.extend(sample)
+        pos.extend(range(len(sample)))
+        seg.extend([n_seg] * len(sample))
+    _flush()
+    return rows
+
+
+class _PackedCollator:
+    """
+    Pads packed rows to the batch maximum and builds a block-diagonal causal
+    mask (additive, 4-D) so each sample only attends to itself. The first
+    token of every sample is excluded from the loss — it would otherwise be
+    predicted from the previous sample's EOS.
+    """
+
+    def __init__(self, pad_id: int, mask_dtype: torch.dtype):
+        self.pad_id     = pad_id
+        self.mask_dtype = mask_dtype
+
+    def __call__(self, features: list[dict]) -> dict:
+        import torch
+
+        width = max(len(f["input_ids"]) for f in features)
+        n     = len(features)
+        input_ids = torch.full((n, width), self.pad_id, dtype=torch.long)
+        labels    = torch.full((n, width), -100, dtype=torch.long)
+        pos_ids   = torch.zeros((n, width), dtype=torch.long)
+        # Pads get unique negative segments → they only attend to themselves
+        seg_ids   = -torch.arange(1, width + 1).repeat(n, 1)
+
+        for i, f in enumerate(features):
+            k   = len(f["input_ids"])
+            ids = torch.as_tensor(f["input_ids"])
+            seg = torch.as_tensor(f["segment_ids"])
+            input_ids[i, :k] = ids
+            pos_ids[i, :k]   = torch.as_tensor(f["position_ids"])
+            seg_ids[i, :k]   = seg
+            labels[i, :k]    = ids
+            labels[i, :k][pos_ids[i, :k] == 0] = -100
+
+        same   = seg_ids[:, :, None] == seg_ids[:, None, :]
+        causal = torch.ones((width, width), dtype=torch.bool).tril()
+        mask   = torch.zeros((n, 1, width, width), dtype=self.mask_dtype)
+        mask.masked_fill_(~(same & causal)[:, None], torch.finfo(self.mask_dtype).min)
+
+        return {
+            "input_ids":      input_ids,
+            "labels":         labels,
+            "position_ids":   pos_ids,
+            "attention_mask": mask,
+        }
+
+
+def _tokenize_num_proc(n_rows: int) -> int:
+    """Worker count bounded by cores, free RAM and shard size."""
+    cores   = os.cpu_count() or 1
+    by_ram  = int(psutil.virtual_memory().available / (1024 ** 3) / _TOKENIZE_PROC_RAM_GB)
+    by_rows = n_rows // _MIN_ROWS_PER_PROC
+    return max(1, min(cores, by_ram, by_rows))
+
+
+def _tokenize_shard(
+    data_file: Path, tokenizer, max_seq_len: int, packing: bool, work_dir: Path
+) -> tuple[Dataset, int, int]:
+    """
+    Stream, prompt-format and tokenise a shard (optionally packing it).
+    Returns (dataset, n_samples, n_real_tokens).
+    """
+    timings: dict[str, float] = {}
+    t0 = time.perf_counter()
+    hf_ds = _load_dataset(data_file, work_dir)
+    timings["stream"] = time.perf_counter() - t0
+    num_proc = _tokenize_num_proc(len(hf_ds))
+    if num_proc > 1:
+        # Fast tokenizers' own thread pool fights the process pool otherwise
+        os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    log(f"Loaded {len(hf_ds)} samples from shard (tokenising with {num_proc} process(es))")
+
+    def _tokenize(batch: dict) -> dict:
+        # Prompts are built per batch here, never materialised for the whole shard.
+        # No padding — the collator pads each batch to its longest row
+        # and masks pad positions out of the loss (labels = -100).
+        texts = [
+            _build_prompt({k: batch[k][i] for k in batch})
+            for i in range(len(batch["instruction"]))
+        ]
+        out = tokenizer(
+            texts,
+            max_length=max_seq_len - 1 if packing else max_seq_len,
+            truncation=True,
+            return_tensors=None,
+        )
+        if packing:
+            # EOS separates samples inside a packed row
+            out["input_ids"] = [ids + [tokenizer.eos_token_id] for ids in out["input_ids"]]
+            del out["attention_mask"]
+        out["length"] = [len(ids) for ids in out["input_ids"]]
+        return out
+
+    # With num_proc > 1 every worker writes its own Arrow file; datasets
+    # concatenates them by reference, without copying rows.
+    t0 = time.perf_counter()
+    tok_ds = hf_ds.map(
+        _tokenize, batched=True, remove_columns=hf_ds.column_names, num_proc=num_proc
+    )
+    timings["tokenize"] = time.perf_counter() - t0
+    n_samples   = len(tok_ds)
+    real_tokens = sum(tok_ds["length"])
+    log(
+        f"Tokenized dataset: {n_samples} rows, {real_tokens} tokens "
+        f"({real_tokens / max(1, n_samples * max_seq_len):.0%} of max_length padding)"
+    )
+
+    if packing:
+        t0 = time.perf_counter()
+        tok_ds = tok_ds.map(
+            _pack_sequences,
+            batched=True,
+            batch_size=1000,
+            remove_columns=tok_ds.column_names,
+            fn_kwargs={"max_len": max_seq_len},
+            num_proc=num_proc,
+        )
+        timings["pack"] = time.perf_counter() - t0
+        log(
+            f"Packed {n_samples} samples / {real_tokens} tokens into {len(tok_ds)} rows "
+            f"({real_tokens / max(1, len(tok_ds) * max_seq_len):.0%} token utilisation)"
+        )
+
+    log("Data prep timings | " + "  ".join(f"{k}={v:.1f}s" for k, v in timings.items()))
+    return tok_ds, n_samples, real_tokens
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Step 3b — Train
 # ─────────────────────────────────────────────────────────────────────────────
 
-def run_training(slot: dict, data_dir: Path, output_dir: Path) -> Path:
-    model_name  = slot["model_name"]
-    epochs      = int(slot.get("epochs", 3))
-    lora_rank   = int(slot.get("lora_rank", 8))
-    lora_alpha  = int(slot.get("lora_alpha", 16))
-    max_seq_len = int(slot.get("max_seq_length", 512))
-    lr          = float(slot.get("learning_rate", 2e-4))
+def resolve_model_path(model_name: str) -> str:
+    """Weights from the managed model store (usually prefetched by the app)."""
+    try:
+        with _STAGES.stage("model_fetch"):
+            return str(ensure_model(model_name))
+    except Exception as exc:
+        log(f"Model store unavailable ({exc}) — falling back to the default HF cache")
+        return model_name
 
-    use_gpu = torch.cuda.is_available()
-    device  = "cuda" if use_gpu else "cpu"
-    log(f"Device: {device}  (GPU={use_gpu})")
-    log(
-        f"Hyperparams | model={model_name}  epochs={epochs}  rank={lora_rank}  "
-        f"alpha={lora_alpha}  seq={max_seq_len}  lr={lr}"
-    )
 
-    # ── Tokenizer ──────────────────────────────────────────────────────────────
+def load_tokenizer(model_path: str):
+    from transformers import AutoTokenizer
+
     log("Loading tokenizer …")
-    tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True)
     if tokenizer.pad_token is None:
         # Most causal LMs don't set a pad token; use EOS as padding
         tokenizer.pad_token = tokenizer.eos_token
+    return tokenizer
+
 
-    # ── Base model ─────────────────────────────────────────────────────────────
-    log("Loading base model (this may download weights on first run) …")
+def load_base_model(model_path: str, base_precision: str = "auto"):
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    log(f"Loading base model from {model_path} …")
     load_kw: dict = {"trust_remote_code": True}
-    if use_gpu:
+    precision = "fp16"
+    if torch.cuda.is_available():
         load_kw["torch_dtype"] = torch.float16
         load_kw["device_map"]  = "auto"
     else:
-        load_kw["torch_dtype"] = torch.float32
-    model = AutoModelForCausalLM.from_pretrained(model_name, **load_kw)
+        import low_mem
 
-    # ── LoRA config ──────────────────────────────────────────────────────────
-    lora_cfg = LoraConfig(
-        task_type=TaskType.CAUSAL_LM,
-        r=lora_rank,
-        lora_alpha=lora_alpha,
-        lora_dropout=0.05,
-        target_modules=["q_proj", "v_proj"],
-        bias="none",
+        precision = low_mem.choose_base_precision(model_path, base_precision)
+        if precision != "int8":
+            load_kw.update(low_mem.load_kwargs(precision))
+    with _STAGES.stage("load_model"):
+        if precision == "int8":
+            # Quantised while loading, so the bf16 model is never fully in RAM
+            model, n = low_mem.load_int8_model(model_path, keep=_LORA_TARGETS + ["lm_head"])
+            log(f"Quantised {n} frozen linear layers to int8")
+        else:
+            model = AutoModelForCausalLM.from_pretrained(model_path, **load_kw)
+    log(
+        f"Base model loaded ({precision}, RSS {psutil.Process().memory_info().rss / 1024 ** 3:.2f} GB, "
+        f"{time.perf_counter() - _T_START:.1f}s since start)"
     )
-    model = get_peft_model(model, lora_cfg)
-    model.print_trainable_parameters()
+    return model
+
+
+def prepare_dataset(
+    slot: dict, data_dir: Path, work_dir: Path, tokenizer, packing: bool = False
+) -> tuple[Dataset, int, int]:
+    """
+    Tokenised training set for the shard, from the persistent cache when possible.
+    Returns (dataset, n_samples, n_real_tokens).
+    """
+    from datasets import Dataset
+
+    max_seq_len = int(slot.get("max_seq_length", 512))
 
-    # ── Dataset ────────────────────────────────────────────────────────────────
     log("Preparing dataset …")
-    raw_samples = _load_samples(data_dir)
-    prompts     = [_build_prompt(s) for s in raw_samples]
-    log(f"Loaded {len(prompts)} samples from shard")
+    data_file   = _find_data_file(data_dir)
+    token_cache = LRUCache("tokenized", _TOKEN_CACHE_BYTES)
+    cache_key   = _tokenized_cache_key(
+        data_file, tokenizer, max_seq_len, packing, model_revision(slot["model_name"])
+    )
+    cached      = token_cache.get(cache_key)
+    if cached is not None:
+        cache_path, meta = cached
+        tok_ds      = Dataset.load_from_disk(str(cache_path))
+        n_samples   = meta["samples"]
+        real_tokens = meta["tokens"]
+        log(f"Tokenized dataset cache hit ({cache_key[:12]}): {len(tok_ds)} rows, {real_tokens} tokens")
+        return tok_ds, n_samples, real_tokens
 
-    def _tokenize(batch: dict) -> dict:
-        out = tokenizer(
-            batch["text"],
-            max_length=max_seq_len,
-            truncation=True,
-            padding="max_length",
-            return_tensors=None,
+    tok_ds, n_samples, real_tokens = _tokenize_shard(
+        data_file, tokenizer, max_seq_len, packing, work_dir / "arrow_cache"
+    )
+    staging = token_cache.staging_dir(cache_key)
+    tok_ds.save_to_disk(str(staging))
+    cache_path = token_cache.commit(
+        cache_key, staging, {"samples": n_samples, "tokens": real_tokens}
+    )
+    log(f"Tokenized dataset cached ({cache_key[:12]})")
+    # Re-open from the cache so training reads the persistent memory-mapped copy
+    return Dataset.load_from_disk(str(cache_path)), n_samples, real_tokens
+
+
+def _length_grouping_kwargs(enabled: bool) -> dict:
+    """
+    TrainingArguments for the length-bucketed sampler. Transformers 5 replaced
+    group_by_length=True with train_sampling_strategy="group_by_length".
+    """
+    from transformers import TrainingArguments
+
+    if "train_sampling_strategy" in TrainingArguments.__dataclass_fields__:
+        strategy = "group_by_length" if enabled else "random"
+        return {"train_sampling_strategy": strategy, "length_column_name": "length"}
+    return {"group_by_length": enabled, "length_column_name": "length"}
+
+
+def _time_budget_minutes(slot: dict, cli_minutes: float | None) -> float | None:
+    """Stricter of the job's max_train_minutes and the CLI override; None = unbounded."""
+    limits = [float(m) for m in (slot.get("max_train_minutes"), cli_minutes) if m]
+    return min(limits) if limits else None
+
+
+def _shorten_lr_schedule(scheduler, total_steps: int) -> bool:
+    """
+    Re-point a transformers LambdaLR schedule (linear / cosine decay built by
+    get_scheduler) at a new total step count, so a capped run still decays to
+    the end. Returns False when the scheduler has no such partials.
+    """
+    import functools
+
+    lambdas = getattr(scheduler, "lr_lambdas", None)
+    if not lambdas or not all(
+        isinstance(fn, functools.partial) and "num_training_steps" in fn.keywords
+        for fn in lambdas
+    ):
+        return False
+    scheduler.lr_lambdas = [
+        functools.partial(fn.func, *fn.args, **{**fn.keywords, "num_training_steps": total_steps})
+        for fn in lambdas
+    ]
+    return True
+
+
+def run_training(
+    slot: dict,
+    model,
+    tokenizer,
+    train_ds: Dataset,
+    output_dir: Path,
+    n_samples: int,
+    real_tokens: int,
+    warm_start_dir: Path | None = None,
+    packing: bool = False,
+    compile_model: bool = False,
+    profile_dir: Path | None = None,
+    time_budget_min: float | None = None,
+) -> Path:
+    import torch
+    from low_mem import upcast_trainable
+    from peft import LoraConfig, PeftModel, TaskType, get_peft_model
+    from transformers import (
+        DataCollatorForLanguageModeling,
+        Trainer,
+        TrainerCallback,
+        TrainingArguments,
+    )
+
+    model_name  = slot["model_name"]
+    epochs      = int(slot.get("epochs", 3))
+    lora_rank   = int(slot.get("lora_rank", 8))
+    lora_alpha  = int(slot.get("lora_alpha", 16))
+    max_seq_len = int(slot.get("max_seq_length", 512))
+    lr          = float(slot.get("learning_rate", 2e-4))
+
+    use_gpu  = torch.cuda.is_available()
+    device   = "cuda" if use_gpu else "cpu"
+    cpu_bf16 = not use_gpu and cpu_supports_bf16()
+    log(f"Device: {device}  (GPU={use_gpu})")
+    if not use_gpu:
+        threads = configure_cpu_threads(cpu_ddp.worker_cpus())
+        log(
+            f"CPU mode | threads intra={threads['intra_op']} inter={threads['inter_op']}  "
+            f"pinned cores={len(threads['cpus'])}  bf16_autocast={cpu_bf16}  compile={compile_model}"
+            + (f"  ddp rank {cpu_ddp.rank()}/{cpu_ddp.world_size()}" if cpu_ddp.world_size() > 1 else "")
         )
-        # For causal LM the labels ARE the input_ids (shifted inside the model)
-        out["labels"] = out["input_ids"].copy()
-        return out
+    log(
+        f"Hyperparams | model={model_name}  epochs={epochs}  rank={lora_rank}  "
+        f"alpha={lora_alpha}  seq={max_seq_len}  lr={lr}  packing={packing}"
+    )
+    # Packed attention masks must match the autocast compute dtype
+    compute_dtype = torch.bfloat16 if cpu_bf16 else model.dtype
+
+    # ── LoRA config ──────────────────────────────────────────────────────────
+    if warm_start_dir is not None:
+        # Later rounds continue from the previous round's merged adapter
+        log(f"Warm-starting LoRA from merged adapter (round {slot.get('current_round')}) …")
+        model = PeftModel.from_pretrained(model, str(warm_start_dir), is_trainable=True)
+    else:
+        lora_cfg = LoraConfig(
+            task_type=TaskType.CAUSAL_LM,
+            r=lora_rank,
+            lora_alpha=lora_alpha,
+            lora_dropout=0.05,
+            target_modules=_LORA_TARGETS,
+            bias="none",
+        )
+        model = get_peft_model(model, lora_cfg)
+    # bf16 / int8 bases: LoRA weights and their optimizer state stay fp32
+    upcast_trainable(model)
+    model.print_trainable_parameters()
+
+    if packing:
+        collator = _PackedCollator(tokenizer.pad_token_id, compute_dtype)
+    else:
+        collator = DataCollatorForLanguageModeling(
+            tokenizer, mlm=False, pad_to_multiple_of=8 if use_gpu else None
+        )
+
+    class _FirstStepTimer(TrainerCallback):
+        """Logs cold-start latency: process start → first optimizer step."""
+
+        def __init__(self):
+            self.done = False
+
+        def on_step_end(self, args, state, control, **kwargs):
+            # First step of this process — a resumed run starts past step 1
+            if not self.done:
+                self.done = True
+                log(f"Metric | time_to_first_step={time.perf_counter() - _T_START:.1f}s")
+
+    class _PeriodicCheckpoint(TrainerCallback):
+        """Requests a save every _CHECKPOINT_SECONDS and commits each one once written."""
+
+        def __init__(self):
+            self.last = time.monotonic()
+
+        def on_step_end(self, args, state, control, **kwargs):
+            # DDP ranks must agree, or the savers would wait on each other
+            if cpu_ddp.any_rank(time.monotonic() - self.last >= _CHECKPOINT_SECONDS):
+                control.should_save = True
+
+        def on_save(self, args, state, control, **kwargs):
+            cpu_ddp.barrier()   # every rank has written its RNG state
+            if state.is_world_process_zero:
+                ckpt = Path(args.output_dir) / f"checkpoint-{state.global_step}"
+                checkpoints.mark_complete(ckpt)
+                log(f"Checkpoint saved: step {state.global_step}/{state.max_steps}")
+            self.last = time.monotonic()
+
+    class _ProfilerCallback(TrainerCallback):
+        """Runs torch.profiler over a bounded window from the first training step."""
+
+        def __init__(self, out_dir: Path):
+            self.profiler = StepProfiler(out_dir)
+
+        def on_train_begin(self, args, state, control, **kwargs):
+            self.profiler.start()
+
+        def on_step_end(self, args, state, control, **kwargs):
+            self.profiler.step()
+
+        def on_train_end(self, args, state, control, **kwargs):
+            self.profiler.stop()
+
+    # Packed rows hold several samples; report both in real (unpadded) units
+    samples_per_row = n_samples / max(1, len(train_ds))
+    tokens_per_row  = real_tokens / max(1, len(train_ds))
 
-    hf_ds = Dataset.from_dict({"text": prompts})
-    tok_ds = hf_ds.map(_tokenize, batched=True, remove_columns=["text"])
-    tok_ds.set_format("torch")
-    log(f"Tokenized dataset: {len(tok_ds)} rows")
+    class _ProgressReporter(TrainerCallback):
+        """Emits structured progress events (progress_events.py) for the app."""
+
+        def on_train_begin(self, args, state, control, **kwargs):
+            self.meter = RateMeter(state.max_steps)
+            self.meter.update(state.global_step)
+            emit("train", step=state.global_step, total=state.max_steps,
+                 epochs=epochs, message="Training started")
+
+        def on_log(self, args, state, control, logs=None, **kwargs):
+            if not logs or "loss" not in logs:
+                return
+            self.meter.total = state.max_steps   # shrinks if _DeadlineGuard caps the run
+            rate, eta = self.meter.update(state.global_step)
+            rows_s    = rate * batch_size * grad_accum * cpu_ddp.world_size() if rate else None
+            emit(
+                "train",
+                step=state.global_step,
+                total=state.max_steps,
+                epoch=round(state.epoch or 0.0, 2),
+                epochs=epochs,
+                loss=round(logs["loss"], 4),
+                samples_per_sec=round(rows_s * samples_per_row, 2) if rows_s else None,
+                tokens_per_sec=round(rows_s * tokens_per_row, 1) if rows_s else None,
+                eta_sec=round(eta) if eta is not None else None,
+            )
+
+    class _DeadlineGuard(TrainerCallback):
+        """Caps optimizer steps so training finishes before `deadline` (epoch secs)."""
+
+        def __init__(self, deadline: float):
+            self.deadline      = deadline
+            self.planned_steps = 0
+            self.capped_at: int | None = None
+            self.sec_per_step: float | None = None
+            self._t0: float | None = None
+            self._step0 = 0
+
+        def on_train_begin(self, args, state, control, **kwargs):
+            self.planned_steps = state.max_steps
+
+        def on_step_end(self, args, state, control, lr_scheduler=None, **kwargs):
+            now = time.time()
+            if self._t0 is None:
+                self._t0, self._step0 = now, state.global_step
+                return
+            timed = state.global_step - self._step0
+            if timed >= _CALIBRATION_STEPS:
+                self.sec_per_step = (now - self._t0) / timed
+                if timed == _CALIBRATION_STEPS:
+                    self._project(state, now, lr_scheduler)
+            if self.capped_at is not None and state.global_step >= self.capped_at:
+                stop = True
+            else:
+                stop = bool(self.sec_per_step) and now + self.sec_per_step > self.deadline
+                if stop:
+                    log(f"Time budget reached at step {state.global_step}/{state.max_steps}")
+            # DDP ranks stop together, or the others would hang in the next all-reduce
+            control.should_training_stop = cpu_ddp.any_rank(stop)
+
+        def _project(self, state, now: float, lr_scheduler) -> None:
+            remaining = state.max_steps - state.global_step
+            finish_in = remaining * self.sec_per_step
+            left      = self.deadline - now
+            cap       = None
+            if finish_in > left:
+                cap = state.global_step + max(0, int(left / self.sec_per_step))
+            cap = cpu_ddp.broadcast(cap)   # rank 0's projection decides for all ranks
+            if cap is None:
+                log(
+                    f"Time budget | {self.sec_per_step:.2f}s/step  projected finish in "
+                    f"{finish_in / 60:.1f} min  (budget left {left / 60:.1f} min)"
+                )
+                return
+            log(
+                f"Time budget | {self.sec_per_step:.2f}s/step  projected {finish_in / 60:.1f} min "
+                f"exceeds budget left {left / 60:.1f} min — capping at {cap}/{state.max_steps} steps"
+            )
+            self.capped_at  = cap
+            state.max_steps = cap
+            if not _shorten_lr_schedule(lr_scheduler, cap):
+                log("Time budget | LR schedule not rescaled (unrecognised scheduler)")
+
+    # ── Resume state / batch size for this hardware ─────────────────────────────
+    # A resumed run must keep its batch split, or the saved data position and
+    # scheduler step no longer line up with the sampler. Under CPU DDP rank 0
+    # decides and the other ranks take its answer.
+    world       = cpu_ddp.world_size()
+    resume_from = None
+    run_cfg: dict = {}
+    if cpu_ddp.is_main_process():
+        resume_from = checkpoints.latest_checkpoint(output_dir)
+        run_cfg     = checkpoints.load_run_config(output_dir) or {}
+        if resume_from is not None and "batch_size" in run_cfg:
+            log(
+                f"Resuming from {resume_from.name} "
+                f"(batch_size={run_cfg['batch_size']}  grad_accum={run_cfg['grad_accum']})"
+            )
+        else:
+            resume_from = None
+            # Each DDP rank contributes batch × accum samples per optimizer step
+            effective = int(slot.get("effective_batch_size") or _EFFECTIVE_BATCH)
+            batch_size, grad_accum = tune_batch_config(
+                model,
+                collator,
+                train_ds,
+                model_name,
+                max_seq_len,
+                packing,
+                max(1, -(-effective // world)),
+                use_gpu,
+                world,
+                cpu_bf16=cpu_bf16,
+            )
+            run_cfg = {
+                "job_id":     slot["job_id"],
+                "round":      int(slot.get("current_round") or 1),
+                "model":      model_name,
+                "packing":    packing,
+                "batch_size": batch_size,
+                "grad_accum": grad_accum,
+                "world_size": world,
+                # Budget clock starts at the slot's first launch, not at each resume
+                "started_at": time.time() - (time.perf_counter() - _T_START),
+            }
+            checkpoints.save_run_config(output_dir, run_cfg)
+    resume_from, run_cfg   = cpu_ddp.broadcast((resume_from, run_cfg))
+    batch_size, grad_accum = int(run_cfg["batch_size"]), int(run_cfg["grad_accum"])
 
     # ── Training arguments ─────────────────────────────────────────────────────
     ckpt_dir = output_dir / "checkpoints"
     ckpt_dir.mkdir(parents=True, exist_ok=True)
 
+    device_kw: dict = (
+        {"fp16": True, "dataloader_pin_memory": True}   # mixed precision on GPU
+        if use_gpu
+        else cpu_training_kwargs(cpu_bf16, compile_model)
+    )
+    if world > 1:
+        device_kw["ddp_backend"] = "gloo"
     train_args = TrainingArguments(
         output_dir=str(ckpt_dir),
         num_train_epochs=epochs,
-        per_device_train_batch_size=1,
-        gradient_accumulation_steps=4,
+        per_device_train_batch_size=batch_size,
+        gradient_accumulation_steps=grad_accum,
+        remove_unused_columns=not packing,  # packed rows need position/segment ids
         learning_rate=lr,
-        fp16=use_gpu,          # enable mixed precision on GPU
-        bf16=False,
         logging_steps=5,
-        save_strategy="no",    # no checkpoints — adapter saved once at the end
+        # Saves are triggered on wall-clock time by _PeriodicCheckpoint, not by step count
+        save_strategy="no",
+        save_total_limit=_CHECKPOINT_KEEP,
         report_to="none",      # disable wandb / tensorboard
-        dataloader_pin_memory=use_gpu,
-        use_cpu=not use_gpu,   # no_cuda was removed in Transformers ≥4.37
         ddp_find_unused_parameters=False,
+        # Length-bucketed sampler → little padding per batch
+        **_length_grouping_kwargs(not packing),
+        **device_kw,
     )
 
+    callbacks = [_FirstStepTimer(), _PeriodicCheckpoint(), _ProgressReporter()]
+    if profile_dir is not None:
+        callbacks.append(_ProfilerCallback(profile_dir))
+
+    budget_min = _time_budget_minutes(slot, time_budget_min)
+    guard      = None
+    if budget_min is not None:
+        started_at = float(run_cfg.get("started_at") or time.time())
+        guard      = _DeadlineGuard(started_at + budget_min * 60 - _UPLOAD_RESERVE_S)
+        callbacks.append(guard)
+        log(f"Time budget: {budget_min:g} min ({(guard.deadline - time.time()) / 60:.1f} min left for training)")
     trainer = Trainer(
         model=model,
         args=train_args,
-        train_dataset=tok_ds,
-        data_collator=DataCollatorForLanguageModeling(tokenizer, mlm=False),
+        train_dataset=train_ds,
+        data_collator=collator,
+        callbacks=callbacks,
     )
 
     log("Training started …")
-    trainer.train()
-    log("Training complete.")
+    with _STAGES.stage("train"):
+        result = trainer.train(
+            resume_from_checkpoint=str(resume_from) if resume_from is not None else None
+        )
+    runtime = result.metrics.get("train_runtime") or 0.0
+    if runtime > 0:
+        # The max_length figure is an estimate from token counts, not a timed
+        # run; benchmarks/bench_llm.py --modes max_length measures it
+        tok_s = real_tokens * epochs / runtime
+        log(
+            f"Throughput: {tok_s:.0f} real tokens/sec "
+            f"(estimate: max_length padding would feed "
+            f"{n_samples * max_seq_len / max(1, real_tokens):.1f}x as many tokens)"
+        )
+    log(f"Training complete. loss={result.training_loss:.4f}")
 
     # ── Save LoRA adapter ──────────────────────────────────────────────────────
     adapter_dir = output_dir / "adapter"
-    adapter_dir.mkdir(parents=True, exist_ok=True)
-    model.save_pretrained(str(adapter_dir))
-    tokenizer.save_pretrained(str(adapter_dir))
+    if not cpu_ddp.is_main_process():
+        # DDP ranks end with identical weights; rank 0 writes the one adapter
+        cpu_ddp.barrier()
+        return adapter_dir
+    emit("save", loss=round(result.training_loss, 4), message="Saving adapter")
+    with _STAGES.stage("save"):
+        # Staged then renamed, so a half-written adapter is never taken as finished
+        staging = output_dir / "adapter.partial"
+        shutil.rmtree(staging, ignore_errors=True)
+        staging.mkdir(parents=True)
+        model.save_pretrained(str(staging))
+        tokenizer.save_pretrained(str(staging))
+        # Read by the aggregator to decide whether another round is needed
+        (staging / "train_metrics.json").write_text(json.dumps({
+            "train_loss": result.training_loss,
+            "round":      int(slot.get("current_round") or 1),
+            "samples":    n_samples,
+            "steps":      result.global_step,
+            # Equal to steps unless the time budget cut the run short
+            "planned_steps": guard.planned_steps if guard else result.global_step,
+        }))
+        shutil.rmtree(adapter_dir, ignore_errors=True)
+        os.replace(staging, adapter_dir)
+        # Intermediate checkpoints are no longer needed once the adapter exists
+        shutil.rmtree(ckpt_dir, ignore_errors=True)
     log(f"Adapter saved to {adapter_dir}")
+    cpu_ddp.barrier()
     return adapter_dir
 
 
@@ -340,12 +1080,143 @@ def submit_adapter(
 # Main
 # ─────────────────────────────────────────────────────────────────────────────
 
-def main() -> None:
-    args = _parse_args()
-    log(f"job={args.job_id} | wallet={args.contributor_wallet}")
+def _train_slot(
+    args: argparse.Namespace, slot: dict, run_dir: Path, tmp_p: Path, profile_dir: Path | None
+) -> Path:
+    """
+    Steps 2-3. Tokenizer + base model load on background threads while the
+    shard downloads; the model load keeps running through tokenisation.
+    """
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="tc-load") as pool:
+        path_future  = pool.submit(resolve_model_path, slot["model_name"])
+        tok_future   = pool.submit(lambda: load_tokenizer(path_future.result()))
+        model_future = pool.submit(
+            lambda: load_base_model(path_future.result(), args.base_precision)
+        )
+
+        # 2. Download shard (+ previous round's merged adapter)
+        emit("download", message="Downloading dataset shard")
+        data_dir   = download_shard(args.api_url, args.job_id, args.contributor_wallet, tmp_p)
+        warm_start_dir = None
+        if int(slot.get("current_round") or 1) > 1 and slot.get("merged_adapter_cid"):
+            warm_start_dir = download_merged_adapter(slot["merged_adapter_cid"], tmp_p)
+        log(f"Shard ready ({time.perf_counter() - _T_START:.1f}s since start)")
+
+        # 3. Tokenise (overlaps the model load), then train
+        emit("prepare", message="Tokenising dataset")
+        tokenizer = tok_future.result()
+        with _STAGES.stage("tokenise"):
+            train_ds, n_samples, real_tokens = prepare_dataset(
+                slot, data_dir, tmp_p, tokenizer, args.packing
+            )
+        emit("load_model", message="Loading base model")
+        model = model_future.result()
+
+    return run_training(
+        slot, model, tokenizer, train_ds, run_dir, n_samples, real_tokens,
+        warm_start_dir, args.packing, args.compile, profile_dir, args.time_budget_minutes,
+    )
+
+
+def _cpu_worker_count(args: argparse.Namespace, run_dir: Path) -> int:
+    """DDP rank count for this run; a resumed run keeps the count it started with."""
+    run_cfg = checkpoints.load_run_config(run_dir) or {}
+    if checkpoints.latest_checkpoint(run_dir) is not None and "world_size" in run_cfg:
+        return int(run_cfg["world_size"])
+    if args.cpu_workers <= 1:
+        return 1
+    if os.environ.get("CUDA_VISIBLE_DEVICES") != "":
+        import torch
+
+        if torch.cuda.is_available():
+            log("--cpu-workers ignored: training on the GPU")
+            return 1
+    return args.cpu_workers
+
 
+def _train_slot_ddp(
+    args: argparse.Namespace,
+    slot: dict,
+    run_dir: Path,
+    tmp_p: Path,
+    profile_dir: Path | None,
+    n_workers: int,
+) -> Path:
+    """
+    Steps 2-3 under CPU DDP. Shard download, model fetch and tokenisation run
+    once here (the ranks then hit the token cache); training runs in
+    n_workers copies of this script started with --ddp-worker.
+    """
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="tc-load") as pool:
+        path_future = pool.submit(resolve_model_path, slot["model_name"])
+
+        emit("download", message="Downloading dataset shard")
+        data_dir       = download_shard(args.api_url, args.job_id, args.contributor_wallet, tmp_p)
+        warm_start_dir = None
+        if int(slot.get("current_round") or 1) > 1 and slot.get("merged_adapter_cid"):
+            warm_start_dir = download_merged_adapter(slot["merged_adapter_cid"], tmp_p)
+
+        emit("prepare", message="Tokenising dataset")
+        model_path = path_future.result()
+        with _STAGES.stage("tokenise"):
+            prepare_dataset(slot, data_dir, tmp_p, load_tokenizer(model_path), args.packing)
+
+    n_workers = cpu_ddp.plan_workers(n_workers, model_path)
+    spec_path = tmp_p / "ddp_worker.json"
+    spec_path.write_text(json.dumps({
+        "slot":           slot,
+        "model_path":     model_path,
+        "data_dir":       str(data_dir),
+        "warm_start_dir": str(warm_start_dir) if warm_start_dir else None,
+        "run_dir":        str(run_dir),
+        "work_dir":       str(tmp_p / "ddp"),
+        "profile_dir":    str(profile_dir) if profile_dir else None,
+    }))
+    cmd = [sys.executable, str(Path(__file__).resolve()), *sys.argv[1:], "--ddp-worker", str(spec_path)]
+
+    emit("load_model", message=f"Starting {n_workers} training processes")
+    with _STAGES.stage("train"):
+        code = cpu_ddp.launch(cmd, n_workers, run_dir)
+    adapter_dir = checkpoints.finished_adapter(run_dir)
+    if code != 0 or adapter_dir is None:
+        raise RuntimeError(f"CPU DDP training failed (exit code {code})")
+    return adapter_dir
+
+
+def _ddp_worker(args: argparse.Namespace) -> None:
+    """One rank of a --cpu-workers run, launched by _train_slot_ddp."""
+    from low_mem import choose_base_precision
+
+    spec = json.loads(Path(args.ddp_worker).read_text())
+    cpu_ddp.init_worker()
+    slot       = spec["slot"]
+    model_path = spec["model_path"]
+    work_dir   = Path(spec["work_dir"]) / f"rank{cpu_ddp.rank()}"
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    tokenizer = load_tokenizer(model_path)
+    train_ds, n_samples, real_tokens = prepare_dataset(
+        slot, Path(spec["data_dir"]), work_dir, tokenizer, args.packing
+    )
+    # "auto" depends on free RAM, which shifts as the ranks load — use rank 0's pick
+    precision = cpu_ddp.broadcast(choose_base_precision(model_path, args.base_precision))
+    model     = load_base_model(model_path, precision)
+
+    profile_dir = spec["profile_dir"] if cpu_ddp.is_main_process() else None
+    run_training(
+        slot, model, tokenizer, train_ds, Path(spec["run_dir"]), n_samples, real_tokens,
+        Path(spec["warm_start_dir"]) if spec["warm_start_dir"] else None,
+        args.packing, args.compile,
+        Path(profile_dir) if profile_dir else None,
+        args.time_budget_minutes,
+    )
+
+
+def _pipeline(args: argparse.Namespace, profile_dir: Path | None) -> None:
     # 1. Fetch training params
-    slot = fetch_slot_info(args.api_url, args.contributor_wallet)
+    emit("fetch", message="Fetching slot")
+    with _STAGES.stage("fetch"):
+        slot = fetch_slot_info(args.api_url, args.contributor_wallet)
     if not slot:
         log("ERROR: No active LLM slot found for this wallet.")
         sys.exit(1)
@@ -357,31 +1228,64 @@ def main() -> None:
         )
         sys.exit(2)
 
-    # 2-6. Run full pipeline inside a temp directory (auto-cleaned on exit)
+    for stale in checkpoints.prune_stale():
+        log(f"Removed stale checkpoints: {stale}")
+    run_dir = checkpoints.run_dir(slot, args.contributor_wallet)
+
+    # 2-6. Downloads and the upload ZIP live in a temp directory (auto-cleaned
+    #      on exit); training state lives in run_dir so it survives restarts.
     with tempfile.TemporaryDirectory(prefix="tc_llm_") as tmp:
         tmp_p = Path(tmp)
 
-        # 2. Download shard
-        data_dir   = download_shard(args.api_url, args.job_id, args.contributor_wallet, tmp_p)
-
-        # 3. Train
-        output_dir = tmp_p / "output"
-        output_dir.mkdir()
-        adapter_dir = run_training(slot, data_dir, output_dir)
-
-        # 4. Zip
-        zip_path = zip_adapter(adapter_dir, tmp_p)
+        adapter_dir = checkpoints.finished_adapter(run_dir)
+        if adapter_dir is not None:
+            log("Finished adapter from an earlier run found — skipping training")
+        elif (n_workers := _cpu_worker_count(args, run_dir)) > 1:
+            adapter_dir = _train_slot_ddp(args, slot, run_dir, tmp_p, profile_dir, n_workers)
+        else:
+            adapter_dir = _train_slot(args, slot, run_dir, tmp_p, profile_dir)
 
-        # 5. Upload to IPFS via backend
-        adapter_cid = upload_adapter(
-            args.api_url, args.job_id, args.contributor_wallet, zip_path
-        )
+        # 4-5. Zip, then upload to IPFS via backend
+        emit("upload", message="Uploading adapter")
+        with _STAGES.stage("upload"):
+            zip_path    = zip_adapter(adapter_dir, tmp_p)
+            adapter_cid = upload_adapter(
+                args.api_url, args.job_id, args.contributor_wallet, zip_path
+            )
 
         # 6. Record in DB, trigger aggregation if last slot
-        submit_adapter(args.api_url, args.job_id, args.contributor_wallet, adapter_cid)
+        emit("submit", message="Submitting adapter")
+        with _STAGES.stage("submit"):
+            submit_adapter(args.api_url, args.job_id, args.contributor_wallet, adapter_cid)
 
+    checkpoints.discard(run_dir)
+    emit("done", message="Adapter submitted")
     log("✅ Done — adapter submitted successfully.")
 
 
+def main() -> None:
+    args = _parse_args()
+    log(f"job={args.job_id} | wallet={args.contributor_wallet}")
+    if os.environ.get("CUDA_VISIBLE_DEVICES") == "":
+        # CPU run requested by the app — size thread pools before torch loads
+        configure_cpu_threads(cpu_ddp.worker_cpus())
+    if args.ddp_worker:
+        try:
+            _ddp_worker(args)
+        finally:
+            log(f"Stage timings (rank {cpu_ddp.rank()}) | {_STAGES.summary()}")
+        return
+
+    profile_dir = profile_run_dir(Path(args.profile), "llm", args.job_id) if args.profile else None
+    try:
+        _pipeline(args, profile_dir)
+    finally:
+        # Written on failure too — a partial breakdown is what a bug report needs
+        log(f"Stage timings | {_STAGES.summary()}")
+        if profile_dir is not None:
+            _STAGES.write(profile_dir)
+            log(f"Profile saved to {profile_dir}")
+
+
 if __name__ == "__main__":
     main()